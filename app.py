@@ -1,11 +1,20 @@
 import os
+import io
 import base64
-import smtplib
+import fnmatch
+import hashlib
 from email.message import EmailMessage
-from flask import Flask, request, jsonify, send_file, abort
+from flask import Flask, request, jsonify, send_file, abort, make_response
 from datetime import datetime
 from dotenv import load_dotenv
 
+from utils.event_ids import assign_event_ids
+from database.event_index import EventIndex, encode_cursor, decode_cursor
+from utils.query_cache import QueryCache
+from utils.mail_queue import MailQueue
+from utils.report_cache import OUTPUT_PATTERNS
+from utils.activity_log import ActivityLog
+
 load_dotenv()
 
 SECRET_TOKEN = os.getenv("SECRET_TOKEN", "")
@@ -15,8 +24,13 @@ SMTP_USER = os.getenv("SMTP_USER", "")
 SMTP_PASS = os.getenv("SMTP_PASS", "")
 SMTP_USE_TLS = os.getenv("SMTP_USE_TLS", "true").lower() == "true"
 DEFAULT_FROM = os.getenv("DEFAULT_FROM", SMTP_USER)
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "500"))
+REPORTS_DIR = os.getenv("SIRIA_OUTPUT_DIR", "./output")
+MAX_ATTACHMENT_BYTES = int(float(os.getenv("MAX_ATTACHMENT_MB", "25")) * 1024 * 1024)
 
 app = Flask(__name__)
+# Peticiones más grandes se rechazan con 413 antes de leer el cuerpo
+app.config["MAX_CONTENT_LENGTH"] = MAX_ATTACHMENT_BYTES + 1024 * 1024
 
 # --- Seguridad básica: exigir Authorization: Bearer <SECRET_TOKEN> ---
 PUBLIC_PATHS = {"/health", "/openapi.json"}
@@ -38,9 +52,29 @@ def health():
     return jsonify({"status": "ok", "time": datetime.utcnow().isoformat() + "Z"})
 
 # --- Servir el esquema OpenAPI para registrar la Acción en el GPT ---
+_file_etags = {}
+
+def file_etag(path):
+    """ETag fuerte a partir del contenido del archivo (recalculado solo si cambia)"""
+    stat = os.stat(path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    cached = _file_etags.get(path)
+    if not cached or cached[0] != signature:
+        with open(path, "rb") as f:
+            cached = (signature, hashlib.blake2b(f.read(), digest_size=12).hexdigest())
+        _file_etags[path] = cached
+    return cached[1]
+
 @app.route("/openapi.json", methods=["GET"])
 def openapi_schema():
-    return send_file("openapi.json", mimetype="application/json")
+    # send_file responde 304 si If-None-Match coincide con el ETag
+    return send_file(
+        "openapi.json",
+        mimetype="application/json",
+        etag=file_etag("openapi.json"),
+        conditional=True,
+        max_age=0
+    )
 
 # --- Datos de ejemplo: eventos (en producción, esto vendrá de tu BD/Sheets) ---
 EVENTS_DB = [
@@ -79,6 +113,91 @@ EVENTS_DB = [
     }
 ]
 
+# IDs canónicos, iguales a los que generan los scrapers y Google Sheets
+assign_event_ids(EVENTS_DB)
+
+# Índice de eventos: se carga del almacén SQLite del pipeline (si existe) y
+# se sustituye cuando llega una versión nueva; si no, sirve EVENTS_DB
+EVENT_INDEX = EventIndex(fallback_events=EVENTS_DB)
+
+# Respuestas de /get_events ya serializadas, por consulta normalizada
+QUERY_CACHE = QueryCache(max_entries=int(os.getenv("QUERY_CACHE_SIZE", "1024")))
+
+# Cola persistente de correo saliente (envío en segundo plano)
+MAIL_QUEUE = MailQueue(
+    smtp_host=SMTP_HOST,
+    smtp_port=SMTP_PORT,
+    smtp_user=SMTP_USER,
+    smtp_password=SMTP_PASS,
+    smtp_use_tls=SMTP_USE_TLS
+)
+
+# Registro de actividad del GPT (JSON Lines, escrito en segundo plano)
+ACTIVITY_LOG = ActivityLog()
+
+# Campos que se pueden pedir con fields=
+EVENT_FIELDS = [
+    "id", "nombre", "entidad", "fecha", "hora", "modalidad", "lugar",
+    "enlace", "pais", "categoria", "descripcion", "ultima_actualizacion"
+]
+
+def parse_events_query():
+    """
+    Valida y normaliza los parámetros de GET /get_events
+
+    Returns:
+        Tupla hashable con la consulta normalizada: dos consultas que
+        devuelven lo mismo (mayúsculas, orden de fields...) dan la misma tupla
+    """
+    fields = None
+    if request.args.get("fields"):
+        fields = [f.strip() for f in request.args["fields"].split(",") if f.strip()]
+        unknown = [f for f in fields if f not in EVENT_FIELDS]
+        if unknown:
+            abort(400, description=f"Unknown fields: {', '.join(unknown)}")
+        # jsonify ordena las claves, así que el orden de fields no cambia la respuesta
+        fields = tuple(sorted(set(fields)))
+
+    paginated = "limit" in request.args or "cursor" in request.args
+    limit = None
+    after = None
+    if paginated:
+        try:
+            limit = int(request.args.get("limit", MAX_PAGE_SIZE))
+        except ValueError:
+            abort(400, description="'limit' must be an integer")
+        if limit < 1:
+            abort(400, description="'limit' must be positive")
+        limit = min(limit, MAX_PAGE_SIZE)
+        if request.args.get("cursor"):
+            try:
+                after = decode_cursor(request.args["cursor"])
+            except ValueError as ex:
+                abort(400, description=str(ex))
+
+    return (
+        request.args.get("from_date") or None,
+        request.args.get("to_date") or None,
+        (request.args.get("pais") or "").lower() or None,
+        (request.args.get("categoria") or "").lower() or None,
+        fields,
+        paginated,
+        limit,
+        after
+    )
+
+def query_etag(snapshot, query):
+    """ETag fuerte: versión de los datos + consulta normalizada"""
+    digest = hashlib.blake2b(repr(query).encode("utf-8"), digest_size=8).hexdigest()
+    return f"{snapshot.etag_seed}-{digest}"
+
+def json_body_response(body, etag):
+    """Respuesta JSON a partir de un cuerpo ya serializado"""
+    response = app.response_class(body, mimetype="application/json")
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
 # --- GET /get_events: devuelve la lista de eventos (filtros opcionales) ---
 @app.route("/get_events", methods=["GET"])
 def get_events():
@@ -88,47 +207,162 @@ def get_events():
       - to_date   (YYYY-MM-DD)
       - pais      (España|Colombia)
       - categoria (texto libre)
+      - fields    (campos separados por comas, p. ej. nombre,fecha,enlace)
+      - limit     (tamaño de página, máximo MAX_PAGE_SIZE)
+      - cursor    (valor next_cursor de la página anterior)
+
+    Sin limit ni cursor devuelve la lista completa; con paginación devuelve
+    {"events": [...], "next_cursor": "..." | null}. Responde 304 si
+    If-None-Match coincide con el ETag de la consulta. Las respuestas se
+    guardan serializadas en QUERY_CACHE hasta que cambian los datos.
     """
-    from_date = request.args.get("from_date")
-    to_date = request.args.get("to_date")
-    pais = request.args.get("pais")
-    categoria = request.args.get("categoria")
+    query = parse_events_query()
+    from_date, to_date, pais, categoria, fields, paginated, limit, after = query
 
-    def in_range(e):
-        try:
-            d = datetime.strptime(e.get("fecha", ""), "%Y-%m-%d").date()
-        except Exception:
+    snapshot = EVENT_INDEX.snapshot()
+    etag = query_etag(snapshot, query)
+    if request.if_none_match.contains(etag):
+        response = make_response("", 304)
+        response.set_etag(etag)
+        return response
+
+    body = QUERY_CACHE.get(snapshot.etag_seed, query)
+    if body is not None:
+        return json_body_response(body, etag)
+
+    results = snapshot.query(
+        from_date=from_date,
+        to_date=to_date,
+        pais=pais,
+        categoria=categoria,
+        after=after,
+        limit=None if limit is None else limit + 1
+    )
+
+    next_cursor = None
+    if limit is not None and len(results) > limit:
+        results = results[:limit]
+        next_cursor = encode_cursor(results[-1])
+
+    if fields:
+        results = [{f: e.get(f) for f in fields} for e in results]
+
+    body = jsonify({"events": results, "next_cursor": next_cursor} if paginated else results).get_data()
+    QUERY_CACHE.put(snapshot.etag_seed, query, body)
+    return json_body_response(body, etag)
+
+# --- GET /search: búsqueda de texto completo ---
+@app.route("/search", methods=["GET"])
+def search():
+    """
+    Parámetros:
+      - q         (texto a buscar, obligatorio; p. ej. "talleres de empleo en Medellín")
+      - limit     (número de resultados, por defecto 20, máximo MAX_PAGE_SIZE)
+      - pais      (opcional, país exacto)
+      - from_date (opcional, YYYY-MM-DD)
+      - to_date   (opcional, YYYY-MM-DD)
+
+    Busca en nombre, descripción, entidad y lugar sin distinguir acentos,
+    con tolerancia a erratas, y ordena por relevancia (BM25). Devuelve
+    {"query": q, "results": [evento + "score"]}.
+    """
+    q = (request.args.get("q") or "").strip()
+    if not q:
+        abort(400, description="Missing 'q'")
+    try:
+        limit = min(int(request.args.get("limit", 20)), MAX_PAGE_SIZE)
+    except ValueError:
+        abort(400, description="'limit' must be an integer")
+    if limit < 1:
+        abort(400, description="'limit' must be positive")
+
+    pais = (request.args.get("pais") or "").lower() or None
+    from_date = request.args.get("from_date") or None
+    to_date = request.args.get("to_date") or None
+
+    snapshot = EVENT_INDEX.snapshot()
+    # La respuesta repite q tal cual, así que la clave usa el texto original
+    query = ("search", q, limit, pais, from_date, to_date)
+    etag = query_etag(snapshot, query)
+    if request.if_none_match.contains(etag):
+        response = make_response("", 304)
+        response.set_etag(etag)
+        return response
+
+    body = QUERY_CACHE.get(snapshot.etag_seed, query)
+    if body is not None:
+        return json_body_response(body, etag)
+
+    def matches(event):
+        fecha = event.get("fecha") or ""
+        if pais and (event.get("pais") or "").lower() != pais:
+            return False
+        if from_date and fecha < from_date:
+            return False
+        if to_date and fecha > to_date:
             return False
-        if from_date:
-            try:
-                if d < datetime.strptime(from_date, "%Y-%m-%d").date():
-                    return False
-            except Exception:
-                pass
-        if to_date:
-            try:
-                if d > datetime.strptime(to_date, "%Y-%m-%d").date():
-                    return False
-            except Exception:
-                pass
         return True
 
-    results = [e for e in EVENTS_DB if in_range(e)]
-    if pais:
-        results = [e for e in results if e.get("pais", "").lower() == pais.lower()]
-    if categoria:
-        results = [e for e in results if categoria.lower() in e.get("categoria", "").lower()]
+    ranked = EVENT_INDEX.search(
+        snapshot, q, limit, predicate=matches if (pais or from_date or to_date) else None
+    )
+    results = [dict(event, score=score) for score, event in ranked]
 
-    return jsonify(results)
+    body = jsonify({"query": q, "results": results}).get_data()
+    QUERY_CACHE.put(snapshot.etag_seed, query, body)
+    return json_body_response(body, etag)
+
+# --- GET /metrics/query_cache: métricas de la caché de consultas ---
+@app.route("/metrics/query_cache", methods=["GET"])
+def query_cache_metrics():
+    return jsonify(QUERY_CACHE.metrics())
 
 # --- POST /log_activity: registrar logs que envíe el GPT ---
 @app.route("/log_activity", methods=["POST"])
 def log_activity():
-    data = request.json or {}
-    print(f"[{datetime.now().isoformat()}] GPT_LOG: {data}")
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        data = {"data": data}
+    ACTIVITY_LOG.record(data)
     return jsonify({"status": "ok"})
 
-# --- POST /send_email: enviar correo con (opcional) adjunto base64 ---
+# --- GET /activity: actividad registrada, de la más reciente a la más antigua ---
+@app.route("/activity", methods=["GET"])
+def activity():
+    """
+    Parámetros:
+      - limit (número de registros, por defecto 100, máximo MAX_PAGE_SIZE)
+      - since (opcional, marca de tiempo ISO; solo registros posteriores)
+      - cualquier otro parámetro filtra por ese campo del registro (valor exacto)
+    """
+    try:
+        limit = min(int(request.args.get("limit", 100)), MAX_PAGE_SIZE)
+    except ValueError:
+        abort(400, description="'limit' must be an integer")
+    since = request.args.get("since") or None
+    filters = {key: value for key, value in request.args.items() if key not in ("limit", "since")}
+    try:
+        entries = ACTIVITY_LOG.query(limit=limit, since=since, filters=filters)
+    except ValueError as ex:
+        abort(400, description=str(ex))
+    return jsonify({"activity": entries})
+
+# --- GET /metrics/activity_log: métricas del registro de actividad ---
+@app.route("/metrics/activity_log", methods=["GET"])
+def activity_log_metrics():
+    return jsonify(ACTIVITY_LOG.metrics())
+
+def report_path(report_id):
+    """Ruta de un informe ya generado en REPORTS_DIR (400/404 si el ID no es válido)"""
+    if (os.path.basename(report_id) != report_id or
+            not any(fnmatch.fnmatch(report_id, pattern) for pattern in OUTPUT_PATTERNS)):
+        abort(400, description=f"Invalid report_id: {report_id}")
+    path = os.path.join(REPORTS_DIR, report_id)
+    if not os.path.isfile(path):
+        abort(404, description=f"Unknown report_id: {report_id}")
+    return path
+
+# --- POST /send_email: enviar correo con adjuntos (multipart, informes generados o base64) ---
 @app.route("/send_email", methods=["POST"])
 def send_email():
     """
@@ -138,11 +372,32 @@ def send_email():
       "subject": "Asunto",
       "body": "Texto del mensaje (puede ser HTML si pones content_type='html')",
       "content_type": "plain" | "html",  (opcional, por defecto 'plain')
+      "report_id": "agenda_eventos_2025-11-03.xlsx",  (opcional, informe ya generado; admite lista)
       "attachment_base64": "....",       (opcional)
       "filename": "agenda_eventos.xlsx"  (opcional, requerido si hay adjunto)
     }
+
+    También acepta multipart/form-data con los mismos campos de texto,
+    report_id (repetible) y los archivos en el campo "attachment"
+    (repetible); los archivos se reciben en un temporal en disco sin pasar
+    por base64. Los adjuntos no pueden sumar más de MAX_ATTACHMENT_MB (413).
+
+    Responde 202 con el ID del mensaje en la cola; el envío se hace en
+    segundo plano (ver GET /email_status/<message_id>).
     """
-    payload = request.json or {}
+    if request.mimetype == "multipart/form-data":
+        payload = request.form
+        report_ids = payload.getlist("report_id")
+        uploads = [f for f in request.files.getlist("attachment") if f.filename]
+    else:
+        payload = request.get_json(silent=True) or {}
+        report_ids = payload.get("report_id") or []
+        if isinstance(report_ids, str):
+            report_ids = [report_ids]
+        if not isinstance(report_ids, list) or not all(isinstance(r, str) for r in report_ids):
+            abort(400, description="'report_id' must be a string or a list of strings")
+        uploads = []
+
     to = payload.get("to")
     subject = payload.get("subject", "")
     body = payload.get("body", "")
@@ -165,6 +420,18 @@ def send_email():
     else:
         msg.set_content(body)
 
+    attachments = []
+    total_size = 0
+    for report_id in report_ids:
+        path = report_path(report_id)
+        attachments.append((report_id, path))
+        total_size += os.path.getsize(path)
+    for upload in uploads:
+        upload.stream.seek(0, os.SEEK_END)
+        total_size += upload.stream.tell()
+        upload.stream.seek(0)
+        attachments.append((upload.filename, upload.stream))
+
     if attachment_b64:
         if not filename:
             abort(400, description="Missing 'filename' for attachment")
@@ -172,22 +439,38 @@ def send_email():
             data = base64.b64decode(attachment_b64)
         except Exception as ex:
             abort(400, description=f"Invalid base64: {ex}")
-        msg.add_attachment(data, maintype="application", subtype="octet-stream", filename=filename)
+        total_size += len(data)
+        attachments.append((filename, io.BytesIO(data)))
+
+    if total_size > MAX_ATTACHMENT_BYTES:
+        abort(413, description=f"Attachments exceed {MAX_ATTACHMENT_BYTES} bytes")
 
     try:
-        if SMTP_USE_TLS:
-            server = smtplib.SMTP(SMTP_HOST, SMTP_PORT)
-            server.starttls()
-        else:
-            server = smtplib.SMTP_SSL(SMTP_HOST, SMTP_PORT)
-        if SMTP_USER and SMTP_PASS:
-            server.login(SMTP_USER, SMTP_PASS)
-        server.send_message(msg)
-        server.quit()
-    except Exception as ex:
-        abort(500, description=f"SMTP error: {ex}")
-
-    return jsonify({"status": "sent"})
+        message_id = MAIL_QUEUE.enqueue(msg, attachments)
+    except ValueError as ex:
+        abort(400, description=str(ex))
+
+    response = jsonify({"status": "queued", "message_id": message_id})
+    response.status_code = 202
+    response.headers["Location"] = f"/email_status/{message_id}"
+    return response
+
+# --- GET /email_status/<message_id>: estado de entrega de un correo ---
+@app.route("/email_status/<message_id>", methods=["GET"])
+def email_status(message_id):
+    """
+    Devuelve el estado del mensaje: queued (pendiente o esperando
+    reintento), sending, sent o failed, con intentos y último error.
+    """
+    status = MAIL_QUEUE.status(message_id)
+    if status is None:
+        abort(404, description="Unknown message_id")
+    return jsonify(status)
+
+# --- GET /metrics/mail_queue: métricas de la cola de correo ---
+@app.route("/metrics/mail_queue", methods=["GET"])
+def mail_queue_metrics():
+    return jsonify(MAIL_QUEUE.metrics())
 
 if __name__ == "__main__":
     # Ejecuta en 0.0.0.0 para que ngrok lo pueda ver
@@ -0,0 +1,468 @@
+"""
+Índice en memoria de eventos para las consultas de la API
+"""
+import base64
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from database.snapshot_file import SnapshotFile, write_snapshot
+from database.sqlite_store import SQLiteEventStore
+from utils.text_search import TextSearchIndex
+
+# fcntl solo existe en sistemas POSIX (en Windows no se usa gunicorn)
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_date(value) -> Optional[str]:
+    """Fecha YYYY-MM-DD normalizada, o None si no es válida"""
+    try:
+        if isinstance(value, str) and len(value) == 10 and value[4] == '-' and value[7] == '-':
+            # Caso habitual: fromisoformat es mucho más rápido que strptime
+            return date.fromisoformat(value).isoformat()
+        return datetime.strptime(value or '', '%Y-%m-%d').date().isoformat()
+    except (TypeError, ValueError):
+        return None
+
+
+def encode_cursor(event: Dict) -> str:
+    """
+    Cursor de paginación que apunta justo después de un evento
+
+    Args:
+        event: Último evento de la página
+
+    Returns:
+        Cursor opaco (base64 url-safe)
+    """
+    key = [_parse_date(event.get('fecha')) or '', event.get('id') or '']
+    return base64.urlsafe_b64encode(json.dumps(key).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """
+    Decodifica un cursor de paginación
+
+    Args:
+        cursor: Cursor generado por encode_cursor
+
+    Returns:
+        Clave (fecha, id) del último evento devuelto
+
+    Raises:
+        ValueError: Si el cursor no es válido
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        fecha, event_key = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if not isinstance(fecha, str) or not isinstance(event_key, str):
+            raise ValueError
+        return fecha, event_key
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+
+
+class EventSnapshot:
+    """
+    Índice inmutable de una versión del conjunto de eventos.
+
+    Los eventos con fecha válida se guardan ordenados por fecha, de modo que
+    un rango de fechas es un intervalo de posiciones que se obtiene por
+    búsqueda binaria. País y categoría tienen índices invertidos (valor ->
+    posiciones ordenadas) que se intersecan con ese intervalo. El orden
+    (fecha, id) es total, lo que permite paginar por cursor aunque el índice
+    se sustituya entre dos páginas.
+    """
+
+    def __init__(self, events: List[Dict], version: Optional[int] = None):
+        """
+        Construye el índice
+
+        Args:
+            events: Lista de eventos
+            version: Versión del conjunto de eventos
+        """
+        self.version = version
+        # Identifica el archivo de origen de los índices mapeados (ver from_file)
+        self.signature = None
+
+        dated = []
+        for event in events:
+            day = _parse_date(event.get('fecha'))
+            if day:
+                dated.append(((day, event.get('id') or ''), event))
+        dated.sort(key=lambda item: item[0])
+
+        self.keys = [key for key, _ in dated]
+        self.dates = [day for day, _ in self.keys]
+        self.events = [event for _, event in dated]
+
+        # Semilla de los ETag: la versión del almacén o, sin versión, el contenido
+        if version is not None:
+            self.etag_seed = f"v{version}"
+        else:
+            digest = hashlib.blake2b(
+                json.dumps(self.events, sort_keys=True, default=str).encode('utf-8'),
+                digest_size=8
+            )
+            self.etag_seed = f"c{digest.hexdigest()}"
+
+        self.by_pais: Dict[str, List[int]] = {}
+        self.by_categoria: Dict[str, List[int]] = {}
+        for position, event in enumerate(self.events):
+            self.by_pais.setdefault((event.get('pais') or '').lower(), []).append(position)
+            self.by_categoria.setdefault((event.get('categoria') or '').lower(), []).append(position)
+
+    def __len__(self) -> int:
+        return len(self.events)
+
+    def to_file(self, path: str) -> int:
+        """
+        Publica el índice en un archivo de instantánea (ver database.snapshot_file)
+
+        Args:
+            path: Ruta del archivo
+
+        Returns:
+            Tamaño del archivo en bytes
+        """
+        return write_snapshot(
+            path, self.version, self.etag_seed, self.dates, [event_key for _, event_key in self.keys],
+            self.events, {'pais': self.by_pais, 'categoria': self.by_categoria}
+        )
+
+    @classmethod
+    def from_file(cls, path: str) -> 'EventSnapshot':
+        """
+        Abre un índice publicado con to_file sin cargarlo en memoria: fechas,
+        claves y posiciones se leen del archivo mapeado y los eventos se
+        decodifican solo cuando una consulta los devuelve
+
+        Args:
+            path: Ruta del archivo
+
+        Returns:
+            Índice de eventos
+        """
+        mapped = SnapshotFile(path)
+        snapshot = cls.__new__(cls)
+        snapshot.version = mapped.version
+        snapshot.etag_seed = mapped.etag_seed
+        snapshot.keys = mapped.keys
+        snapshot.dates = mapped.dates
+        snapshot.events = mapped.events
+        snapshot.by_pais = mapped.postings['pais']
+        snapshot.by_categoria = mapped.postings['categoria']
+        snapshot.signature = mapped.signature
+        return snapshot
+
+    def _categoria_positions(self, categoria: str) -> List[int]:
+        """Posiciones de las categorías que contienen el texto (sin distinguir mayúsculas)"""
+        needle = categoria.lower()
+        matches = [positions for name, positions in self.by_categoria.items() if needle in name]
+        if len(matches) == 1:
+            return matches[0]
+        return sorted(position for positions in matches for position in positions)
+
+    @staticmethod
+    def _slice(positions: List[int], lo: int, hi: int) -> List[int]:
+        """Posiciones dentro del intervalo [lo, hi)"""
+        return positions[bisect_left(positions, lo):bisect_left(positions, hi)]
+
+    def query(self, from_date: Optional[str] = None, to_date: Optional[str] = None,
+              pais: Optional[str] = None, categoria: Optional[str] = None,
+              after: Optional[Tuple[str, str]] = None, limit: Optional[int] = None) -> List[Dict]:
+        """
+        Filtra eventos con la misma semántica que GET /get_events
+
+        Args:
+            from_date: Fecha mínima (YYYY-MM-DD; se ignora si no es válida)
+            to_date: Fecha máxima (YYYY-MM-DD; se ignora si no es válida)
+            pais: País exacto (sin distinguir mayúsculas)
+            categoria: Texto contenido en la categoría (sin distinguir mayúsculas)
+            after: Clave (fecha, id) a partir de la cual devolver eventos (paginación)
+            limit: Número máximo de eventos
+
+        Returns:
+            Eventos ordenados por fecha e id
+        """
+        start = _parse_date(from_date)
+        end = _parse_date(to_date)
+        lo = bisect_left(self.dates, start) if start else 0
+        hi = bisect_right(self.dates, end) if end else len(self.dates)
+        if after is not None:
+            lo = max(lo, bisect_right(self.keys, tuple(after)))
+        if lo >= hi:
+            return []
+
+        candidates = None
+        if pais:
+            candidates = self._slice(self.by_pais.get(pais.lower(), []), lo, hi)
+        if categoria:
+            in_categoria = self._slice(self._categoria_positions(categoria), lo, hi)
+            if candidates is None:
+                candidates = in_categoria
+            else:
+                # Recorrer la lista menor y comprobar en la mayor
+                small, large = sorted((candidates, in_categoria), key=len)
+                large = set(large)
+                candidates = [position for position in small if position in large]
+
+        if candidates is None:
+            return self.events[lo:hi if limit is None else min(hi, lo + limit)]
+        if limit is not None:
+            candidates = candidates[:limit]
+        return [self.events[position] for position in candidates]
+
+
+def default_snapshot_path() -> str:
+    """Ruta del archivo de instantánea (EVENT_SNAPSHOT_PATH o ./data/events.snapshot)"""
+    return os.getenv('EVENT_SNAPSHOT_PATH', './data/events.snapshot')
+
+
+def publish_snapshot(store: SQLiteEventStore, path: Optional[str] = None, force: bool = False) -> bool:
+    """
+    Publica la versión actual del almacén como archivo de instantánea, que
+    los workers de la API mapean en memoria y cargan en cuanto cambia
+
+    Args:
+        store: Almacén SQLite
+        path: Ruta del archivo (por defecto default_snapshot_path())
+        force: Publicar aunque el archivo ya tenga la misma versión
+
+    Returns:
+        True si se escribió un archivo nuevo
+    """
+    path = path or default_snapshot_path()
+    version = store.dataset_version()
+    if version == 0:
+        return False
+    if not force and os.path.exists(path):
+        try:
+            if SnapshotFile(path).version == version:
+                return False
+        except (OSError, ValueError) as e:
+            logger.warning(f"Replacing unreadable event snapshot {path}: {e}")
+
+    snapshot = EventSnapshot(store.get_all_events(), version)
+    size = snapshot.to_file(path)
+    logger.info(f"Published event snapshot {path} (dataset version {version}, {len(snapshot)} events, {size} bytes)")
+    return True
+
+
+class EventIndex:
+    """
+    Mantiene el índice vigente y lo sustituye de forma atómica cuando cambia
+    la versión de los datos (p. ej. tras la actualización semanal).
+
+    Si existe el archivo de instantánea publicado con publish_snapshot, se
+    mapea en memoria: todos los workers del servidor comparten sus páginas
+    en lugar de cargar cada uno los eventos, y cada worker pasa al archivo
+    nuevo en cuanto se publica. Si el almacén SQLite tiene una versión más
+    reciente que la del archivo (p. ej. porque falló su publicación), el
+    primer worker que lo detecta vuelve a publicar el archivo. Si no existe
+    archivo, el índice se construye en memoria desde el almacén; sin
+    almacén, o si está vacío, se usan los eventos de respaldo.
+
+    Las consultas usan siempre una instantánea completa: la nueva se
+    prepara en segundo plano y solo entonces reemplaza a la anterior. El
+    índice de búsqueda de texto se construye al primer uso y se sincroniza
+    de forma incremental con cada versión nueva.
+
+    El índice de búsqueda no se comparte: es privado de cada worker y
+    decodifica todos los eventos del archivo mapeado. Es una decisión
+    consciente. Sus listas de términos son estructuras de Python que se
+    modifican en cada sincronización, así que no pueden vivir en el archivo
+    de solo lectura. Solo ocupa memoria en los workers que atienden /search.
+    """
+
+    def __init__(self, fallback_events: Optional[List[Dict]] = None, db_path: Optional[str] = None,
+                 refresh_interval: Optional[float] = None, snapshot_path: Optional[str] = None):
+        """
+        Inicializa el índice
+
+        Args:
+            fallback_events: Eventos a servir si no hay almacén SQLite
+            db_path: Ruta del almacén (por defecto SIRIA_DB_PATH o ./data/siria_events.db)
+            refresh_interval: Segundos entre comprobaciones de versión (por
+                defecto EVENT_INDEX_REFRESH_SECONDS o 30)
+            snapshot_path: Archivo de instantánea (por defecto EVENT_SNAPSHOT_PATH
+                o ./data/events.snapshot)
+        """
+        self.fallback_events = fallback_events or []
+        self.db_path = db_path or os.getenv('SIRIA_DB_PATH', './data/siria_events.db')
+        self.snapshot_path = snapshot_path or default_snapshot_path()
+        self.refresh_interval = float(
+            refresh_interval if refresh_interval is not None
+            else os.getenv('EVENT_INDEX_REFRESH_SECONDS', '30')
+        )
+
+        self._store: Optional[SQLiteEventStore] = None
+        self._refresh_lock = threading.Lock()
+        self._last_check = 0.0
+        self._snapshot = EventSnapshot(self.fallback_events)
+        # Último archivo de instantánea examinado (aunque no se llegara a usar)
+        self._file_signature = None
+        self._file_version: Optional[int] = None
+        self._search_index = TextSearchIndex()
+        self._search_seed: Optional[str] = None
+        self._search_lock = threading.Lock()
+        self.refresh()
+
+    def _get_store(self) -> Optional[SQLiteEventStore]:
+        """Abre el almacén si existe (nunca lo crea)"""
+        if self._store is None and os.path.exists(self.db_path):
+            self._store = SQLiteEventStore(self.db_path)
+        return self._store
+
+    def _load_file(self) -> Optional[EventSnapshot]:
+        """Mapea el archivo de instantánea si cambió desde la última vez que se examinó"""
+        stat = os.stat(self.snapshot_path)
+        if self._file_signature == (stat.st_ino, stat.st_mtime_ns, stat.st_size):
+            return None
+        snapshot = EventSnapshot.from_file(self.snapshot_path)
+        self._file_signature = snapshot.signature
+        self._file_version = snapshot.version
+        return snapshot
+
+    def _store_version_after(self, known_version: Optional[int]) -> int:
+        """Versión del almacén si es posterior a known_version (0 si no hay versión nueva)"""
+        store = self._get_store()
+        if store is None:
+            return 0
+        version = store.dataset_version()
+        if version == 0 or (known_version is not None and version <= known_version):
+            return 0
+        return version
+
+    def _load_store(self, version: int) -> EventSnapshot:
+        """Construye en memoria el índice de una versión del almacén"""
+        return EventSnapshot(self._get_store().get_all_events(), version)
+
+    def _republish(self) -> Optional[EventSnapshot]:
+        """
+        Vuelve a publicar el archivo de instantánea desde el almacén y lo mapea
+
+        Un cerrojo sobre el archivo hace que solo un proceso lo publique a la
+        vez; los demás recogen el archivo nuevo en su siguiente comprobación.
+
+        Returns:
+            Instantánea del archivo publicado, o None si otro proceso lo está publicando
+        """
+        with open(f"{self.snapshot_path}.lock", 'a') as lock:
+            if FCNTL_AVAILABLE:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    return None
+            # Puede que otro proceso acabe de publicarlo: publish_snapshot no lo reescribe
+            publish_snapshot(self._get_store(), self.snapshot_path)
+            return self._load_file()
+
+    def refresh(self) -> bool:
+        """
+        Carga el índice si hay una versión nueva (archivo de instantánea o almacén)
+
+        Returns:
+            True si se sustituyó el índice
+        """
+        self._last_check = time.monotonic()
+        try:
+            snapshot = None
+            use_file = os.path.exists(self.snapshot_path)
+            if use_file:
+                snapshot = self._load_file()
+                current = self._snapshot.version
+                if (snapshot is not None and snapshot.version is not None and current is not None
+                        and snapshot.version < current):
+                    # El archivo es más antiguo que lo que ya se sirve desde el almacén
+                    snapshot = None
+
+            known = [v for v in (self._snapshot.version, self._file_version) if v is not None]
+            store_version = self._store_version_after(max(known) if known else None)
+            if store_version and use_file:
+                # El archivo va por detrás del almacén (p. ej. falló su publicación):
+                # se vuelve a publicar en lugar de cargar una copia en cada worker
+                logger.warning(
+                    f"Event store version {store_version} is ahead of snapshot file "
+                    f"{self.snapshot_path} (version {self._file_version}), republishing it"
+                )
+                try:
+                    published = self._republish()
+                except Exception as e:
+                    logger.error(f"Error republishing event snapshot, loading store in memory: {e}")
+                    snapshot = self._load_store(store_version)
+                else:
+                    if published is not None:
+                        snapshot = published
+            elif store_version:
+                snapshot = self._load_store(store_version)
+        except Exception as e:
+            logger.error(f"Error refreshing event index: {e}")
+            return False
+        if snapshot is None:
+            return False
+
+        # Sustitución atómica: las consultas en curso terminan con la anterior
+        self._snapshot = snapshot
+        source = 'memory-mapped' if snapshot.signature else 'in memory'
+        logger.info(f"Event index swapped to dataset version {snapshot.version} ({len(snapshot)} events, {source})")
+        return True
+
+    def search(self, snapshot: EventSnapshot, query: str, limit: int = 20,
+               predicate: Optional[Callable[[Dict], bool]] = None) -> List[Tuple[float, Dict]]:
+        """
+        Búsqueda de texto sobre una instantánea concreta
+
+        El índice de búsqueda se sincroniza con la instantánea de la petición
+        (no con la vigente en ese momento) y la búsqueda se hace sin soltar el
+        cerrojo, de modo que los resultados corresponden a la misma versión
+        que el ETag de la respuesta.
+
+        Args:
+            snapshot: Instantánea con la que se atiende la petición
+            query: Texto de la consulta
+            limit: Número máximo de resultados
+            predicate: Filtro adicional sobre los eventos candidatos (opcional)
+
+        Returns:
+            Lista de (puntuación, evento) de mayor a menor puntuación
+        """
+        with self._search_lock:
+            if self._search_seed != snapshot.etag_seed:
+                changes = self._search_index.sync(snapshot.events)
+                self._search_seed = snapshot.etag_seed
+                logger.info(f"Search index synced to {snapshot.etag_seed}: {changes}")
+            return self._search_index.search(query, limit, predicate=predicate)
+
+    def _refresh_in_background(self):
+        try:
+            self.refresh()
+        finally:
+            self._refresh_lock.release()
+
+    def snapshot(self) -> EventSnapshot:
+        """
+        Instantánea vigente; si toca, lanza en segundo plano la comprobación
+        de una versión nueva sin hacer esperar a la petición
+
+        Returns:
+            Índice de eventos
+        """
+        if (time.monotonic() - self._last_check >= self.refresh_interval and
+                self._refresh_lock.acquire(blocking=False)):
+            self._last_check = time.monotonic()
+            threading.Thread(target=self._refresh_in_background, name="event-index-refresh", daemon=True).start()
+        return self._snapshot
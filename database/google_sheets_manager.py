@@ -2,23 +2,72 @@
 Gestor de Google Sheets para almacenar eventos
 """
 import os
-from typing import List, Dict, Optional
+import hashlib
+import threading
+from typing import List, Dict, Iterator, Optional, Tuple
 import logging
 from datetime import datetime
 import json
 
+from utils.event_ids import event_id
+from database.sheets_client import SheetsClient
+
 logger = logging.getLogger(__name__)
 
-# Google Sheets se importa condicionalmente
-try:
-    from google.oauth2.credentials import Credentials
-    from google.oauth2 import service_account
-    from googleapiclient.discovery import build
-    from googleapiclient.errors import HttpError
-    GOOGLE_AVAILABLE = True
-except ImportError:
-    GOOGLE_AVAILABLE = False
-    logger.warning("Google API libraries not available. Install with: pip install google-api-python-client google-auth")
+SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
+
+# Las librerías de Google se importan bajo demanda (ver _google_api), de modo
+# que los procesos que no usan Sheets no pagan su coste de importación
+_google_modules = None
+_discovery_document = None
+_google_lock = threading.Lock()
+
+
+def _google_api():
+    """
+    Importa las librerías de Google la primera vez que se necesitan
+
+    Returns:
+        Tupla (service_account, discovery) o None si no están instaladas
+    """
+    global _google_modules
+    with _google_lock:
+        if _google_modules is None:
+            try:
+                from google.oauth2 import service_account
+                from googleapiclient import discovery
+                _google_modules = (service_account, discovery)
+            except ImportError:
+                _google_modules = False
+                logger.warning(
+                    "Google API libraries not available. "
+                    "Install with: pip install google-api-python-client google-auth"
+                )
+    return _google_modules or None
+
+
+def google_available() -> bool:
+    """Indica si las librerías de Google están instaladas (las importa si hace falta)"""
+    return _google_api() is not None
+
+
+def _sheets_discovery_document(discovery) -> Optional[str]:
+    """
+    Documento de descubrimiento de Sheets v4 incluido en googleapiclient,
+    leído una sola vez por proceso
+
+    Returns:
+        Documento JSON o None si la versión instalada no lo incluye
+    """
+    global _discovery_document
+    with _google_lock:
+        if _discovery_document is None:
+            try:
+                from googleapiclient.discovery_cache import get_static_doc
+                _discovery_document = get_static_doc('sheets', 'v4') or ''
+            except ImportError:
+                _discovery_document = ''
+    return _discovery_document or None
 
 
 class GoogleSheetsManager:
@@ -42,6 +91,28 @@ class GoogleSheetsManager:
         'Última actualización'
     ]
 
+    # Campo del evento correspondiente a cada columna
+    FIELDS = [
+        'id',
+        'nombre',
+        'entidad',
+        'fecha',
+        'hora',
+        'modalidad',
+        'lugar',
+        'enlace',
+        'pais',
+        'categoria',
+        'descripcion',
+        'ultima_actualizacion'
+    ]
+
+    # Columnas con contenido del evento (todas salvo 'Última actualización')
+    CONTENT_COLUMNS = 11
+
+    # Intentos de una sincronización completa (lectura + escritura) si falla una escritura
+    WRITE_ATTEMPTS = 2
+
     def __init__(self, credentials_file: Optional[str] = None, spreadsheet_id: Optional[str] = None):
         """
         Inicializa el gestor de Google Sheets
@@ -50,36 +121,99 @@ class GoogleSheetsManager:
             credentials_file: Ruta al archivo de credenciales JSON
             spreadsheet_id: ID de la hoja de cálculo
         """
-        if not GOOGLE_AVAILABLE:
-            logger.error("Google API libraries not installed")
-            self.service = None
-            return
+        self._row_index: Dict[str, Dict[str, int]] = {}
+        self._service = None
+        self._client: Optional[SheetsClient] = None
+        self._auth_attempted = False
 
         self.credentials_file = credentials_file or os.getenv('GOOGLE_SHEETS_CREDENTIALS_FILE')
         self.spreadsheet_id = spreadsheet_id or os.getenv('GOOGLE_SHEETS_SPREADSHEET_ID')
-        self.service = None
 
-        if self.credentials_file and os.path.exists(self.credentials_file):
-            self.authenticate()
-        else:
+        # La autenticación se hace en el primer acceso a self.service
+        if not self.is_configured():
             logger.warning("Google Sheets credentials not configured")
 
+    def is_configured(self) -> bool:
+        """
+        Indica si hay credenciales y hoja configuradas, sin importar las
+        librerías de Google ni autenticar
+
+        Returns:
+            True si existe el archivo de credenciales y hay ID de hoja
+        """
+        return bool(
+            self.credentials_file and
+            self.spreadsheet_id and
+            os.path.exists(self.credentials_file)
+        )
+
+    @property
+    def service(self):
+        """Servicio de la API de Sheets, creado en el primer uso"""
+        if self._service is None and not self._auth_attempted and self.is_configured():
+            self.authenticate()
+        return self._service
+
+    @service.setter
+    def service(self, value):
+        self._service = value
+
     def authenticate(self):
         """Autentica con Google Sheets API"""
-        try:
-            SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
+        self._auth_attempted = True
+
+        google = _google_api()
+        if not google:
+            logger.error("Google API libraries not installed")
+            self._service = None
+            return
 
+        service_account, discovery = google
+        try:
             credentials = service_account.Credentials.from_service_account_file(
                 self.credentials_file,
                 scopes=SCOPES
             )
 
-            self.service = build('sheets', 'v4', credentials=credentials)
+            # Construir desde el documento de descubrimiento local evita
+            # descargarlo (o releerlo del disco) en cada autenticación
+            document = _sheets_discovery_document(discovery)
+            if document:
+                self._service = discovery.build_from_document(document, credentials=credentials)
+            else:
+                self._service = discovery.build('sheets', 'v4', credentials=credentials, cache_discovery=False)
             logger.info("Successfully authenticated with Google Sheets API")
 
         except Exception as e:
             logger.error(f"Error authenticating with Google Sheets: {e}")
-            self.service = None
+            self._service = None
+
+    @property
+    def client(self) -> SheetsClient:
+        """Cliente con control de cuota y reintentos sobre el servicio actual"""
+        if self._client is None or self._client.service is not self.service:
+            self._client = SheetsClient(
+                self.service,
+                self.spreadsheet_id,
+                read_per_minute=int(os.getenv('SHEETS_READ_QUOTA_PER_MINUTE', '60')),
+                write_per_minute=int(os.getenv('SHEETS_WRITE_QUOTA_PER_MINUTE', '60'))
+            )
+        return self._client
+
+    def _execute(self, request, kind: str = 'read'):
+        """Ejecuta una petición a través del cliente con control de cuota"""
+        return self.client.execute(request, kind)
+
+    def get_quota_metrics(self) -> Dict:
+        """
+        Métricas de uso de la cuota de la API de Sheets
+
+        Returns:
+            Diccionario con contadores de peticiones, reintentos y esperas
+        """
+        if not self.service:
+            return {}
+        return self.client.metrics()
 
     def create_sheet(self, sheet_name: str = "Eventos Tercer Sector") -> bool:
         """
@@ -107,23 +241,29 @@ class GoogleSheetsManager:
                 }]
             }
 
-            self.service.spreadsheets().batchUpdate(
-                spreadsheetId=self.spreadsheet_id,
-                body=request_body
-            ).execute()
+            self._execute(
+                self.service.spreadsheets().batchUpdate(
+                    spreadsheetId=self.spreadsheet_id,
+                    body=request_body
+                ),
+                kind='write'
+            )
 
             # Añadir encabezados
-            self.service.spreadsheets().values().update(
-                spreadsheetId=self.spreadsheet_id,
-                range=f"{sheet_name}!A1",
-                valueInputOption='RAW',
-                body={'values': [self.COLUMNS]}
-            ).execute()
+            self._execute(
+                self.service.spreadsheets().values().update(
+                    spreadsheetId=self.spreadsheet_id,
+                    range=f"{sheet_name}!A1",
+                    valueInputOption='RAW',
+                    body={'values': [self.COLUMNS]}
+                ),
+                kind='write'
+            )
 
             logger.info(f"Sheet '{sheet_name}' created successfully")
             return True
 
-        except HttpError as e:
+        except Exception as e:
             if 'already exists' in str(e):
                 logger.info(f"Sheet '{sheet_name}' already exists")
                 return True
@@ -141,7 +281,7 @@ class GoogleSheetsManager:
             Lista con valores para cada columna
         """
         return [
-            event.get('id', ''),
+            event.get('id') or event_id(event),
             event.get('nombre', ''),
             event.get('entidad', ''),
             event.get('fecha', ''),
@@ -181,13 +321,17 @@ class GoogleSheetsManager:
             # Añadir filas
             body = {'values': rows}
 
-            self.service.spreadsheets().values().append(
-                spreadsheetId=self.spreadsheet_id,
-                range=f"{sheet_name}!A2",
-                valueInputOption='RAW',
-                body=body
-            ).execute()
+            self._execute(
+                self.service.spreadsheets().values().append(
+                    spreadsheetId=self.spreadsheet_id,
+                    range=f"{sheet_name}!A2",
+                    valueInputOption='RAW',
+                    body=body
+                ),
+                kind='write'
+            )
 
+            self.invalidate_row_index(sheet_name)
             logger.info(f"Added {len(events)} events to sheet '{sheet_name}'")
             return True
 
@@ -195,6 +339,303 @@ class GoogleSheetsManager:
             logger.error(f"Error appending events: {e}")
             return False
 
+    def row_content_hash(self, row: List) -> str:
+        """
+        Calcula el hash del contenido de una fila, sin la columna de última
+        actualización
+
+        Args:
+            row: Valores de la fila (como vienen de la API o de event_to_row)
+
+        Returns:
+            Hash del contenido
+        """
+        values = [str(value) if value is not None else '' for value in row[:self.CONTENT_COLUMNS]]
+        values += [''] * (self.CONTENT_COLUMNS - len(values))
+        return hashlib.blake2b('\x1f'.join(values).encode('utf-8'), digest_size=16).hexdigest()
+
+    def get_sheet_id(self, sheet_name: str = "Eventos Tercer Sector") -> Optional[int]:
+        """
+        Obtiene el identificador numérico (sheetId) de una hoja
+
+        Args:
+            sheet_name: Nombre de la hoja
+
+        Returns:
+            sheetId o None si no existe
+        """
+        result = self._execute(
+            self.service.spreadsheets().get(
+                spreadsheetId=self.spreadsheet_id,
+                fields='sheets.properties(sheetId,title)'
+            ),
+            kind='read'
+        )
+
+        for sheet in result.get('sheets', []):
+            properties = sheet.get('properties', {})
+            if properties.get('title') == sheet_name:
+                return properties.get('sheetId')
+        return None
+
+    @staticmethod
+    def _contiguous_ranges(row_numbers: List[int]) -> List[Tuple[int, int]]:
+        """Agrupa números de fila en rangos contiguos (inicio, fin) de mayor a menor"""
+        ranges = []
+        for row_number in sorted(row_numbers, reverse=True):
+            if ranges and ranges[-1][0] == row_number + 1:
+                ranges[-1] = (row_number, ranges[-1][1])
+            else:
+                ranges.append((row_number, row_number))
+        return ranges
+
+    def upsert_events(self, events: List[Dict], sheet_name: str = "Eventos Tercer Sector") -> Optional[Dict]:
+        """
+        Sincroniza la hoja con una lista de eventos escribiendo solo las
+        diferencias
+
+        Lee la hoja una vez y compara por ID y hash del contenido de cada
+        fila. Las filas modificadas y las nuevas (que reutilizan los huecos
+        de las filas eliminadas) se escriben en un único values.batchUpdate;
+        las nuevas que no caben se añaden con un append y las filas sobrantes
+        se borran con un único batchUpdate de deleteDimension.
+
+        Args:
+            events: Lista completa de eventos que debe contener la hoja
+            sheet_name: Nombre de la hoja
+
+        Returns:
+            Diccionario con el número de filas insertadas, actualizadas,
+            eliminadas y sin cambios, o None si falla
+        """
+        if not self.service or not self.spreadsheet_id:
+            logger.error("Google Sheets not configured")
+            return None
+
+        for attempt in range(1, self.WRITE_ATTEMPTS + 1):
+            try:
+                changes = self._upsert_events_once(events, sheet_name)
+                logger.info(f"Upserted events into sheet '{sheet_name}': {changes}")
+                return changes
+            except Exception as e:
+                # Una escritura parcial o un cambio externo pueden haber movido
+                # filas: se vuelve a leer la hoja antes de reintentar
+                self.invalidate_row_index(sheet_name)
+                logger.warning(f"Error upserting events (attempt {attempt}/{self.WRITE_ATTEMPTS}): {e}")
+
+        logger.error(f"Giving up upserting events into sheet '{sheet_name}'")
+        return None
+
+    def _upsert_events_once(self, events: List[Dict], sheet_name: str) -> Dict:
+        """
+        Un intento de upsert_events a partir de una lectura nueva de la hoja
+
+        Args:
+            events: Lista completa de eventos que debe contener la hoja
+            sheet_name: Nombre de la hoja
+
+        Returns:
+            Diccionario con el número de filas insertadas, actualizadas,
+            eliminadas y sin cambios
+
+        Raises:
+            Exception: Si falla alguna lectura o escritura
+        """
+        # 1. Leer la hoja una sola vez, por páginas
+        existing = {}
+        free_rows = []
+        for current in self.iter_events(sheet_name, with_row_numbers=True):
+            row_number = current['_row']
+            row_id = current['id']
+            if not row_id or row_id in existing:
+                # Filas vacías o IDs repetidos: se reutilizan o se borran
+                free_rows.append(row_number)
+            else:
+                row = [current[field] for field in self.FIELDS]
+                existing[row_id] = (row_number, self.row_content_hash(row))
+
+        # 2. Calcular diferencias
+        desired = {}
+        for event in events:
+            row = self.event_to_row(event)
+            desired[row[0]] = row
+
+        updates = []
+        inserts = []
+        unchanged = 0
+        for row_id, row in desired.items():
+            if row_id in existing:
+                row_number, content_hash = existing[row_id]
+                if content_hash == self.row_content_hash(row):
+                    unchanged += 1
+                else:
+                    updates.append((row_number, row))
+            else:
+                inserts.append(row)
+
+        free_rows.extend(
+            row_number for row_id, (row_number, _) in existing.items()
+            if row_id not in desired
+        )
+        free_rows.sort()
+        deleted_count = max(0, len(free_rows) - len(inserts))
+
+        # Las filas nuevas ocupan primero los huecos de las eliminadas
+        reused = list(zip(free_rows, inserts))
+        rows_to_delete = free_rows[len(reused):]
+        rows_to_append = inserts[len(reused):]
+
+        # 3. Escribir modificaciones en un único batchUpdate de valores
+        data = [
+            {
+                'range': f"{sheet_name}!A{row_number}:L{row_number}",
+                'values': [row]
+            }
+            for row_number, row in updates + reused
+        ]
+        for item in data:
+            self.client.queue_update(item['range'], item['values'])
+        self.client.flush()
+
+        # 4. Añadir filas nuevas que no caben en los huecos
+        if rows_to_append:
+            self._execute(
+                self.service.spreadsheets().values().append(
+                    spreadsheetId=self.spreadsheet_id,
+                    range=f"{sheet_name}!A2",
+                    valueInputOption='RAW',
+                    insertDataOption='INSERT_ROWS',
+                    body={'values': rows_to_append}
+                ),
+                kind='write'
+            )
+
+        # 5. Borrar filas sobrantes (de abajo arriba para no desplazar índices)
+        if rows_to_delete:
+            sheet_id = self.get_sheet_id(sheet_name)
+            requests = [
+                {
+                    'deleteDimension': {
+                        'range': {
+                            'sheetId': sheet_id,
+                            'dimension': 'ROWS',
+                            'startIndex': start - 1,
+                            'endIndex': end
+                        }
+                    }
+                }
+                for start, end in self._contiguous_ranges(rows_to_delete)
+            ]
+            self._execute(
+                self.service.spreadsheets().batchUpdate(
+                    spreadsheetId=self.spreadsheet_id,
+                    body={'requests': requests}
+                ),
+                kind='write'
+            )
+
+        changes = {
+            'inserted': len(inserts),
+            'updated': len(updates),
+            'deleted': deleted_count,
+            'unchanged': unchanged
+        }
+        self.invalidate_row_index(sheet_name)
+        return changes
+
+    def iter_events(self, sheet_name: str = "Eventos Tercer Sector", columns: Optional[List[str]] = None,
+                    page_size: int = 1000, pages_per_request: int = 5,
+                    with_row_numbers: bool = False) -> Iterator[Dict]:
+        """
+        Recorre los eventos de la hoja por páginas, leyendo solo las columnas
+        indicadas
+
+        Cada petición es un values.batchGet con varias páginas y un rango por
+        cada grupo de columnas contiguas, de modo que la memoria usada no
+        depende del tamaño de la hoja.
+
+        Args:
+            sheet_name: Nombre de la hoja
+            columns: Campos a leer (p. ej. ['id', 'fecha']); None lee todos
+            page_size: Filas por página
+            pages_per_request: Páginas pedidas en cada batchGet
+            with_row_numbers: Si True, cada evento incluye su fila en '_row'
+
+        Yields:
+            Eventos con los campos solicitados
+
+        Raises:
+            ValueError: Si se pide un campo que no existe
+        """
+        if not self.service or not self.spreadsheet_id:
+            logger.error("Google Sheets not configured")
+            return
+
+        fields = list(columns) if columns else list(self.FIELDS)
+        unknown = [field for field in fields if field not in self.FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown columns: {unknown}")
+
+        # La columna de IDs se lee siempre para detectar el final de los datos,
+        # ya que la API recorta las celdas vacías al final de cada rango
+        requested = set(fields)
+        indexes = sorted({self.FIELDS.index(field) for field in fields} | {0})
+
+        # Agrupar columnas contiguas en rangos (inicio, fin) de índices
+        runs = []
+        for index in indexes:
+            if runs and runs[-1][1] == index - 1:
+                runs[-1] = (runs[-1][0], index)
+            else:
+                runs.append((index, index))
+
+        first_row = 2
+        while True:
+            pages = [
+                first_row + page * page_size
+                for page in range(pages_per_request)
+            ]
+            ranges = [
+                f"{sheet_name}!{self._column_letter(start)}{page_start}:"
+                f"{self._column_letter(end)}{page_start + page_size - 1}"
+                for page_start in pages
+                for start, end in runs
+            ]
+
+            result = self._execute(
+                self.service.spreadsheets().values().batchGet(
+                    spreadsheetId=self.spreadsheet_id,
+                    ranges=ranges,
+                    majorDimension='ROWS'
+                ),
+                kind='read'
+            )
+            value_ranges = result.get('valueRanges', [])
+
+            for page_number, page_start in enumerate(pages):
+                page_ranges = value_ranges[page_number * len(runs):(page_number + 1) * len(runs)]
+                page_values = [value_range.get('values', []) for value_range in page_ranges]
+                page_rows = max((len(values) for values in page_values), default=0)
+
+                for offset in range(page_rows):
+                    event = {}
+                    for (start, end), values in zip(runs, page_values):
+                        row = values[offset] if offset < len(values) else []
+                        for index in range(start, end + 1):
+                            if self.FIELDS[index] not in requested:
+                                continue
+                            position = index - start
+                            event[self.FIELDS[index]] = row[position] if position < len(row) else ''
+                    if with_row_numbers:
+                        event['_row'] = page_start + offset
+                    yield event
+
+                # Una página incompleta indica el final de los datos
+                if page_rows < page_size:
+                    return
+
+            first_row += pages_per_request * page_size
+
     def get_all_events(self, sheet_name: str = "Eventos Tercer Sector") -> List[Dict]:
         """
         Obtiene todos los eventos de la hoja
@@ -210,35 +651,7 @@ class GoogleSheetsManager:
             return []
 
         try:
-            result = self.service.spreadsheets().values().get(
-                spreadsheetId=self.spreadsheet_id,
-                range=f"{sheet_name}!A2:L"
-            ).execute()
-
-            rows = result.get('values', [])
-
-            events = []
-            for row in rows:
-                # Asegurar que la fila tenga todas las columnas
-                while len(row) < len(self.COLUMNS):
-                    row.append('')
-
-                event = {
-                    'id': row[0],
-                    'nombre': row[1],
-                    'entidad': row[2],
-                    'fecha': row[3],
-                    'hora': row[4],
-                    'modalidad': row[5],
-                    'lugar': row[6],
-                    'enlace': row[7],
-                    'pais': row[8],
-                    'categoria': row[9],
-                    'descripcion': row[10],
-                    'ultima_actualizacion': row[11]
-                }
-                events.append(event)
-
+            events = list(self.iter_events(sheet_name))
             logger.info(f"Retrieved {len(events)} events from sheet")
             return events
 
@@ -246,6 +659,148 @@ class GoogleSheetsManager:
             logger.error(f"Error getting events: {e}")
             return []
 
+    def get_row_index(self, sheet_name: str = "Eventos Tercer Sector", refresh: bool = False) -> Dict[str, int]:
+        """
+        Obtiene el índice ID -> número de fila de la hoja
+
+        El índice se construye leyendo solo la columna de IDs y se guarda en
+        caché hasta la siguiente escritura que mueva filas.
+
+        Args:
+            sheet_name: Nombre de la hoja
+            refresh: Si True, vuelve a leer la columna de IDs
+
+        Returns:
+            Diccionario ID -> número de fila (la primera fila de datos es la 2)
+        """
+        if refresh or sheet_name not in self._row_index:
+            index = {}
+            for event in self.iter_events(sheet_name, columns=['id'], page_size=5000, with_row_numbers=True):
+                if event['id'] and event['id'] not in index:
+                    index[event['id']] = event['_row']
+            self._row_index[sheet_name] = index
+
+        return self._row_index[sheet_name]
+
+    def invalidate_row_index(self, sheet_name: Optional[str] = None):
+        """
+        Invalida el índice ID -> fila tras una escritura que mueve filas
+
+        Args:
+            sheet_name: Nombre de la hoja (None invalida todas)
+        """
+        if sheet_name is None:
+            self._row_index.clear()
+        else:
+            self._row_index.pop(sheet_name, None)
+
+    @staticmethod
+    def _column_letter(column_index: int) -> str:
+        """Letra de columna (0 -> A) para las columnas del sheet"""
+        return chr(ord('A') + column_index)
+
+    def update_events(self, patches: Dict[str, Dict], sheet_name: str = "Eventos Tercer Sector") -> Dict[str, bool]:
+        """
+        Actualiza varios eventos existentes con una sola lectura y una sola
+        escritura
+
+        Solo se escriben las celdas de los campos modificados y la columna de
+        última actualización, agrupando columnas contiguas en un mismo rango.
+
+        Args:
+            patches: Diccionario ID -> campos a actualizar
+            sheet_name: Nombre de la hoja
+
+        Returns:
+            Diccionario ID -> True si se actualizó, False si no se encontró
+        """
+        if not self.service or not self.spreadsheet_id:
+            return {event_id: False for event_id in patches}
+
+        if not patches:
+            return {}
+
+        for attempt in range(1, self.WRITE_ATTEMPTS + 1):
+            try:
+                updated = self._update_events_once(patches, sheet_name)
+                logger.info(f"Updated {sum(updated.values())} of {len(patches)} events")
+                return updated
+            except Exception as e:
+                # Las filas pueden haberse movido: recalcular el índice y reintentar
+                self.invalidate_row_index(sheet_name)
+                logger.warning(f"Error updating events (attempt {attempt}/{self.WRITE_ATTEMPTS}): {e}")
+
+        logger.error(f"Giving up updating {len(patches)} events in sheet '{sheet_name}'")
+        return {event_id: False for event_id in patches}
+
+    def _update_events_once(self, patches: Dict[str, Dict], sheet_name: str) -> Dict[str, bool]:
+        """
+        Un intento de update_events con el índice de filas actual
+
+        Args:
+            patches: Diccionario ID -> campos a actualizar
+            sheet_name: Nombre de la hoja
+
+        Returns:
+            Diccionario ID -> True si se actualizó, False si no se encontró
+
+        Raises:
+            Exception: Si falla alguna lectura o escritura
+        """
+        index = self.get_row_index(sheet_name)
+        if any(event_id not in index for event_id in patches):
+            # El índice puede estar desactualizado por cambios externos
+            index = self.get_row_index(sheet_name, refresh=True)
+
+        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        timestamp_column = self.FIELDS.index('ultima_actualizacion')
+
+        data = []
+        updated = {}
+        for event_id, patch in patches.items():
+            row_number = index.get(event_id)
+            if row_number is None:
+                logger.warning(f"Event {event_id} not found")
+                updated[event_id] = False
+                continue
+
+            cells = {}
+            for field, value in patch.items():
+                if field in self.FIELDS:
+                    cells[self.FIELDS.index(field)] = value
+                else:
+                    logger.warning(f"Ignoring unknown field '{field}' for event {event_id}")
+            cells[timestamp_column] = timestamp
+
+            # Agrupar columnas contiguas en un único rango
+            columns = sorted(cells)
+            run = [columns[0]]
+            for column in columns[1:] + [None]:
+                if column is not None and column == run[-1] + 1:
+                    run.append(column)
+                    continue
+                data.append({
+                    'range': (
+                        f"{sheet_name}!{self._column_letter(run[0])}{row_number}:"
+                        f"{self._column_letter(run[-1])}{row_number}"
+                    ),
+                    'values': [[cells[c] for c in run]]
+                })
+                if column is not None:
+                    run = [column]
+
+            updated[event_id] = True
+
+        for item in data:
+            self.client.queue_update(item['range'], item['values'])
+        self.client.flush()
+
+        # Si cambia algún ID, el índice deja de ser válido
+        if any('id' in patch and patch['id'] != event_id for event_id, patch in patches.items()):
+            self.invalidate_row_index(sheet_name)
+
+        return updated
+
     def update_event(self, event_id: str, updated_data: Dict, sheet_name: str = "Eventos Tercer Sector") -> bool:
         """
         Actualiza un evento existente
@@ -258,40 +813,7 @@ class GoogleSheetsManager:
         Returns:
             True si se actualizó exitosamente
         """
-        if not self.service or not self.spreadsheet_id:
-            return False
-
-        try:
-            # Obtener todos los eventos
-            events = self.get_all_events(sheet_name)
-
-            # Buscar el índice del evento
-            for i, event in enumerate(events):
-                if event['id'] == event_id:
-                    # Actualizar datos
-                    event.update(updated_data)
-                    event['ultima_actualizacion'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-
-                    # Actualizar fila (i+2 porque hay encabezado y las filas empiezan en 1)
-                    row_number = i + 2
-                    row_data = self.event_to_row(event)
-
-                    self.service.spreadsheets().values().update(
-                        spreadsheetId=self.spreadsheet_id,
-                        range=f"{sheet_name}!A{row_number}:L{row_number}",
-                        valueInputOption='RAW',
-                        body={'values': [row_data]}
-                    ).execute()
-
-                    logger.info(f"Updated event {event_id}")
-                    return True
-
-            logger.warning(f"Event {event_id} not found")
-            return False
-
-        except Exception as e:
-            logger.error(f"Error updating event: {e}")
-            return False
+        return self.update_events({event_id: updated_data}, sheet_name).get(event_id, False)
 
     def clear_sheet(self, sheet_name: str = "Eventos Tercer Sector") -> bool:
         """
@@ -307,11 +829,15 @@ class GoogleSheetsManager:
             return False
 
         try:
-            self.service.spreadsheets().values().clear(
-                spreadsheetId=self.spreadsheet_id,
-                range=f"{sheet_name}!A2:L"
-            ).execute()
+            self._execute(
+                self.service.spreadsheets().values().clear(
+                    spreadsheetId=self.spreadsheet_id,
+                    range=f"{sheet_name}!A2:L"
+                ),
+                kind='write'
+            )
 
+            self.invalidate_row_index(sheet_name)
             logger.info(f"Cleared sheet '{sheet_name}'")
             return True
 
@@ -0,0 +1,282 @@
+"""
+Cliente de Google Sheets con control de cuota, agrupación de escrituras y reintentos
+"""
+import logging
+import random
+import re
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Códigos HTTP que merece la pena reintentar
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+_A1_RANGE = re.compile(r"^(?P<sheet>.+)!(?P<c1>[A-Z]+)(?P<r1>\d+):(?P<c2>[A-Z]+)(?P<r2>\d+)$")
+
+
+class TokenBucket:
+    """
+    Limitador de ritmo por cubo de fichas
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        """
+        Inicializa el cubo
+
+        Args:
+            rate_per_minute: Fichas repuestas por minuto
+            capacity: Máximo de fichas acumulables (por defecto, una ráfaga de 1/6 de minuto)
+            clock: Reloj monótono (inyectable para pruebas)
+            sleep: Función de espera (inyectable para pruebas)
+        """
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or max(1.0, rate_per_minute / 6.0)
+        self.tokens = self.capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.updated_at = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def acquire(self) -> float:
+        """
+        Consume una ficha, esperando si no hay disponibles
+
+        Returns:
+            Segundos esperados
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            self.sleep(delay)
+            waited += delay
+
+    def available(self) -> float:
+        """Fichas disponibles ahora mismo"""
+        with self._lock:
+            self._refill()
+            return self.tokens
+
+
+class SheetsClient:
+    """
+    Envoltorio del servicio de Google Sheets.
+
+    Todas las peticiones pasan por execute(), que aplica el ritmo de la cuota
+    documentada (60 lecturas y 60 escrituras por minuto y usuario) y
+    reintenta errores 429/5xx con backoff exponencial con jitter. Las
+    escrituras de valores pueden encolarse con queue_update() y se envían
+    juntas con flush(), fusionando rangos de filas adyacentes. El servicio
+    se inyecta, por lo que puede sustituirse por uno falso en pruebas.
+    """
+
+    def __init__(self, service, spreadsheet_id: str, read_per_minute: int = 60,
+                 write_per_minute: int = 60, max_retries: int = 5, base_backoff: float = 1.0,
+                 max_backoff: float = 64.0, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        """
+        Inicializa el cliente
+
+        Args:
+            service: Servicio de la API de Sheets (resultado de build())
+            spreadsheet_id: ID de la hoja de cálculo
+            read_per_minute: Cuota de lecturas por minuto
+            write_per_minute: Cuota de escrituras por minuto
+            max_retries: Reintentos máximos por petición
+            base_backoff: Espera base entre reintentos (segundos)
+            max_backoff: Espera máxima entre reintentos (segundos)
+            clock: Reloj monótono (inyectable para pruebas)
+            sleep: Función de espera (inyectable para pruebas)
+        """
+        self.service = service
+        self.spreadsheet_id = spreadsheet_id
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.sleep = sleep
+
+        self.buckets = {
+            'read': TokenBucket(read_per_minute, clock=clock, sleep=sleep),
+            'write': TokenBucket(write_per_minute, clock=clock, sleep=sleep)
+        }
+
+        self._pending_writes: List[Dict] = []
+        self._lock = threading.Lock()
+        self._metrics = {
+            'read_requests': 0,
+            'write_requests': 0,
+            'retries': 0,
+            'rate_limited_responses': 0,
+            'failed_requests': 0,
+            'throttled_seconds': 0.0,
+            'queued_writes': 0,
+            'merged_writes': 0,
+            'dropped_writes': 0
+        }
+
+    @staticmethod
+    def _status_of(error: Exception) -> Optional[int]:
+        """Código HTTP de un error de la API (HttpError expone resp.status)"""
+        status = getattr(getattr(error, 'resp', None), 'status', None)
+        try:
+            return int(status) if status is not None else None
+        except (TypeError, ValueError):
+            return None
+
+    def _is_retryable(self, error: Exception) -> bool:
+        status = self._status_of(error)
+        if status is not None:
+            return status in RETRYABLE_STATUS
+        # Errores de red sin respuesta HTTP
+        return isinstance(error, (ConnectionError, TimeoutError, OSError))
+
+    def _count(self, metric: str, amount: float = 1):
+        with self._lock:
+            self._metrics[metric] += amount
+
+    def execute(self, request, kind: str = 'read'):
+        """
+        Ejecuta una petición respetando la cuota y con reintentos
+
+        Args:
+            request: Petición de la API (objeto con execute())
+            kind: 'read' o 'write', según la cuota que consume
+
+        Returns:
+            Respuesta de la API
+
+        Raises:
+            Exception: El último error si se agotan los reintentos o no es reintentable
+        """
+        for attempt in range(self.max_retries + 1):
+            self._count('throttled_seconds', self.buckets[kind].acquire())
+            self._count(f'{kind}_requests')
+
+            try:
+                return request.execute()
+            except Exception as e:
+                if self._status_of(e) == 429:
+                    self._count('rate_limited_responses')
+
+                if attempt >= self.max_retries or not self._is_retryable(e):
+                    self._count('failed_requests')
+                    raise
+
+                delay = random.uniform(0, min(self.max_backoff, self.base_backoff * (2 ** attempt)))
+                self._count('retries')
+                logger.warning(
+                    f"Sheets {kind} request failed ({e}), retry {attempt + 1}/{self.max_retries} in {delay:.1f}s"
+                )
+                self.sleep(delay)
+
+    def queue_update(self, range_name: str, values: List[List]):
+        """
+        Encola una escritura de valores para enviarla en el siguiente flush()
+
+        Args:
+            range_name: Rango en notación A1 (p. ej. 'Hoja!A5:L5')
+            values: Filas de valores
+        """
+        with self._lock:
+            self._pending_writes.append({'range': range_name, 'values': values})
+            self._metrics['queued_writes'] += 1
+
+    @staticmethod
+    def _parse_range(range_name: str) -> Optional[Tuple[str, str, int, str, int]]:
+        match = _A1_RANGE.match(range_name)
+        if not match:
+            return None
+        return (match['sheet'], match['c1'], int(match['r1']), match['c2'], int(match['r2']))
+
+    def _merge_adjacent(self, writes: List[Dict]) -> List[Dict]:
+        """Fusiona escrituras de filas consecutivas con las mismas columnas"""
+        parsed = []
+        unmergeable = []
+        for write in writes:
+            bounds = self._parse_range(write['range'])
+            if bounds and len(write['values']) == bounds[4] - bounds[2] + 1:
+                parsed.append((bounds, write['values']))
+            else:
+                unmergeable.append(write)
+
+        # Una escritura posterior sobre las mismas filas prevalece
+        parsed.sort(key=lambda item: (item[0][0], item[0][1], item[0][3], item[0][2]))
+
+        merged: List[Tuple[list, List[List]]] = []
+        for bounds, values in parsed:
+            sheet, c1, r1, c2, r2 = bounds
+            if merged:
+                (m_sheet, m_c1, m_r1, m_c2, m_r2), m_values = merged[-1]
+                if (m_sheet, m_c1, m_c2) == (sheet, c1, c2) and r1 == m_r2 + 1:
+                    merged[-1] = ([m_sheet, m_c1, m_r1, m_c2, r2], m_values + values)
+                    continue
+            merged.append((list(bounds), list(values)))
+
+        result = [
+            {'range': f"{sheet}!{c1}{r1}:{c2}{r2}", 'values': values}
+            for (sheet, c1, r1, c2, r2), values in merged
+        ]
+        self._count('merged_writes', len(parsed) - len(merged))
+        return result + unmergeable
+
+    def flush(self, value_input_option: str = 'RAW') -> int:
+        """
+        Envía todas las escrituras encoladas en un único values.batchUpdate
+
+        Args:
+            value_input_option: Modo de interpretación de los valores
+
+        Returns:
+            Número de rangos enviados
+
+        Raises:
+            Exception: Si falla el envío. El lote se descarta: sus rangos se
+                calcularon con filas que pueden haber cambiado, así que quien
+                llama debe recalcularlos y volver a encolarlos
+        """
+        with self._lock:
+            writes, self._pending_writes = self._pending_writes, []
+
+        if not writes:
+            return 0
+
+        data = self._merge_adjacent(writes)
+        try:
+            self.execute(
+                self.service.spreadsheets().values().batchUpdate(
+                    spreadsheetId=self.spreadsheet_id,
+                    body={'valueInputOption': value_input_option, 'data': data}
+                ),
+                kind='write'
+            )
+        except Exception:
+            self._count('dropped_writes', len(writes))
+            raise
+        return len(data)
+
+    def metrics(self) -> Dict:
+        """
+        Métricas de uso de la cuota
+
+        Returns:
+            Diccionario con contadores de peticiones, reintentos, esperas y
+            fichas disponibles por tipo de cuota
+        """
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics['pending_writes'] = len(self._pending_writes)
+        metrics['read_tokens_available'] = round(self.buckets['read'].available(), 2)
+        metrics['write_tokens_available'] = round(self.buckets['write'].available(), 2)
+        return metrics
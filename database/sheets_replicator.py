@@ -0,0 +1,192 @@
+"""
+Replicación asíncrona (write-behind) del almacén SQLite a Google Sheets
+"""
+import logging
+import random
+import threading
+import time
+from datetime import datetime
+from typing import Optional
+
+from database.sqlite_store import SQLiteEventStore
+from database.google_sheets_manager import GoogleSheetsManager
+
+logger = logging.getLogger(__name__)
+
+
+class SheetsReplicator:
+    """
+    Replica el almacén local en Google Sheets desde una cola persistente.
+
+    Cada escritura en el almacén encola su versión en la tabla
+    replication_queue. Un hilo en segundo plano agrupa las versiones
+    pendientes, sincroniza la hoja con upsert_events (que solo escribe las
+    diferencias) y reintenta con backoff si Sheets falla. Lo que no se
+    consiga replicar queda en la cola para la siguiente ejecución.
+    """
+
+    def __init__(self, store: SQLiteEventStore, sheets_manager: GoogleSheetsManager,
+                 sheet_name: str = "Eventos Tercer Sector", batch_delay: float = 2.0,
+                 max_retries: int = 5, base_backoff: float = 2.0, max_backoff: float = 120.0):
+        """
+        Inicializa el replicador
+
+        Args:
+            store: Almacén SQLite de origen
+            sheets_manager: Gestor de Google Sheets de destino
+            sheet_name: Nombre de la hoja
+            batch_delay: Segundos de espera para agrupar escrituras consecutivas
+            max_retries: Reintentos por lote antes de dejarlo para más tarde
+            base_backoff: Espera inicial entre reintentos (segundos)
+            max_backoff: Espera máxima entre reintentos (segundos)
+        """
+        self.store = store
+        self.sheets_manager = sheets_manager
+        self.sheet_name = sheet_name
+        self.batch_delay = batch_delay
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+
+        self._wakeup = threading.Event()
+        self._idle = threading.Event()
+        self._idle.set()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        with self.store._lock, self.store.conn:
+            self.store.conn.execute("""
+                CREATE TABLE IF NOT EXISTS replication_queue (
+                    version INTEGER PRIMARY KEY,
+                    enqueued_at TEXT,
+                    attempts INTEGER DEFAULT 0,
+                    last_error TEXT
+                )
+            """)
+
+    def pending_versions(self) -> int:
+        """Número de versiones pendientes de replicar"""
+        with self.store._lock:
+            return self.store.conn.execute("SELECT COUNT(*) FROM replication_queue").fetchone()[0]
+
+    def enqueue(self, version: Optional[int] = None):
+        """
+        Encola la replicación de una versión del almacén
+
+        Args:
+            version: Versión a replicar (por defecto la actual)
+        """
+        version = self.store.dataset_version() if version is None else version
+        with self.store._lock, self.store.conn:
+            self.store.conn.execute(
+                "INSERT OR IGNORE INTO replication_queue (version, enqueued_at) VALUES (?, ?)",
+                (version, datetime.now().isoformat())
+            )
+        self._idle.clear()
+        self.start()
+        self._wakeup.set()
+
+    def start(self):
+        """Arranca el hilo de replicación si no está en marcha"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sheets-replicator", daemon=True)
+        self._thread.start()
+        if self.pending_versions():
+            self._idle.clear()
+            self._wakeup.set()
+
+    def _run(self):
+        """Bucle del hilo de replicación"""
+        while not self._stop.is_set():
+            self._wakeup.wait()
+            self._wakeup.clear()
+            if self._stop.is_set():
+                break
+
+            # Agrupar escrituras que lleguen seguidas en una sola replicación
+            time.sleep(self.batch_delay)
+            self._wakeup.clear()
+
+            if self.pending_versions():
+                self._replicate_pending()
+
+            if not self.pending_versions() or not self._wakeup.is_set():
+                self._idle.set()
+
+    def _replicate_pending(self) -> bool:
+        """Replica la última versión pendiente, con reintentos y backoff"""
+        with self.store._lock:
+            target = self.store.conn.execute("SELECT MAX(version) FROM replication_queue").fetchone()[0]
+
+        for attempt in range(1, self.max_retries + 1):
+            if self._stop.is_set():
+                return False
+
+            error = None
+            try:
+                changes = self.sheets_manager.upsert_events(self.store.get_all_events(), self.sheet_name)
+                if changes is None:
+                    error = "upsert_events failed"
+            except Exception as e:
+                error = str(e)
+
+            if error is None:
+                with self.store._lock, self.store.conn:
+                    self.store.conn.execute("DELETE FROM replication_queue WHERE version <= ?", (target,))
+                    self.store.conn.execute(
+                        "INSERT INTO meta (key, value) VALUES ('sheets_replicated_version', ?) "
+                        "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                        (str(target),)
+                    )
+                logger.info(f"Replicated dataset version {target} to Google Sheets: {changes}")
+                return True
+
+            with self.store._lock, self.store.conn:
+                self.store.conn.execute(
+                    "UPDATE replication_queue SET attempts = attempts + 1, last_error = ? WHERE version <= ?",
+                    (error, target)
+                )
+
+            # Backoff exponencial con jitter
+            delay = min(self.max_backoff, self.base_backoff * (2 ** (attempt - 1)))
+            delay = random.uniform(delay / 2, delay)
+            logger.warning(
+                f"Sheets replication attempt {attempt}/{self.max_retries} failed: {error}. "
+                f"Retrying in {delay:.1f}s"
+            )
+            if self._stop.wait(delay):
+                return False
+
+        logger.error(f"Sheets replication of version {target} postponed after {self.max_retries} attempts")
+        return False
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Espera a que la cola de replicación se vacíe
+
+        Args:
+            timeout: Tiempo máximo de espera en segundos (None = sin límite)
+
+        Returns:
+            True si no quedan versiones pendientes
+        """
+        if self.pending_versions():
+            self.start()
+            self._idle.clear()
+            self._wakeup.set()
+        self._idle.wait(timeout)
+        return self.pending_versions() == 0
+
+    def stop(self, timeout: Optional[float] = 10):
+        """
+        Detiene el hilo de replicación (lo pendiente queda en la cola)
+
+        Args:
+            timeout: Tiempo máximo de espera en segundos
+        """
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout)
@@ -0,0 +1,242 @@
+"""
+Instantánea de eventos en un archivo binario de solo lectura, mapeado en memoria
+
+Formato (little endian):
+    - 8 bytes: SNAPSHOT_MAGIC
+    - 4 bytes: longitud de la cabecera JSON
+    - cabecera JSON: versión, número de eventos, secciones y listas de posiciones
+    - secciones alineadas a 8 bytes:
+        dates          fechas YYYY-MM-DD de ancho fijo (10 bytes)
+        id_offsets     desplazamientos (uint64) de cada id dentro de ids
+        ids            ids en UTF-8
+        event_offsets  desplazamientos (uint64) de cada evento dentro de events
+        events         eventos en JSON UTF-8
+        postings       posiciones (uint32) de los índices por país y categoría
+
+Todos los procesos que abren el mismo archivo comparten sus páginas (la
+caché de páginas del sistema operativo), en lugar de tener cada uno su
+copia de los eventos. El archivo se publica escribiendo uno temporal y
+renombrándolo, así que un lector ve siempre una versión completa.
+"""
+import json
+import mmap
+import os
+import struct
+from array import array
+from typing import Dict, List, Sequence
+
+SNAPSHOT_MAGIC = b'SIRIASN1'
+
+_DATE_WIDTH = 10
+_ALIGNMENT = 8
+
+
+def _offsets(blobs: List[bytes]) -> array:
+    offsets = array('Q', [0])
+    total = 0
+    for blob in blobs:
+        total += len(blob)
+        offsets.append(total)
+    return offsets
+
+
+def write_snapshot(path: str, version, etag_seed: str, dates: List[str], ids: List[str],
+                   events: List[Dict], postings: Dict[str, Dict[str, List[int]]]) -> int:
+    """
+    Escribe una instantánea de forma atómica
+
+    Args:
+        path: Ruta del archivo
+        version: Versión del conjunto de eventos (o None)
+        etag_seed: Semilla de los ETag de esta versión
+        dates: Fecha de cada evento, en orden
+        ids: ID de cada evento, en orden
+        events: Eventos ordenados por fecha e id
+        postings: Índices invertidos ({nombre: {valor: posiciones}})
+
+    Returns:
+        Tamaño del archivo en bytes
+    """
+    id_blobs = [event_key.encode('utf-8') for event_key in ids]
+    event_blobs = [
+        json.dumps(event, ensure_ascii=False, separators=(',', ':'), default=str).encode('utf-8')
+        for event in events
+    ]
+
+    positions = array('I')
+    posting_ranges: Dict[str, Dict[str, List[int]]] = {}
+    for name, index in postings.items():
+        posting_ranges[name] = {}
+        for value, value_positions in index.items():
+            posting_ranges[name][value] = [len(positions), len(value_positions)]
+            positions.extend(value_positions)
+
+    sections = [
+        ('dates', ''.join(dates).encode('ascii')),
+        ('id_offsets', _offsets(id_blobs).tobytes()),
+        ('ids', b''.join(id_blobs)),
+        ('event_offsets', _offsets(event_blobs).tobytes()),
+        ('events', b''.join(event_blobs)),
+        ('postings', positions.tobytes())
+    ]
+
+    # Las secciones empiezan tras la cabecera, cuyo tamaño depende de los desplazamientos
+    layout: Dict[str, List[int]] = {}
+    header = b''
+    for _ in range(5):
+        position = len(SNAPSHOT_MAGIC) + 4 + len(header)
+        for name, data in sections:
+            position += -position % _ALIGNMENT
+            layout[name] = [position, len(data)]
+            position += len(data)
+        new_header = json.dumps({
+            'version': version,
+            'etag_seed': etag_seed,
+            'count': len(events),
+            'sections': layout,
+            'postings': posting_ranges
+        }, ensure_ascii=False).encode('utf-8')
+        stable = len(new_header) == len(header)
+        header = new_header
+        if stable:
+            break
+
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(SNAPSHOT_MAGIC)
+            f.write(struct.pack('<I', len(header)))
+            f.write(header)
+            for name, data in sections:
+                f.write(b'\0' * (layout[name][0] - f.tell()))
+                f.write(data)
+            size = f.tell()
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return size
+
+
+class _Dates(Sequence):
+    """Fechas de ancho fijo leídas del mapa"""
+
+    def __init__(self, data: memoryview, count: int):
+        self._data = data
+        self._count = count
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[i] for i in range(*position.indices(self._count))]
+        if position < 0:
+            position += self._count
+        start = position * _DATE_WIDTH
+        return bytes(self._data[start:start + _DATE_WIDTH]).decode('ascii')
+
+
+class _Blobs(Sequence):
+    """Valores de longitud variable (desplazamientos + datos) leídos del mapa"""
+
+    def __init__(self, offsets: memoryview, data: memoryview, count: int, decode):
+        self._offsets = offsets
+        self._data = data
+        self._count = count
+        self._decode = decode
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[i] for i in range(*position.indices(self._count))]
+        if position < 0:
+            position += self._count
+        if not 0 <= position < self._count:
+            raise IndexError(position)
+        return self._decode(self._data[self._offsets[position]:self._offsets[position + 1]])
+
+
+class _Keys(Sequence):
+    """Claves (fecha, id) para la paginación por cursor"""
+
+    def __init__(self, dates: _Dates, ids: _Blobs):
+        self._dates = dates
+        self._ids = ids
+
+    def __len__(self) -> int:
+        return len(self._dates)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[i] for i in range(*position.indices(len(self)))]
+        return (self._dates[position], self._ids[position])
+
+
+class SnapshotFile:
+    """
+    Vista de solo lectura de un archivo de instantánea.
+
+    Las secuencias (dates, keys, events) y las listas de posiciones se leen
+    directamente del mapa; solo se decodifican los eventos que se piden.
+    """
+
+    def __init__(self, path: str):
+        """
+        Abre y mapea el archivo
+
+        Args:
+            path: Ruta del archivo
+
+        Raises:
+            ValueError: Si el archivo no es una instantánea válida
+        """
+        self.path = path
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            self.signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        view = memoryview(self._map)
+        if bytes(view[:len(SNAPSHOT_MAGIC)]) != SNAPSHOT_MAGIC:
+            raise ValueError(f"Not an event snapshot file: {path}")
+        header_start = len(SNAPSHOT_MAGIC) + 4
+        (header_length,) = struct.unpack_from('<I', self._map, len(SNAPSHOT_MAGIC))
+        header = json.loads(bytes(view[header_start:header_start + header_length]))
+
+        self.version = header['version']
+        self.etag_seed = header['etag_seed']
+        self.count = header['count']
+
+        def section(name: str) -> memoryview:
+            start, length = header['sections'][name]
+            return view[start:start + length]
+
+        self.dates = _Dates(section('dates'), self.count)
+        self.ids = _Blobs(
+            section('id_offsets').cast('Q'), section('ids'), self.count,
+            lambda data: str(data, 'utf-8')
+        )
+        self.keys = _Keys(self.dates, self.ids)
+        self.events = _Blobs(
+            section('event_offsets').cast('Q'), section('events'), self.count,
+            lambda data: json.loads(bytes(data))
+        )
+
+        positions = section('postings').cast('I')
+        self.postings = {
+            name: {value: positions[start:start + length] for value, (start, length) in index.items()}
+            for name, index in header['postings'].items()
+        }
+
+    def __len__(self) -> int:
+        return self.count
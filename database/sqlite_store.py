@@ -0,0 +1,270 @@
+"""
+Almacén local de eventos en SQLite (sistema de registro del pipeline)
+"""
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+from utils.event_ids import event_id
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteEventStore:
+    """
+    Almacena los eventos en una base de datos SQLite local con índices por
+    fecha, país, categoría y entidad. Google Sheets pasa a ser una réplica
+    (ver SheetsReplicator).
+    """
+
+    # Campos de evento almacenados, en el mismo orden que las columnas del sheet
+    FIELDS = [
+        'id',
+        'nombre',
+        'entidad',
+        'fecha',
+        'hora',
+        'modalidad',
+        'lugar',
+        'enlace',
+        'pais',
+        'categoria',
+        'descripcion'
+    ]
+
+    def __init__(self, db_path: Optional[str] = None):
+        """
+        Inicializa el almacén
+
+        Args:
+            db_path: Ruta de la base de datos (por defecto SIRIA_DB_PATH o ./data/siria_events.db)
+        """
+        self.db_path = db_path or os.getenv('SIRIA_DB_PATH', './data/siria_events.db')
+
+        directory = os.path.dirname(self.db_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+            logger.info(f"Created data directory: {directory}")
+
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_schema()
+
+    def _create_schema(self):
+        """Crea tablas e índices si no existen"""
+        columns = ',\n'.join(f"{field} TEXT" for field in self.FIELDS[1:])
+        with self.conn:
+            self.conn.executescript(f"""
+                CREATE TABLE IF NOT EXISTS events (
+                    id TEXT PRIMARY KEY,
+                    {columns},
+                    content_hash TEXT,
+                    updated_at TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_events_fecha ON events (fecha);
+                CREATE INDEX IF NOT EXISTS idx_events_pais ON events (pais);
+                CREATE INDEX IF NOT EXISTS idx_events_categoria ON events (categoria);
+                CREATE INDEX IF NOT EXISTS idx_events_entidad ON events (entidad);
+
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                );
+            """)
+
+    def _event_values(self, event: Dict) -> List[str]:
+        """Valores de los campos almacenados de un evento"""
+        values = [event.get('id') or event_id(event)]
+        values += [str(event.get(field) or '') for field in self.FIELDS[1:]]
+        return values
+
+    @staticmethod
+    def _content_hash(values: List[str]) -> str:
+        return hashlib.blake2b('\x1f'.join(values).encode('utf-8'), digest_size=16).hexdigest()
+
+    def get_meta(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        """Lee un valor de la tabla de metadatos"""
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row['value'] if row else default
+
+    def set_meta(self, key: str, value: str):
+        """Escribe un valor en la tabla de metadatos"""
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO meta (key, value) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (key, value)
+            )
+
+    def dataset_version(self) -> int:
+        """
+        Versión del conjunto de eventos; aumenta con cada escritura que lo cambia
+
+        Returns:
+            Número de versión (0 si el almacén está vacío)
+        """
+        return int(self.get_meta('dataset_version', '0'))
+
+    def replace_events(self, events: List[Dict]) -> Dict:
+        """
+        Sustituye el conjunto de eventos por el indicado, escribiendo solo las
+        diferencias (por ID y hash de contenido) en una única transacción
+
+        Args:
+            events: Lista completa de eventos
+
+        Returns:
+            Diccionario con eventos insertados, actualizados, eliminados,
+            sin cambios y la versión resultante
+        """
+        now = datetime.now().isoformat()
+
+        desired = {}
+        for event in events:
+            values = self._event_values(event)
+            desired[values[0]] = values
+
+        with self._lock, self.conn:
+            current = {
+                row['id']: row['content_hash']
+                for row in self.conn.execute("SELECT id, content_hash FROM events")
+            }
+
+            upserts = []
+            inserted = updated = unchanged = 0
+            for event_key, values in desired.items():
+                content_hash = self._content_hash(values)
+                if event_key not in current:
+                    inserted += 1
+                elif current[event_key] != content_hash:
+                    updated += 1
+                else:
+                    unchanged += 1
+                    continue
+                upserts.append(values + [content_hash, now])
+
+            deleted = [(event_key,) for event_key in current if event_key not in desired]
+
+            placeholders = ', '.join('?' * (len(self.FIELDS) + 2))
+            assignments = ', '.join(
+                f"{field} = excluded.{field}" for field in self.FIELDS[1:] + ['content_hash', 'updated_at']
+            )
+            self.conn.executemany(
+                f"INSERT INTO events ({', '.join(self.FIELDS)}, content_hash, updated_at) "
+                f"VALUES ({placeholders}) ON CONFLICT(id) DO UPDATE SET {assignments}",
+                upserts
+            )
+            self.conn.executemany("DELETE FROM events WHERE id = ?", deleted)
+
+            version = self.dataset_version()
+            if upserts or deleted:
+                version += 1
+                self.conn.execute(
+                    "INSERT INTO meta (key, value) VALUES ('dataset_version', ?) "
+                    "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                    (str(version),)
+                )
+
+        changes = {
+            'inserted': inserted,
+            'updated': updated,
+            'deleted': len(deleted),
+            'unchanged': unchanged,
+            'version': version
+        }
+        logger.info(f"Stored events in {self.db_path}: {changes}")
+        return changes
+
+    def _row_to_event(self, row: sqlite3.Row) -> Dict:
+        event = {field: row[field] for field in self.FIELDS}
+        event['ultima_actualizacion'] = row['updated_at']
+        return event
+
+    def iter_events(self, batch_size: int = 1000) -> Iterator[Dict]:
+        """
+        Recorre todos los eventos ordenados por fecha sin cargarlos todos en memoria
+
+        Args:
+            batch_size: Número de filas leídas por lote
+
+        Yields:
+            Eventos
+        """
+        last_key = ('', '')
+        while True:
+            with self._lock:
+                rows = self.conn.execute(
+                    "SELECT * FROM events WHERE (fecha, id) > (?, ?) "
+                    "ORDER BY fecha, id LIMIT ?",
+                    (*last_key, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield self._row_to_event(row)
+            last_key = (rows[-1]['fecha'], rows[-1]['id'])
+
+    def get_all_events(self) -> List[Dict]:
+        """
+        Obtiene todos los eventos ordenados por fecha
+
+        Returns:
+            Lista de eventos
+        """
+        with self._lock:
+            rows = self.conn.execute("SELECT * FROM events ORDER BY fecha, id").fetchall()
+        return [self._row_to_event(row) for row in rows]
+
+    def query_events(self, from_date: Optional[str] = None, to_date: Optional[str] = None,
+                     pais: Optional[str] = None, categoria: Optional[str] = None,
+                     entidad: Optional[str] = None) -> List[Dict]:
+        """
+        Consulta eventos usando los índices
+
+        Args:
+            from_date: Fecha mínima (YYYY-MM-DD)
+            to_date: Fecha máxima (YYYY-MM-DD)
+            pais: País exacto
+            categoria: Categoría exacta
+            entidad: Entidad exacta
+
+        Returns:
+            Lista de eventos ordenados por fecha
+        """
+        conditions = []
+        params = []
+        if from_date:
+            conditions.append("fecha >= ?")
+            params.append(from_date)
+        if to_date:
+            conditions.append("fecha <= ?")
+            params.append(to_date)
+        for field, value in (('pais', pais), ('categoria', categoria), ('entidad', entidad)):
+            if value:
+                conditions.append(f"{field} = ?")
+                params.append(value)
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT * FROM events {where} ORDER BY fecha, id", params
+            ).fetchall()
+        return [self._row_to_event(row) for row in rows]
+
+    def count(self) -> int:
+        """Número de eventos almacenados"""
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+
+    def close(self):
+        """Cierra la conexión con la base de datos"""
+        with self._lock:
+            self.conn.close()
@@ -0,0 +1,67 @@
+"""
+Configuración de gunicorn para servir la API en producción
+
+    gunicorn -c gunicorn.conf.py app:app
+
+Con SERVER_PRESET=local escucha solo en localhost, usa dos workers y se
+recarga al cambiar el código (para desarrollo en Linux/macOS; en Windows,
+python app.py).
+
+Cada worker es un proceso independiente; los eventos no se copian en
+cada uno, sino que todos mapean el mismo archivo de instantánea
+(EVENT_SNAPSHOT_PATH), que se publica antes de arrancar los workers y tras
+cada actualización semanal. La excepción es el índice de /search, que cada
+worker construye en su memoria la primera vez que lo necesita.
+
+La cola de correo también funciona por worker: cada uno arranca MAIL_WORKERS
+hilos de envío con su propia conexión SMTP (WEB_CONCURRENCY x MAIL_WORKERS
+conexiones como máximo); las reservas de la cola evitan envíos duplicados.
+"""
+import multiprocessing
+import os
+
+PRESET = os.getenv('SERVER_PRESET', 'production')
+
+if PRESET == 'local':
+    bind = f"127.0.0.1:{os.getenv('PORT', '8000')}"
+    workers = int(os.getenv('WEB_CONCURRENCY', '2'))
+    reload = True
+    loglevel = 'debug'
+else:
+    bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+    # Un proceso por núcleo: las consultas son CPU (filtrado y JSON)
+    workers = int(os.getenv('WEB_CONCURRENCY', str(multiprocessing.cpu_count())))
+    loglevel = 'info'
+
+# Hilos por worker para las peticiones que esperan E/S (envío a la cola de correo, disco)
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+timeout = 60
+graceful_timeout = 30
+keepalive = 5
+accesslog = '-'
+errorlog = '-'
+
+# Reiniciar los workers de vez en cuando evita que la memoria crezca sin límite
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '5000'))
+max_requests_jitter = max_requests // 10
+
+
+def on_starting(server):
+    """Publica la instantánea de eventos (si falta o está desfasada) antes de crear los workers"""
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    from database.event_index import publish_snapshot
+    from database.sqlite_store import SQLiteEventStore
+
+    db_path = os.getenv('SIRIA_DB_PATH', './data/siria_events.db')
+    if not os.path.exists(db_path):
+        server.log.info(f"No event store at {db_path}, workers will serve the sample events")
+        return
+    try:
+        store = SQLiteEventStore(db_path)
+        publish_snapshot(store)
+        store.close()
+    except Exception as e:
+        server.log.error(f"Error publishing event snapshot: {e}")
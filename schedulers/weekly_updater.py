@@ -6,7 +6,6 @@ import sys
 import logging
 from datetime import datetime, timedelta
 from typing import List, Dict
-import base64
 
 # Añadir el directorio padre al path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -14,11 +13,19 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from scrapers.scraper_orchestrator import ScraperOrchestrator
 from classifiers.event_classifier import EventClassifier
 from utils.deduplication import EventDeduplicator
+from utils.dedup_index import PersistentDedupIndex
 from utils.excel_generator import ExcelGenerator
+from utils.report_builder import ReportBuilder
+from utils.report_cache import ReportCache
 from database.google_sheets_manager import GoogleSheetsManager
+from database.sqlite_store import SQLiteEventStore
+from database.sheets_replicator import SheetsReplicator
+from database.event_index import publish_snapshot
 
 logger = logging.getLogger(__name__)
 
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
 
 class WeeklyUpdater:
     """
@@ -29,9 +36,16 @@ class WeeklyUpdater:
         """Inicializa todos los componentes del sistema"""
         self.scraper_orchestrator = ScraperOrchestrator()
         self.classifier = EventClassifier()
-        self.deduplicator = EventDeduplicator()
+        self.deduplicator = EventDeduplicator(dedup_index=PersistentDedupIndex())
         self.excel_generator = ExcelGenerator()
+        self.report_builder = ReportBuilder(self.excel_generator, cache=ReportCache())
         self.sheets_manager = GoogleSheetsManager()
+        self.event_store = SQLiteEventStore()
+        self.replicator = None
+        if self.sheets_manager.is_configured():
+            # Replica pendientes de ejecuciones anteriores en segundo plano
+            self.replicator = SheetsReplicator(self.event_store, self.sheets_manager)
+            self.replicator.start()
 
         logger.info("WeeklyUpdater initialized")
 
@@ -50,6 +64,9 @@ class WeeklyUpdater:
             'start_time': datetime.now().isoformat(),
             'events_scraped': 0,
             'events_deduplicated': 0,
+            'events_new': 0,
+            'events_known': 0,
+            'new_event_ids': [],
             'events_classified': 0,
             'events_stored': 0,
             'excel_file': None,
@@ -79,34 +96,57 @@ class WeeklyUpdater:
             results['events_deduplicated'] = len(unique_events)
             logger.info(f"After deduplication: {len(unique_events)} unique events")
 
+            # 3b. Comparar con el histórico de ejecuciones anteriores
+            new_events, known_events = self.deduplicator.split_known_events(unique_events)
+            results['events_new'] = len(new_events)
+            results['events_known'] = len(known_events)
+            results['new_event_ids'] = [event['id'] for event in new_events]
+
             # 4. Filtrar eventos por rango de fechas (próximos 12 meses)
             logger.info("STEP 4: Filtering events by date range")
             filtered_events = self.filter_events_by_date(unique_events)
             logger.info(f"After date filtering: {len(filtered_events)} events")
 
-            # 5. Almacenar en Google Sheets
-            logger.info("STEP 5: Storing events in Google Sheets")
-            if self.sheets_manager.service:
-                # Limpiar hoja anterior
-                self.sheets_manager.clear_sheet()
-                # Añadir nuevos eventos
-                self.sheets_manager.append_events(filtered_events)
-                results['events_stored'] = len(filtered_events)
-                logger.info(f"Stored {len(filtered_events)} events in Google Sheets")
-            else:
-                logger.warning("Google Sheets not configured, skipping storage")
+            # 5. Almacenar en el almacén local y encolar la réplica en Google Sheets
+            logger.info("STEP 5: Storing events in local store")
+            changes = self.event_store.replace_events(filtered_events)
+            results['events_stored'] = len(filtered_events)
+            results['store_changes'] = changes
+            results['dataset_version'] = changes['version']
+            logger.info(f"Stored {len(filtered_events)} events in {self.event_store.db_path}: {changes}")
 
-            # 6. Generar Excel
-            logger.info("STEP 6: Generating Excel file")
-            excel_file = self.excel_generator.generate_excel(filtered_events)
-            results['excel_file'] = excel_file
-            logger.info(f"Generated Excel file: {excel_file}")
+            # Publicar la instantánea que comparten los workers de la API
+            try:
+                publish_snapshot(self.event_store)
+            except Exception as e:
+                logger.error(f"Error publishing event snapshot: {e}")
 
-            # 7. Generar reporte resumen
-            logger.info("STEP 7: Generating summary report")
-            summary_file = self.excel_generator.generate_summary_report(filtered_events)
-            results['summary_file'] = summary_file
-            logger.info(f"Generated summary report: {summary_file}")
+            if self.replicator:
+                self.replicator.enqueue(changes['version'])
+            else:
+                logger.warning("Google Sheets not configured, skipping replication")
+
+            # 6-7. Generar Excel y reporte resumen a partir de una única
+            # preparación de los eventos
+            logger.info("STEP 6-7: Generating Excel file and summary report")
+            reports = self.report_builder.build(filtered_events, ['events', 'summary'])
+            results['excel_file'] = reports['events']
+            results['summary_file'] = reports['summary']
+            logger.info(f"Generated Excel file: {reports['events']}")
+            logger.info(f"Generated summary report: {reports['summary']}")
+
+            # Solo ahora, con los eventos almacenados y el informe generado,
+            # pasan a ser conocidos para las próximas ejecuciones
+            self.deduplicator.remember_events(unique_events)
+
+            # 8. Esperar (con límite) a la réplica en Google Sheets; si no
+            # termina, queda en la cola para la siguiente ejecución
+            if self.replicator:
+                timeout = float(os.getenv('SHEETS_REPLICATION_TIMEOUT', '300'))
+                results['sheets_replicated'] = self.replicator.flush(timeout)
+                if not results['sheets_replicated']:
+                    logger.warning("Google Sheets replication pending, will retry on next run")
+                results['sheets_quota'] = self.sheets_manager.get_quota_metrics()
 
             results['end_time'] = datetime.now().isoformat()
             results['status'] = 'success'
@@ -174,6 +214,8 @@ class WeeklyUpdater:
         <ul>
             <li><strong>Eventos scrapeados:</strong> {results.get('events_scraped', 0)}</li>
             <li><strong>Eventos únicos:</strong> {results.get('events_deduplicated', 0)}</li>
+            <li><strong>Eventos nuevos esta semana:</strong> {results.get('events_new', 0)}</li>
+            <li><strong>Eventos ya conocidos:</strong> {results.get('events_known', 0)}</li>
             <li><strong>Eventos clasificados:</strong> {results.get('events_classified', 0)}</li>
             <li><strong>Eventos almacenados:</strong> {results.get('events_stored', 0)}</li>
         </ul>
@@ -183,41 +225,48 @@ class WeeklyUpdater:
         <p><em>Generado automáticamente por SIRIA - {datetime.now().strftime('%Y-%m-%d %H:%M')}</em></p>
         """
 
-        # Leer archivo Excel y convertir a base64
         excel_file = results.get('excel_file')
-        if excel_file and os.path.exists(excel_file):
-            with open(excel_file, 'rb') as f:
-                excel_data = f.read()
-                excel_base64 = base64.b64encode(excel_data).decode('utf-8')
-
-            filename = os.path.basename(excel_file)
-        else:
+        if not excel_file or not os.path.exists(excel_file):
             logger.error("Excel file not found, cannot send email")
             return
+        filename = os.path.basename(excel_file)
+
+        fields = {
+            'to': recipient,
+            'subject': f'Agenda Semanal de Eventos del Tercer Sector - {datetime.now().strftime("%Y-%m-%d")}',
+            'body': body,
+            'content_type': 'html'
+        }
 
         # Llamar al endpoint de send_email
         try:
             api_url = os.getenv('API_URL', 'http://localhost:8000')
             token = os.getenv('SECRET_TOKEN', '')
+            headers = {'Authorization': f'Bearer {token}'}
 
+            # Adjuntar el informe por su ID (la API lo lee de su directorio de salida)
             response = requests.post(
                 f"{api_url}/send_email",
-                headers={
-                    'Authorization': f'Bearer {token}',
-                    'Content-Type': 'application/json'
-                },
-                json={
-                    'to': recipient,
-                    'subject': f'Agenda Semanal de Eventos del Tercer Sector - {datetime.now().strftime("%Y-%m-%d")}',
-                    'body': body,
-                    'content_type': 'html',
-                    'attachment_base64': excel_base64,
-                    'filename': filename
-                },
+                headers=headers,
+                json={**fields, 'report_id': filename},
                 timeout=60
             )
 
-            if response.status_code == 200:
+            if response.status_code == 404:
+                # La API no tiene el informe: subirlo como multipart/form-data
+                with open(excel_file, 'rb') as f:
+                    response = requests.post(
+                        f"{api_url}/send_email",
+                        headers=headers,
+                        data=fields,
+                        files={'attachment': (filename, f, XLSX_MIMETYPE)},
+                        timeout=120
+                    )
+
+            if response.status_code == 202:
+                message_id = response.json().get('message_id')
+                logger.info(f"Email to {recipient} queued for delivery (message_id={message_id})")
+            elif response.status_code == 200:
                 logger.info(f"Email sent successfully to {recipient}")
             else:
                 logger.error(f"Failed to send email: {response.status_code} - {response.text}")
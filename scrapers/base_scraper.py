@@ -3,12 +3,14 @@ Clase base para todos los scrapers del proyecto SIRIA
 """
 import requests
 from bs4 import BeautifulSoup
-import hashlib
 from datetime import datetime
 from typing import List, Dict, Optional
 import logging
 from tenacity import retry, stop_after_attempt, wait_exponential
 
+from utils.url_canonicalizer import clean_url
+from utils.event_ids import event_id
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -46,16 +48,28 @@ class BaseScraper:
 
     def generate_event_id(self, event_data: Dict) -> str:
         """
-        Genera un ID único para un evento basado en enlace y fecha
+        Genera el ID canónico de un evento (ver utils.event_ids)
 
         Args:
             event_data: Diccionario con datos del evento
 
         Returns:
-            Hash único del evento
+            ID estable del evento
+        """
+        return event_id(event_data)
+
+    def canonicalize_link(self, href: str) -> str:
+        """
+        Limpia un enlace extraído de la página: lo resuelve contra la URL
+        base si es relativo y elimina fragmento y parámetros de seguimiento
+
+        Args:
+            href: Enlace tal como aparece en la página
+
+        Returns:
+            Enlace limpio
         """
-        unique_string = f"{event_data.get('enlace', '')}{event_data.get('fecha', '')}"
-        return hashlib.md5(unique_string.encode()).hexdigest()
+        return clean_url(href, self.base_url)
 
     def normalize_event(self, event_data: Dict) -> Dict:
         """
@@ -75,7 +89,7 @@ class BaseScraper:
             "hora": event_data.get("hora", ""),
             "modalidad": event_data.get("modalidad", ""),
             "lugar": event_data.get("lugar", ""),
-            "enlace": event_data.get("enlace", ""),
+            "enlace": clean_url(event_data.get("enlace", "")),
             "pais": event_data.get("pais", "España"),
             "categoria": event_data.get("categoria", ""),
             "descripcion": event_data.get("descripcion", ""),
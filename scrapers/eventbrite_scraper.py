@@ -120,7 +120,7 @@ class EventbriteScraper(BaseScraper):
 
         event['nombre'] = event_data.get('name', {}).get('text', '')
         event['descripcion'] = event_data.get('description', {}).get('text', '')
-        event['enlace'] = event_data.get('url', '')
+        event['enlace'] = self.canonicalize_link(event_data.get('url', ''))
 
         # Fecha y hora
         start = event_data.get('start', {})
@@ -82,8 +82,7 @@ class FundacionOnceScraper(BaseScraper):
         # Enlace
         link_elem = item.find('a', href=True)
         if link_elem:
-            href = link_elem['href']
-            event['enlace'] = href if href.startswith('http') else f"{self.base_url}{href}"
+            event['enlace'] = self.canonicalize_link(link_elem['href'])
 
         # Lugar/Modalidad
         location_elem = item.find(['span', 'div'], class_=re.compile('location|lugar|place'))
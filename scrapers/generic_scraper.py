@@ -86,8 +86,7 @@ class GenericScraper(BaseScraper):
         link_selector = self.selectors.get('link', 'a')
         link_elem = item.select_one(link_selector)
         if link_elem and link_elem.get('href'):
-            href = link_elem['href']
-            event['enlace'] = href if href.startswith('http') else f"{self.base_url}{href}"
+            event['enlace'] = self.canonicalize_link(link_elem['href'])
 
         # Lugar
         location_selector = self.selectors.get('location', '.location, .lugar')
@@ -71,8 +71,7 @@ class SaveTheChildrenScraper(BaseScraper):
         # Enlace
         link_elem = item.find('a', href=True)
         if link_elem:
-            href = link_elem['href']
-            event['enlace'] = href if href.startswith('http') else f"{self.base_url}{href}"
+            event['enlace'] = self.canonicalize_link(link_elem['href'])
 
         # Categoría
         event['categoria'] = 'Derechos de infancia, juventud y mujeres'
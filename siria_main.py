@@ -12,8 +12,6 @@ from scrapers.scraper_orchestrator import ScraperOrchestrator
 from classifiers.event_classifier import EventClassifier
 from utils.deduplication import EventDeduplicator
 from utils.excel_generator import ExcelGenerator
-from database.google_sheets_manager import GoogleSheetsManager
-from schedulers.weekly_updater import WeeklyUpdater
 
 # Configurar logging
 logging.basicConfig(
@@ -36,7 +34,7 @@ def main():
 
     parser.add_argument(
         'command',
-        choices=['scrape', 'update', 'schedule', 'test'],
+        choices=['scrape', 'update', 'schedule', 'test', 'export'],
         help='Comando a ejecutar'
     )
 
@@ -53,6 +51,13 @@ def main():
         help='Directorio de salida para archivos Excel'
     )
 
+    parser.add_argument(
+        '--format',
+        choices=['csv', 'jsonl', 'parquet', 'ics'],
+        default='csv',
+        help='Formato de exportación (comando export)'
+    )
+
     parser.add_argument(
         '--no-email',
         action='store_true',
@@ -82,7 +87,9 @@ def main():
         logger.info(f"Excel file generated: {excel_file}")
 
     elif args.command == 'update':
-        # Ejecutar actualización completa
+        # Ejecutar actualización completa (se importa aquí para que scrape y
+        # test no carguen el almacén ni Google Sheets)
+        from schedulers.weekly_updater import WeeklyUpdater
         updater = WeeklyUpdater()
         results = updater.run_full_update()
 
@@ -132,10 +139,30 @@ def main():
         unique = deduplicator.deduplicate(classified)
         logger.info(f"After deduplication: {len(unique)} unique events")
 
-        # Generar Excel
-        excel_file = excel_gen.generate_excel(unique, 'test_output.xlsx')
+        # Generar Excel (reutilizado de la caché si los eventos no cambian)
+        from utils.report_builder import ReportBuilder
+        from utils.report_cache import ReportCache
+        builder = ReportBuilder(excel_gen, cache=ReportCache())
+        excel_file = builder.build(unique, ['events'], {'events': 'test_output.xlsx'})['events']
         logger.info(f"Test Excel generated: {excel_file}")
 
+    elif args.command == 'export':
+        # Exportar los eventos del almacén local sin cargarlos todos en memoria
+        from database.sqlite_store import SQLiteEventStore
+        from utils.exporters import default_export_filename, export_events
+
+        if not os.path.exists(args.output):
+            os.makedirs(args.output)
+
+        filepath = os.path.join(args.output, default_export_filename(args.format))
+
+        store = SQLiteEventStore()
+        try:
+            count = export_events(store.iter_events(), args.format, filepath)
+        finally:
+            store.close()
+        logger.info(f"Exported {count} events to {filepath}")
+
     logger.info("=" * 80)
     logger.info("SIRIA - Command completed")
     logger.info("=" * 80)
@@ -25,13 +25,13 @@ pip install -r requirements.txt --quiet
 
 echo ""
 echo "===================================="
-echo "Iniciando servidor Flask..."
+echo "Iniciando servidor (gunicorn, preset local)..."
 echo "===================================="
 echo ""
 echo "El servidor estara disponible en:"
-echo "http://localhost:5000"
+echo "http://localhost:${PORT:-8000}"
 echo ""
 echo "Presiona Ctrl+C para detener el servidor"
 echo ""
 
-python app.py
+SERVER_PRESET=local exec gunicorn -c gunicorn.conf.py app:app
@@ -0,0 +1,8 @@
+"""
+Configuración común de las pruebas
+"""
+import os
+import sys
+
+# Permite importar los módulos del proyecto al ejecutar pytest desde cualquier directorio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,46 @@
+"""
+Pruebas del registro de actividad
+"""
+import json
+import os
+
+import pytest
+
+from utils.activity_log import ActivityLog
+
+
+def test_client_timestamp_does_not_override_server_timestamp(tmp_path):
+    log = ActivityLog(log_dir=str(tmp_path))
+    try:
+        entry = log.record({'ts': 5, 'accion': 'buscar'})
+        assert isinstance(entry['ts'], str) and entry['ts'] != 5
+
+        results = log.query(since='2000-01-01T00:00:00')
+        assert [result['accion'] for result in results] == ['buscar']
+        assert results[0]['ts'] == entry['ts']
+    finally:
+        log.close()
+
+
+def test_since_returns_entries_interleaved_by_other_workers(tmp_path):
+    log = ActivityLog(log_dir=str(tmp_path))
+    # Dos workers vuelcan sus lotes por separado: el archivo no queda ordenado
+    entries = [
+        {'ts': '2026-10-19T10:00:00', 'worker': 'a'},
+        {'ts': '2026-10-19T10:00:05', 'worker': 'a'},
+        {'ts': '2026-10-19T10:00:06', 'worker': 'b'},
+        {'ts': '2026-10-19T10:00:04', 'worker': 'b'},
+        {'ts': '2026-10-19T10:00:07', 'worker': 'a'},
+        {'ts': '2026-10-19T10:00:03', 'worker': 'b'},
+    ]
+    with open(os.path.join(str(tmp_path), ActivityLog.FILENAME), 'w', encoding='utf-8') as f:
+        f.write(''.join(json.dumps(entry) + '\n' for entry in entries))
+    try:
+        results = log.query(since='2026-10-19T10:00:04')
+        assert sorted(result['ts'] for result in results) == [
+            '2026-10-19T10:00:04', '2026-10-19T10:00:05', '2026-10-19T10:00:06', '2026-10-19T10:00:07'
+        ]
+        with pytest.raises(ValueError):
+            log.query(since='not-a-date')
+    finally:
+        log.close()
@@ -0,0 +1,71 @@
+"""
+Pruebas de la API Flask
+"""
+import importlib
+import os
+import sys
+
+import pytest
+
+TOKEN = 'test-token'
+
+
+@pytest.fixture(scope='module')
+def client(tmp_path_factory):
+    """Cliente de la API con todos los datos en un directorio temporal"""
+    data = tmp_path_factory.mktemp('data')
+    env = {
+        'SECRET_TOKEN': TOKEN,
+        'DEFAULT_FROM': 'siria@example.org',
+        'SMTP_HOST': 'localhost',
+        'SIRIA_OUTPUT_DIR': str(data / 'output'),
+        'SIRIA_DB_PATH': str(data / 'siria_events.db'),
+        'EVENT_SNAPSHOT_PATH': str(data / 'events.snapshot'),
+        'MAIL_QUEUE_DB': str(data / 'mail_queue.db'),
+        'MAIL_ATTACHMENTS_DIR': str(data / 'mail_attachments'),
+        'ACTIVITY_LOG_DIR': str(data / 'activity')
+    }
+    previous = {key: os.environ.get(key) for key in env}
+    os.environ.update(env)
+    os.makedirs(env['SIRIA_OUTPUT_DIR'])
+
+    sys.modules.pop('app', None)
+    app = importlib.import_module('app')
+    # Los correos se quedan en la cola: no hay servidor SMTP en las pruebas
+    app.MAIL_QUEUE.start = lambda: None
+    try:
+        yield app.app.test_client()
+    finally:
+        app.ACTIVITY_LOG.close()
+        sys.modules.pop('app', None)
+        for key, value in previous.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+def _post_email(client, **fields):
+    payload = {'to': 'equipo@example.org', 'subject': 'Informe', 'body': 'Hola', **fields}
+    return client.post('/send_email', json=payload, headers={'Authorization': f'Bearer {TOKEN}'})
+
+
+@pytest.mark.parametrize('report_id', [['agenda_eventos_x.xlsx', 5], 5, {'id': 'x'}, [None]])
+def test_send_email_rejects_non_string_report_ids(client, report_id):
+    response = _post_email(client, report_id=report_id)
+    assert response.status_code == 400
+
+
+def test_send_email_rejects_report_ids_outside_reports_dir(client):
+    assert _post_email(client, report_id='../secreto.xlsx').status_code == 400
+    assert _post_email(client, report_id='agenda_eventos_no_existe.xlsx').status_code == 404
+
+
+def test_activity_rejects_invalid_since(client):
+    headers = {'Authorization': f'Bearer {TOKEN}'}
+    assert client.post('/log_activity', json={'ts': 5, 'accion': 'buscar'}, headers=headers).status_code == 200
+    assert client.get('/activity?since=ayer', headers=headers).status_code == 400
+
+    response = client.get('/activity?since=2000-01-01T00:00:00', headers=headers)
+    assert response.status_code == 200
+    assert [entry['accion'] for entry in response.get_json()['activity']] == ['buscar']
@@ -0,0 +1,37 @@
+"""
+Pruebas de la generación de candidatos para la deduplicación
+"""
+from utils.blocking import CandidateGenerator
+from utils.deduplication import EventDeduplicator
+
+
+THRESHOLD = 0.6
+
+TITLES = ['Taller de voluntariado', 'Jornada de economía social', 'Congreso de cooperación', 'Feria de empleo']
+
+
+def _events():
+    # Un único bloque grande (misma fecha y entidad) con varios grupos de títulos parecidos
+    return [
+        {'nombre': f'{TITLES[i % len(TITLES)]} {i}', 'fecha': '2026-11-05', 'entidad': 'Fundación Ejemplo',
+         'enlace': f'https://ejemplo.org/{i}'}
+        for i in range(45)
+    ]
+
+
+def test_oversized_blocks_cover_every_pair():
+    generator = CandidateGenerator(EventDeduplicator.SIMILARITY_WEIGHTS, THRESHOLD)
+    small = CandidateGenerator(EventDeduplicator.SIMILARITY_WEIGHTS, THRESHOLD, max_block_size=10)
+
+    blocks = small.generate_blocks(_events())
+    assert all(len(block) <= 10 for block in blocks)
+    assert small.candidate_pairs(_events()) == generator.candidate_pairs(_events())
+
+
+def test_oversized_blocks_give_same_duplicates():
+    expected = EventDeduplicator(THRESHOLD).find_duplicates(_events())
+    assert len(expected) > 1
+
+    deduplicator = EventDeduplicator(THRESHOLD)
+    deduplicator.candidate_generator.max_block_size = 10
+    assert deduplicator.find_duplicates(_events()) == expected
@@ -0,0 +1,41 @@
+"""
+Pruebas del deduplicador de eventos
+"""
+import copy
+import random
+
+from utils.deduplication import EventDeduplicator
+
+
+def _duplicates():
+    base = {
+        'nombre': 'Jornada de voluntariado',
+        'fecha': '2026-11-05',
+        'entidad': 'Fundación Ejemplo',
+        'enlace': 'https://ejemplo.org/jornada',
+        'descripcion': 'Encuentro anual'
+    }
+    # Solo difieren en campos que no forman parte de la clave de orden principal
+    return [
+        {**base, 'hora': '10:00', 'modalidad': 'presencial', 'lugar': 'Madrid', 'pais': 'España', 'categoria': 'voluntariado'},
+        {**base, 'hora': '17:00', 'modalidad': 'online', 'lugar': 'Online', 'pais': 'Chile', 'categoria': 'formación'},
+        {**base, 'hora': '', 'modalidad': 'híbrido', 'lugar': 'Sevilla', 'pais': 'España', 'categoria': 'jornada'},
+    ]
+
+
+def _without_timestamp(events):
+    return [{k: v for k, v in event.items() if k != 'merged_at'} for event in events]
+
+
+def test_deduplicate_is_independent_of_input_order():
+    expected = None
+    rng = random.Random(0)
+    for _ in range(10):
+        events = copy.deepcopy(_duplicates())
+        rng.shuffle(events)
+        result = _without_timestamp(EventDeduplicator().deduplicate(events))
+
+        assert len(result) == 1
+        if expected is None:
+            expected = result
+        assert result == expected
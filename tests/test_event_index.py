@@ -0,0 +1,117 @@
+"""
+Pruebas del índice de eventos servido por la API
+"""
+import pytest
+
+import database.event_index as event_index
+from database.event_index import EventIndex, EventSnapshot, publish_snapshot
+from database.sqlite_store import SQLiteEventStore
+
+EVENTS = [
+    {'id': 'b', 'nombre': 'Congreso', 'fecha': '2026-11-06', 'pais': 'Chile', 'categoria': 'Congreso'},
+    {'id': 'a', 'nombre': 'Jornada ñandú', 'fecha': '2026-11-05', 'pais': 'España', 'categoria': 'Voluntariado'},
+    {'id': 'c', 'nombre': 'Feria', 'fecha': '2026-11-06', 'pais': 'España', 'categoria': 'Empleo'},
+    {'id': 'd', 'nombre': 'Sin fecha', 'fecha': 'pendiente'},
+]
+
+
+def _event(event_id: str) -> dict:
+    return {'id': event_id, 'nombre': f'Evento {event_id}', 'fecha': '2026-11-05', 'pais': 'España'}
+
+
+def _ids(events):
+    return [event['id'] for event in events]
+
+
+def _setup(tmp_path, events):
+    db_path = str(tmp_path / 'events.db')
+    snapshot_path = str(tmp_path / 'events.snapshot')
+    store = SQLiteEventStore(db_path)
+    store.replace_events(events)
+    publish_snapshot(store, snapshot_path)
+    index = EventIndex(db_path=db_path, snapshot_path=snapshot_path, refresh_interval=3600)
+    return store, index
+
+
+def test_snapshot_file_round_trip(tmp_path):
+    path = str(tmp_path / 'events.snapshot')
+    original = EventSnapshot(EVENTS, version=3)
+    original.to_file(path)
+    mapped = EventSnapshot.from_file(path)
+
+    assert (mapped.version, mapped.etag_seed, len(mapped)) == (3, original.etag_seed, 3)
+    assert list(mapped.keys) == original.keys
+    assert list(mapped.events) == original.events
+    for filters in ({}, {'pais': 'españa'}, {'categoria': 'o'}, {'from_date': '2026-11-06'},
+                    {'after': ('2026-11-05', 'a'), 'limit': 1}):
+        assert mapped.query(**filters) == original.query(**filters)
+
+
+def test_store_ahead_of_snapshot_file_is_republished(tmp_path):
+    store, index = _setup(tmp_path, [_event('a')])
+    assert index.snapshot().signature is not None
+
+    # El almacén avanza pero nadie vuelve a publicar el archivo
+    store.replace_events([_event('a'), _event('b')])
+    assert index.refresh()
+    snapshot = index.snapshot()
+    assert snapshot.signature is not None
+    assert snapshot.version == store.dataset_version()
+    assert _ids(snapshot.query()) == ['a', 'b']
+    assert not index.refresh()
+    store.close()
+
+
+def test_only_one_process_republishes_at_a_time(tmp_path):
+    fcntl = pytest.importorskip('fcntl')
+    store, index = _setup(tmp_path, [_event('a')])
+    store.replace_events([_event('a'), _event('b')])
+
+    # Otro worker tiene el cerrojo: este sigue con la versión anterior de momento
+    with open(f"{index.snapshot_path}.lock", 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        assert not index.refresh()
+        assert _ids(index.snapshot().query()) == ['a']
+
+    assert index.refresh()
+    assert _ids(index.snapshot().query()) == ['a', 'b']
+    store.close()
+
+
+def test_store_is_loaded_in_memory_if_republishing_fails(tmp_path, monkeypatch):
+    store, index = _setup(tmp_path, [_event('a')])
+    store.replace_events([_event('a'), _event('b')])
+
+    def fail(*args, **kwargs):
+        raise OSError('disk full')
+
+    monkeypatch.setattr(event_index, 'publish_snapshot', fail)
+    assert index.refresh()
+    snapshot = index.snapshot()
+    assert snapshot.signature is None
+    assert _ids(snapshot.query()) == ['a', 'b']
+    store.close()
+
+
+def test_newer_empty_dataset_replaces_previous_one(tmp_path):
+    store, index = _setup(tmp_path, [_event('a')])
+    store.replace_events([])
+    assert store.dataset_version() > index.snapshot().version
+
+    assert index.refresh()
+    assert len(index.snapshot()) == 0
+    assert index.snapshot().version == store.dataset_version()
+    store.close()
+
+
+def test_newer_empty_dataset_without_snapshot_file(tmp_path):
+    db_path = str(tmp_path / 'events.db')
+    store = SQLiteEventStore(db_path)
+    store.replace_events([_event('a')])
+    index = EventIndex(db_path=db_path, snapshot_path=str(tmp_path / 'missing.snapshot'), refresh_interval=3600)
+    assert _ids(index.snapshot().query()) == ['a']
+
+    store.replace_events([])
+    assert index.refresh()
+    assert len(index.snapshot()) == 0
+    store.close()
@@ -0,0 +1,76 @@
+"""
+Pruebas de los exportadores de eventos
+"""
+import csv
+import fnmatch
+import json
+
+import pytest
+
+from utils.exporters import EXPORT_FIELDS, PYARROW_AVAILABLE, default_export_filename, export_events
+from utils.report_cache import OUTPUT_PATTERNS
+
+EVENTS = [
+    {'id': 'a', 'nombre': 'Jornada de voluntariado, edición 2026', 'fecha': '2026-11-05', 'hora': '10:30',
+     'lugar': 'Madrid', 'entidad': 'Fundación Ejemplo', 'descripcion': 'Línea 1\nLínea 2; con ' + 'é' * 60},
+    {'id': 'b', 'nombre': 'Webinar', 'fecha': '2026-11-06', 'modalidad': 'online'},
+    {'id': 'c', 'nombre': 'Sin fecha', 'fecha': 'pendiente'},
+]
+
+
+def test_csv_and_jsonl_round_trip(tmp_path):
+    csv_path = str(tmp_path / 'eventos.csv')
+    jsonl_path = str(tmp_path / 'eventos.jsonl')
+
+    assert export_events(iter(EVENTS), 'csv', csv_path) == 3
+    assert export_events(iter(EVENTS), 'jsonl', jsonl_path) == 3
+
+    with open(csv_path, encoding='utf-8-sig', newline='') as f:
+        rows = list(csv.DictReader(f))
+    assert list(rows[0]) == EXPORT_FIELDS
+    assert rows[0]['descripcion'] == EVENTS[0]['descripcion']
+    assert rows[1]['hora'] == ''
+
+    with open(jsonl_path, encoding='utf-8') as f:
+        lines = [json.loads(line) for line in f]
+    assert [line['id'] for line in lines] == ['a', 'b', 'c']
+    assert not list(tmp_path.glob('*.tmp'))
+
+
+@pytest.mark.skipif(not PYARROW_AVAILABLE, reason="pyarrow not installed")
+def test_parquet_round_trip(tmp_path):
+    import pyarrow.parquet as pq
+
+    path = str(tmp_path / 'eventos.parquet')
+    assert export_events(EVENTS, 'parquet', path) == 3
+    table = pq.read_table(path)
+    assert table.column_names == EXPORT_FIELDS
+    assert table.column('nombre').to_pylist() == [event['nombre'] for event in EVENTS]
+
+
+def test_icalendar_events_are_escaped_folded_and_skip_invalid_dates(tmp_path):
+    path = str(tmp_path / 'eventos.ics')
+    assert export_events(EVENTS, 'ics', path) == 2
+
+    with open(path, 'rb') as f:
+        data = f.read()
+    lines = data.split(b'\r\n')
+    assert all(len(line) <= 75 for line in lines)
+
+    text = data.decode('utf-8').replace('\r\n ', '')
+    assert text.count('BEGIN:VEVENT') == 2
+    assert 'DTSTART:20261105T103000' in text
+    assert 'DTSTART;VALUE=DATE:20261106' in text
+    assert 'SUMMARY:Jornada de voluntariado\\, edición 2026' in text
+    assert 'LOCATION:Online' in text
+    assert r'Línea 1\nLínea 2\; con' in text
+
+
+def test_export_filenames_are_not_swept_by_the_report_cache():
+    for export_format in ('csv', 'jsonl', 'parquet', 'ics'):
+        filename = default_export_filename(export_format, '2026-11-05')
+        assert filename.endswith(f'2026-11-05.{export_format}')
+        assert not any(fnmatch.fnmatch(filename, pattern) for pattern in OUTPUT_PATTERNS)
+
+    with pytest.raises(ValueError):
+        default_export_filename('xlsx')
@@ -0,0 +1,127 @@
+"""
+Pruebas de la sincronización de eventos con una hoja de cálculo en memoria
+"""
+import re
+
+from database.google_sheets_manager import GoogleSheetsManager
+
+SHEET = 'Eventos Tercer Sector'
+
+_RANGE = re.compile(r"^(?P<sheet>.+)!(?P<c1>[A-Z])(?P<r1>\d+)(?::(?P<c2>[A-Z])(?P<r2>\d+))?$")
+
+
+class Request:
+    def __init__(self, action):
+        self.action = action
+
+    def execute(self):
+        return self.action()
+
+
+class FakeSpreadsheet:
+    """
+    Servicio de Sheets falso con una sola hoja guardada como lista de filas
+    (la fila 1 es la cabecera)
+    """
+
+    def __init__(self, rows):
+        self.grid = [list(GoogleSheetsManager.FIELDS)] + [list(row) for row in rows]
+        self.calls = []
+
+    def spreadsheets(self):
+        return self
+
+    def values(self):
+        return self
+
+    @staticmethod
+    def _bounds(range_name):
+        match = _RANGE.match(range_name)
+        c1 = ord(match['c1']) - ord('A')
+        r1 = int(match['r1'])
+        c2 = ord(match['c2'] or match['c1']) - ord('A')
+        r2 = int(match['r2'] or match['r1'])
+        return c1, r1, c2, r2
+
+    def _read(self, range_name):
+        c1, r1, c2, r2 = self._bounds(range_name)
+        values = [row[c1:c2 + 1] for row in self.grid[r1 - 1:r2]]
+        while values and not any(values[-1]):
+            values.pop()
+        return {'range': range_name, 'values': values}
+
+    def _write(self, range_name, values):
+        c1, r1, _, _ = self._bounds(range_name)
+        for offset, row in enumerate(values):
+            while len(self.grid) < r1 + offset:
+                self.grid.append([''] * len(GoogleSheetsManager.FIELDS))
+            target = self.grid[r1 - 1 + offset]
+            target[c1:c1 + len(row)] = row
+
+    def get(self, spreadsheetId, fields):
+        self.calls.append('get')
+        return Request(lambda: {'sheets': [{'properties': {'sheetId': 7, 'title': SHEET}}]})
+
+    def batchGet(self, spreadsheetId, ranges, majorDimension):
+        self.calls.append('batchGet')
+        return Request(lambda: {'valueRanges': [self._read(range_name) for range_name in ranges]})
+
+    def batchUpdate(self, spreadsheetId, body):
+        def apply():
+            if 'data' in body:
+                self.calls.append('values.batchUpdate')
+                for item in body['data']:
+                    self._write(item['range'], item['values'])
+            else:
+                self.calls.append('batchUpdate')
+                for request in body['requests']:
+                    deleted = request['deleteDimension']['range']
+                    del self.grid[deleted['startIndex']:deleted['endIndex']]
+            return {}
+        return Request(apply)
+
+    def append(self, spreadsheetId, range, valueInputOption, insertDataOption, body):
+        def apply():
+            self.calls.append('append')
+            self.grid.extend(list(row) for row in body['values'])
+            return {}
+        return Request(apply)
+
+
+def _event(event_id, nombre):
+    return {'id': event_id, 'nombre': nombre, 'entidad': 'Fundación Ejemplo', 'fecha': '2026-11-05'}
+
+
+def _manager(service):
+    manager = GoogleSheetsManager(spreadsheet_id='sheet-id')
+    manager.service = service
+    return manager
+
+
+def test_upsert_writes_only_differences():
+    manager = _manager(FakeSpreadsheet([]))
+    service = manager.service
+    events = [_event('a', 'Uno'), _event('b', 'Dos'), _event('c', 'Tres')]
+    service.grid += [manager.event_to_row(event) for event in events]
+
+    changes = manager.upsert_events([_event('a', 'Uno'), _event('c', 'Tres (cambiado)'),
+                                     _event('d', 'Cuatro'), _event('e', 'Cinco')], SHEET)
+
+    assert changes == {'inserted': 2, 'updated': 1, 'deleted': 0, 'unchanged': 1}
+    ids = [row[0] for row in service.grid[1:]]
+    assert sorted(ids) == ['a', 'c', 'd', 'e']
+    # La fila de 'b' se reutiliza para un evento nuevo en lugar de borrarse
+    assert ids[:3] == ['a', 'd', 'c']
+    assert service.grid[3][1] == 'Tres (cambiado)'
+    assert service.calls == ['batchGet', 'values.batchUpdate', 'append']
+
+
+def test_upsert_deletes_rows_of_removed_events():
+    manager = _manager(FakeSpreadsheet([]))
+    service = manager.service
+    service.grid += [manager.event_to_row(_event(event_id, event_id)) for event_id in 'abcd']
+
+    changes = manager.upsert_events([_event('a', 'a'), _event('d', 'd')], SHEET)
+
+    assert changes == {'inserted': 0, 'updated': 0, 'deleted': 2, 'unchanged': 2}
+    assert [row[0] for row in service.grid[1:]] == ['a', 'd']
@@ -0,0 +1,154 @@
+"""
+Pruebas de la cola de correo saliente
+"""
+import smtplib
+import time
+from email.message import EmailMessage
+
+import pytest
+
+from utils.mail_queue import FAILED, QUEUED, SENDING, SENT, MailQueue, PermanentMailError, SMTPConnection
+
+
+def _message() -> EmailMessage:
+    message = EmailMessage()
+    message['From'] = 'siria@example.org'
+    message['To'] = 'equipo@example.org'
+    message['Subject'] = 'Informe semanal'
+    message.set_content('Hola')
+    return message
+
+
+def _wait_for_status(queue: MailQueue, message_id: str, status: str, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if queue.status(message_id)['status'] == status:
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_restarted_queue_delivers_pending_messages(tmp_path, monkeypatch):
+    sent = []
+    monkeypatch.setattr(SMTPConnection, 'send', lambda self, sender, recipients, data: sent.append(recipients))
+
+    options = dict(
+        db_path=str(tmp_path / 'mail_queue.db'),
+        attachments_dir=str(tmp_path / 'attachments'),
+        smtp_host='localhost',
+        poll_interval=0.05
+    )
+
+    # Un proceso encola el mensaje y termina antes de que sus hilos lo envíen
+    with monkeypatch.context() as patch:
+        patch.setattr(MailQueue, 'start', lambda self: None)
+        first = MailQueue(**options)
+        message_id = first.enqueue(_message())
+        first.conn.close()
+
+    # Al reiniciar, la cola lo envía sin necesidad de un nuevo enqueue() o flush()
+    second = MailQueue(**options)
+    try:
+        assert _wait_for_status(second, message_id, SENT)
+        assert sent == [['equipo@example.org']]
+    finally:
+        second.stop()
+
+
+class FakeConnection:
+    """Conexión SMTP falsa: registra los envíos o lanza el error indicado"""
+
+    def __init__(self, error=None):
+        self.error = error
+        self.sent = []
+
+    def send(self, sender, recipients, data):
+        if self.error:
+            raise self.error
+        self.sent.append(recipients)
+
+
+@pytest.fixture
+def idle_queue(tmp_path, monkeypatch):
+    """Fábrica de colas sobre la misma base de datos, sin hilos de envío"""
+    monkeypatch.setattr(MailQueue, 'start', lambda self: None)
+    queues = []
+
+    def factory(**kwargs):
+        queue = MailQueue(
+            db_path=str(tmp_path / 'mail_queue.db'),
+            attachments_dir=str(tmp_path / 'attachments'),
+            smtp_host='localhost',
+            **kwargs
+        )
+        queues.append(queue)
+        return queue
+
+    yield factory
+    for queue in queues:
+        queue.conn.close()
+
+
+def test_claims_do_not_overlap_between_processes(idle_queue):
+    first, second = idle_queue(batch_size=2), idle_queue(batch_size=2)
+    ids = {first.enqueue(_message()) for _ in range(3)}
+
+    claimed = [row['id'] for row in first._claim()] + [row['id'] for row in second._claim()]
+    assert len(claimed) == 3 and set(claimed) == ids
+    assert first._claim() == []
+
+
+def test_transient_error_schedules_retry_and_keeps_rest_of_batch(idle_queue):
+    queue = idle_queue(base_backoff=30)
+    failing, waiting = queue.enqueue(_message()), queue.enqueue(_message())
+
+    queue._send_batch(FakeConnection(smtplib.SMTPServerDisconnected('gone')), queue._claim())
+
+    status = queue.status(failing)
+    assert (status['status'], status['attempts']) == (QUEUED, 1)
+    assert 'next_attempt_at' in status
+    assert (queue.status(waiting)['status'], queue.status(waiting)['attempts']) == (QUEUED, 0)
+    # El reintento programado no se reserva antes de tiempo
+    assert [row['id'] for row in queue._claim()] == [waiting]
+
+
+def test_permanent_error_and_exhausted_attempts_fail(idle_queue):
+    queue = idle_queue(max_attempts=2, base_backoff=0)
+    rejected = queue.enqueue(_message())
+    queue._send_batch(FakeConnection(PermanentMailError('550 no such user')), queue._claim())
+    assert queue.status(rejected)['status'] == FAILED
+
+    flaky = queue.enqueue(_message())
+    for _ in range(2):
+        queue._send_batch(FakeConnection(OSError('timeout')), queue._claim())
+    assert (queue.status(flaky)['status'], queue.status(flaky)['attempts']) == (FAILED, 2)
+
+
+def test_expired_lease_is_reclaimed_and_old_owner_cannot_overwrite(idle_queue):
+    slow, other = idle_queue(lease_seconds=60), idle_queue(lease_seconds=60)
+    message_id = slow.enqueue(_message())
+    (stale_row,) = slow._claim()
+
+    # El envío lento supera la reserva: otro proceso recupera el mensaje y lo envía
+    with slow.conn:
+        slow.conn.execute("UPDATE outbox SET claimed_at = claimed_at - 120 WHERE id = ?", (message_id,))
+    connection = FakeConnection()
+    other._send_batch(connection, other._claim())
+    assert connection.sent == [['equipo@example.org']]
+
+    # El antiguo dueño ya no puede escribir el resultado ni volver a enviarlo
+    slow._mark_sent(stale_row)
+    stale_connection = FakeConnection()
+    slow._send_batch(stale_connection, [stale_row])
+    assert stale_connection.sent == []
+    status = slow.status(message_id)
+    assert (status['status'], status['attempts']) == (SENT, 1)
+
+
+def test_lease_is_not_taken_while_claim_is_fresh(idle_queue):
+    first, second = idle_queue(lease_seconds=60), idle_queue(lease_seconds=60)
+    message_id = first.enqueue(_message())
+    first._claim()
+
+    assert second._claim() == []
+    assert first.status(message_id)['status'] == SENDING
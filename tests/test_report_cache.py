@@ -0,0 +1,58 @@
+"""
+Pruebas de la caché de informes
+"""
+import os
+import time
+
+from utils.report_cache import ReportCache
+
+EVENTS = [{'id': 'a', 'nombre': 'Uno', 'fecha': '2026-11-05'}, {'id': 'b', 'nombre': 'Dos', 'fecha': '2026-11-06'}]
+
+
+def _write(path, content: bytes = b'xlsx', age_days: float = 0):
+    with open(path, 'wb') as f:
+        f.write(content)
+    if age_days:
+        old = time.time() - age_days * 86400
+        os.utime(path, (old, old))
+    return str(path)
+
+
+def test_key_depends_on_content_order_and_options():
+    key = ReportCache.key(EVENTS, {'type': 'events'})
+
+    reordered_fields = [dict(reversed(list(event.items()))) for event in EVENTS]
+    assert ReportCache.key(reordered_fields, {'type': 'events'}) == key
+    assert ReportCache.key(list(reversed(EVENTS)), {'type': 'events'}) != key
+    assert ReportCache.key(EVENTS, {'type': 'summary'}) != key
+    assert ReportCache.key(EVENTS[:1], {'type': 'events'}) != key
+
+
+def test_fetch_returns_stored_report(tmp_path):
+    cache = ReportCache(cache_dir=str(tmp_path / 'cache'))
+    key = ReportCache.key(EVENTS)
+    target = str(tmp_path / 'agenda_eventos_2026-11-05.xlsx')
+
+    assert not cache.fetch(key, target)
+    cache.store(key, _write(tmp_path / 'generated.xlsx', b'report'))
+    assert cache.fetch(key, target)
+    with open(target, 'rb') as f:
+        assert f.read() == b'report'
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_evict_removes_expired_and_least_recently_used_entries(tmp_path):
+    cache = ReportCache(cache_dir=str(tmp_path / 'cache'), max_age_days=30, max_size_mb=10 / (1024 * 1024))
+    expired = _write(tmp_path / 'cache' / 'old.xlsx', b'0' * 4, age_days=40)
+    least_recent = _write(tmp_path / 'cache' / 'lru.xlsx', b'1' * 6, age_days=2)
+    recent = _write(tmp_path / 'cache' / 'new.xlsx', b'2' * 6, age_days=1)
+
+    output = tmp_path / 'output'
+    output.mkdir()
+    old_report = _write(output / 'agenda_eventos_tercer_sector_2026-01-01.xlsx', age_days=40)
+    new_report = _write(output / 'resumen_eventos_2026-11-01.xlsx', age_days=1)
+    old_export = _write(output / 'exportacion_eventos_2026-01-01.csv', age_days=40)
+
+    assert cache.evict([str(output)]) == 3
+    assert [os.path.exists(path) for path in (expired, least_recent, recent)] == [False, False, True]
+    assert [os.path.exists(path) for path in (old_report, new_report, old_export)] == [False, True, True]
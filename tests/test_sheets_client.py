@@ -0,0 +1,139 @@
+"""
+Pruebas del cliente de Google Sheets contra un servicio falso
+"""
+import pytest
+
+from database.sheets_client import SheetsClient, TokenBucket
+
+
+class FakeClock:
+    """Reloj y espera simulados: sleep() avanza el reloj sin esperar"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+class HttpError(Exception):
+    """Error con la forma de googleapiclient.errors.HttpError (resp.status)"""
+
+    def __init__(self, status: int):
+        super().__init__(f"HTTP {status}")
+        self.resp = type('Response', (), {'status': status})()
+
+
+class FakeRequest:
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def execute(self):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+class FakeService:
+    """Servicio mínimo que registra los values.batchUpdate recibidos"""
+
+    def __init__(self, outcomes=None):
+        self.batches = []
+        self.outcomes = list(outcomes or [])
+
+    def spreadsheets(self):
+        return self
+
+    def values(self):
+        return self
+
+    def batchUpdate(self, spreadsheetId, body):
+        self.batches.append(body)
+        return FakeRequest([self.outcomes.pop(0) if self.outcomes else {}])
+
+
+def _client(service=None, **kwargs) -> SheetsClient:
+    clock = FakeClock()
+    client = SheetsClient(service or FakeService(), 'sheet-id', clock=clock, sleep=clock.sleep, **kwargs)
+    return client
+
+
+def test_execute_retries_rate_limits_and_server_errors():
+    client = _client()
+    request = FakeRequest([HttpError(429), HttpError(503), {'ok': True}])
+
+    assert client.execute(request, kind='write') == {'ok': True}
+    assert request.calls == 3
+    metrics = client.metrics()
+    assert metrics['retries'] == 2
+    assert metrics['rate_limited_responses'] == 1
+    assert metrics['write_requests'] == 3
+
+
+def test_execute_does_not_retry_client_errors():
+    client = _client()
+    request = FakeRequest([HttpError(400), {'ok': True}])
+
+    with pytest.raises(HttpError):
+        client.execute(request)
+    assert request.calls == 1
+    assert client.metrics()['failed_requests'] == 1
+
+
+def test_execute_gives_up_after_max_retries():
+    client = _client(max_retries=2)
+    request = FakeRequest([HttpError(500)] * 3)
+
+    with pytest.raises(HttpError):
+        client.execute(request)
+    assert request.calls == 3
+
+
+def test_token_bucket_paces_requests_after_burst():
+    clock = FakeClock()
+    bucket = TokenBucket(60, capacity=2, clock=clock, sleep=clock.sleep)
+
+    assert bucket.acquire() == 0
+    assert bucket.acquire() == 0
+    # Sin fichas: a 60 por minuto hay que esperar un segundo
+    assert bucket.acquire() == pytest.approx(1.0)
+    assert clock.now == pytest.approx(1.0)
+
+
+def test_flush_merges_adjacent_rows_into_one_batch_update():
+    service = FakeService()
+    client = _client(service)
+    client.queue_update('Hoja!A3:L3', [['c']])
+    client.queue_update('Hoja!A2:L2', [['b']])
+    client.queue_update('Hoja!A5:L5', [['e']])
+    client.queue_update('Hoja!B9:B9', [['x']])
+
+    assert client.flush() == 3
+    assert len(service.batches) == 1
+    data = {item['range']: item['values'] for item in service.batches[0]['data']}
+    assert data == {
+        'Hoja!A2:L3': [['b'], ['c']],
+        'Hoja!A5:L5': [['e']],
+        'Hoja!B9:B9': [['x']]
+    }
+    assert client.flush() == 0
+
+
+def test_flush_drops_failed_batch_and_raises():
+    service = FakeService([HttpError(400)])
+    client = _client(service)
+    client.queue_update('Hoja!A2:L2', [['b']])
+
+    with pytest.raises(HttpError):
+        client.flush()
+    metrics = client.metrics()
+    assert metrics['pending_writes'] == 0
+    assert metrics['dropped_writes'] == 1
@@ -0,0 +1,49 @@
+"""
+Pruebas del índice de búsqueda BM25
+"""
+from utils.text_search import TextSearchIndex, tokenize
+
+EVENTS = [
+    {'id': 'a', 'nombre': 'Jornada de voluntariado ambiental', 'lugar': 'Madrid', 'pais': 'España'},
+    {'id': 'b', 'nombre': 'Congreso de economía social', 'descripcion': 'Voluntariado y empleo', 'pais': 'Chile'},
+    {'id': 'c', 'nombre': 'Feria de empleo', 'lugar': 'Sevilla', 'pais': 'España'},
+]
+
+
+def _index(events=EVENTS) -> TextSearchIndex:
+    index = TextSearchIndex()
+    index.sync(events)
+    return index
+
+
+def _ids(results):
+    return [event['id'] for _, event in results]
+
+
+def test_tokenize_normalizes_accents_case_and_stopwords():
+    assert tokenize('La Economía SOCIAL') == tokenize('economia social')
+    assert tokenize('de la y') == []
+
+
+def test_title_matches_rank_above_description_matches():
+    results = _index().search('voluntariado')
+    assert _ids(results) == ['a', 'b']
+    assert results[0][0] > results[1][0]
+
+
+def test_search_tolerates_typos_and_applies_predicate_and_limit():
+    index = _index()
+    assert _ids(index.search('volutnariado')) == ['a', 'b']
+    assert _ids(index.search('empleo', predicate=lambda event: event['pais'] == 'España')) == ['c']
+    assert len(index.search('empleo', limit=1)) == 1
+    assert index.search('inexistente') == []
+
+
+def test_sync_only_touches_changed_documents():
+    index = _index()
+    changed = dict(EVENTS[2], nombre='Feria de voluntariado')
+
+    assert index.sync([EVENTS[0], changed]) == {'changed': 1, 'removed': 1}
+    assert len(index) == 2
+    assert sorted(_ids(index.search('voluntariado'))) == ['a', 'c']
+    assert index.search('congreso') == []
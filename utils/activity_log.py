@@ -0,0 +1,298 @@
+"""
+Registro de actividad en JSON Lines con escritura en segundo plano
+"""
+import atexit
+import glob
+import gzip
+import json
+import logging
+import os
+import shutil
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ActivityLog:
+    """
+    Registro de actividad (p. ej. las llamadas de /log_activity).
+
+    record() solo añade el registro a un búfer circular en memoria, así que
+    la petición no espera al disco. Un hilo en segundo plano vuelca el búfer
+    al archivo activo (una línea JSON por registro) cuando se acumulan
+    flush_batch registros o pasan flush_interval segundos. Si el búfer se
+    llena antes de volcarse, se descartan los registros más antiguos.
+
+    Cuando el archivo activo supera max_file_mb se renombra, se comprime con
+    gzip y se conservan solo los keep_files más recientes. query() lee los
+    archivos desde el final por bloques y se detiene en cuanto tiene los
+    registros pedidos, de modo que consultar lo reciente es barato aunque
+    el histórico sea grande (y ve también lo escrito por otros procesos).
+    """
+
+    FILENAME = 'activity.jsonl'
+
+    # Margen (segundos) entre la marca de tiempo de un registro y su escritura
+    # en disco: con varios procesos los lotes se intercalan fuera de orden
+    ORDER_MARGIN = 60.0
+
+    def __init__(self, log_dir: Optional[str] = None, buffer_size: Optional[int] = None,
+                 flush_batch: int = 500, flush_interval: float = 1.0,
+                 max_file_mb: Optional[float] = None, keep_files: Optional[int] = None):
+        """
+        Inicializa el registro (el hilo arranca con el primer registro)
+
+        Args:
+            log_dir: Directorio de los archivos (por defecto ACTIVITY_LOG_DIR o ./data/activity)
+            buffer_size: Registros que caben en el búfer (por defecto ACTIVITY_LOG_BUFFER o 10000)
+            flush_batch: Registros pendientes que provocan un volcado inmediato
+            flush_interval: Segundos máximos entre volcados
+            max_file_mb: Tamaño del archivo activo que provoca la rotación (por
+                defecto ACTIVITY_LOG_MAX_MB o 50)
+            keep_files: Archivos comprimidos que se conservan (por defecto ACTIVITY_LOG_KEEP o 20)
+        """
+        self.log_dir = log_dir or os.getenv('ACTIVITY_LOG_DIR', './data/activity')
+        self.buffer_size = int(
+            buffer_size if buffer_size is not None else os.getenv('ACTIVITY_LOG_BUFFER', '10000')
+        )
+        self.flush_batch = flush_batch
+        self.flush_interval = flush_interval
+        self.max_bytes = float(
+            max_file_mb if max_file_mb is not None else os.getenv('ACTIVITY_LOG_MAX_MB', '50')
+        ) * 1024 * 1024
+        self.keep_files = int(keep_files if keep_files is not None else os.getenv('ACTIVITY_LOG_KEEP', '20'))
+
+        if not os.path.exists(self.log_dir):
+            os.makedirs(self.log_dir)
+            logger.info(f"Created activity log directory: {self.log_dir}")
+        self.path = os.path.join(self.log_dir, self.FILENAME)
+
+        self._buffer: deque = deque(maxlen=self.buffer_size)
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._file = None
+
+        self.recorded = 0
+        self.dropped = 0
+        self.written = 0
+        atexit.register(self.close)
+
+    def record(self, data: Dict) -> Dict:
+        """
+        Registra una actividad sin esperar a que se escriba
+
+        Args:
+            data: Datos de la actividad
+
+        Returns:
+            Registro guardado (los datos con la marca de tiempo 'ts')
+        """
+        # La marca de tiempo es siempre la del servidor: query() depende de su orden
+        entry = {**data, 'ts': datetime.now().isoformat()}
+        with self._lock:
+            if len(self._buffer) == self._buffer.maxlen:
+                self.dropped += 1
+            self._buffer.append(entry)
+            self.recorded += 1
+            pending = len(self._buffer)
+
+        if self._thread is None or not self._thread.is_alive():
+            self.start()
+        if pending >= self.flush_batch:
+            self._wakeup.set()
+        return entry
+
+    def start(self):
+        """Arranca el hilo de escritura si no está en marcha"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="activity-log-writer", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        """Bucle del hilo de escritura"""
+        while not self._stop.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Error writing activity log {self.path}: {e}")
+
+    def _open(self):
+        """Abre el archivo activo, reabriéndolo si otro proceso lo rotó"""
+        if self._file is not None:
+            try:
+                if os.stat(self.path).st_ino == os.fstat(self._file.fileno()).st_ino:
+                    return self._file
+            except FileNotFoundError:
+                pass
+            self._file.close()
+        self._file = open(self.path, 'a', encoding='utf-8')
+        return self._file
+
+    def flush(self):
+        """Escribe en disco los registros pendientes del búfer"""
+        with self._write_lock:
+            with self._lock:
+                if not self._buffer:
+                    return
+                batch = list(self._buffer)
+                self._buffer.clear()
+
+            f = self._open()
+            # Una sola escritura por lote (modo append)
+            f.write(''.join(json.dumps(entry, ensure_ascii=False, default=str) + '\n' for entry in batch))
+            f.flush()
+            self.written += len(batch)
+
+            if f.tell() >= self.max_bytes:
+                self._rotate()
+
+    def _rotate(self):
+        """Renombra el archivo activo, lo comprime y elimina los más antiguos"""
+        self._file.close()
+        self._file = None
+
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+        rotated = os.path.join(self.log_dir, f"activity-{stamp}.jsonl")
+        try:
+            os.rename(self.path, rotated)
+        except FileNotFoundError:
+            # Otro proceso acaba de rotarlo
+            return
+
+        with open(rotated, 'rb') as source, gzip.open(f"{rotated}.gz", 'wb') as target:
+            shutil.copyfileobj(source, target, 1024 * 1024)
+        os.remove(rotated)
+        logger.info(f"Rotated activity log to {rotated}.gz")
+
+        for old in self._archives()[self.keep_files:]:
+            os.remove(old)
+
+    def _archives(self) -> List[str]:
+        """Archivos comprimidos, del más reciente al más antiguo"""
+        return sorted(glob.glob(os.path.join(self.log_dir, 'activity-*.jsonl.gz')), reverse=True)
+
+    @staticmethod
+    def _read_reverse(path: str, block_size: int = 64 * 1024) -> Iterator[str]:
+        """Líneas de un archivo desde el final, leyendo por bloques"""
+        with open(path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            position = f.tell()
+            remainder = b''
+            while position > 0:
+                size = min(block_size, position)
+                position -= size
+                f.seek(position)
+                lines = (f.read(size) + remainder).split(b'\n')
+                remainder = lines.pop(0)
+                for line in reversed(lines):
+                    if line:
+                        yield line.decode('utf-8')
+            if remainder:
+                yield remainder.decode('utf-8')
+
+    def _iter_disk(self) -> Iterator[Dict]:
+        """Registros en disco, del más reciente al más antiguo"""
+        paths = ([self.path] if os.path.exists(self.path) else []) + self._archives()
+        for path in paths:
+            if path == self.path:
+                lines = self._read_reverse(path)
+            else:
+                # gzip no permite leer hacia atrás: se descomprime solo si se llega a él
+                with gzip.open(path, 'rt', encoding='utf-8') as f:
+                    lines = reversed(f.read().splitlines())
+            for line in lines:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+    def query(self, limit: int = 100, since: Optional[str] = None,
+              filters: Optional[Dict[str, str]] = None) -> List[Dict]:
+        """
+        Actividad reciente, de la más nueva a la más antigua
+
+        Los registros se leen en el orden en que se escribieron. Con varios
+        procesos (workers de gunicorn) cada uno vuelca sus propios lotes, así
+        que el archivo solo está ordenado aproximadamente: los registros
+        anteriores a since se saltan y la lectura se detiene cuando aparece
+        uno anterior a since menos ORDER_MARGIN. Solo se vuelca el búfer de
+        este proceso; lo que otros procesos aún no han escrito (como mucho
+        flush_interval segundos de actividad) no aparece.
+
+        Args:
+            limit: Número máximo de registros
+            since: Marca de tiempo ISO mínima (opcional)
+            filters: Campos que deben coincidir exactamente (comparados como texto)
+
+        Returns:
+            Lista de registros
+
+        Raises:
+            ValueError: Si since no es una marca de tiempo ISO
+        """
+        filters = filters or {}
+        self.flush()
+
+        stop_before = None
+        if since:
+            try:
+                since_time = datetime.fromisoformat(since)
+            except ValueError:
+                raise ValueError(f"Invalid 'since' timestamp: {since!r}")
+            margin = max(self.ORDER_MARGIN, self.flush_interval)
+            stop_before = (since_time - timedelta(seconds=margin)).isoformat()
+
+        results = []
+        for entry in self._iter_disk():
+            ts = str(entry.get('ts', ''))
+            if stop_before and ts < stop_before:
+                break
+            if since and ts < since:
+                continue
+            if all(str(entry.get(key)) == value for key, value in filters.items()):
+                results.append(entry)
+                if len(results) >= limit:
+                    break
+        return results
+
+    def metrics(self) -> Dict:
+        """
+        Métricas del registro
+
+        Returns:
+            Diccionario con registros recibidos, escritos, descartados y pendientes
+        """
+        with self._lock:
+            pending = len(self._buffer)
+        return {
+            'recorded': self.recorded,
+            'written': self.written,
+            'dropped': self.dropped,
+            'pending': pending,
+            'archives': len(self._archives())
+        }
+
+    def close(self):
+        """Vuelca lo pendiente y detiene el hilo de escritura"""
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(5)
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"Error writing activity log {self.path}: {e}")
+        if self._file is not None:
+            self._file.close()
+            self._file = None
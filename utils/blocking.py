@@ -0,0 +1,274 @@
+"""
+Generación de candidatos para la deduplicación de eventos (blocking + MinHash/LSH)
+"""
+import logging
+import zlib
+from collections import defaultdict
+from itertools import combinations
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from utils.text_normalization import normalize_text
+from utils.url_canonicalizer import canonical_link_key
+
+logger = logging.getLogger(__name__)
+
+# Componentes de coincidencia exacta de calculate_similarity y el campo que usan
+EXACT_COMPONENTS = {
+    'date': 'fecha',
+    'link': 'enlace',
+    'org': 'entidad'
+}
+
+# Primo de Mersenne 2^31 - 1: a * h + b cabe en uint64 con hashes de 32 bits
+_MERSENNE_PRIME = (1 << 31) - 1
+
+
+class MinHashLSH:
+    """
+    Índice MinHash/LSH sobre shingles de caracteres de los títulos
+    """
+
+    def __init__(self, num_perm: int = 64, bands: int = 16, shingle_size: int = 3, seed: int = 42):
+        """
+        Inicializa el índice
+
+        Args:
+            num_perm: Número de permutaciones de la firma MinHash
+            bands: Número de bandas LSH (num_perm debe ser divisible por bands)
+            shingle_size: Tamaño de los shingles de caracteres
+            seed: Semilla para que las firmas sean reproducibles entre ejecuciones
+        """
+        if num_perm % bands != 0:
+            raise ValueError("num_perm must be divisible by bands")
+
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, _MERSENNE_PRIME, size=(num_perm, 1)).astype(np.uint64)
+        self._b = rng.randint(0, _MERSENNE_PRIME, size=(num_perm, 1)).astype(np.uint64)
+
+    def shingles(self, text: str) -> Set[str]:
+        """
+        Obtiene los shingles de caracteres de un texto normalizado
+
+        Args:
+            text: Texto
+
+        Returns:
+            Conjunto de shingles
+        """
+        text = normalize_text(text)
+        if not text:
+            return set()
+        if len(text) <= self.shingle_size:
+            return {text}
+        return {text[i:i + self.shingle_size] for i in range(len(text) - self.shingle_size + 1)}
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """
+        Calcula la firma MinHash de un texto
+
+        Args:
+            text: Texto
+
+        Returns:
+            Array con la firma o None si el texto está vacío
+        """
+        shingles = self.shingles(text)
+        if not shingles:
+            return None
+
+        # crc32 es estable entre procesos, a diferencia de hash()
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode('utf-8')) for s in shingles),
+            dtype=np.uint64,
+            count=len(shingles)
+        )
+        return ((self._a * hashes + self._b) % _MERSENNE_PRIME).min(axis=1)
+
+    def buckets(self, texts: List[str]) -> List[List[int]]:
+        """
+        Agrupa textos que comparten al menos una banda LSH
+
+        Args:
+            texts: Lista de textos
+
+        Returns:
+            Lista de buckets (índices) con al menos dos elementos
+        """
+        band_buckets = defaultdict(list)
+
+        for index, text in enumerate(texts):
+            signature = self.signature(text)
+            if signature is None:
+                continue
+            for band in range(self.bands):
+                band_slice = signature[band * self.rows:(band + 1) * self.rows]
+                band_buckets[(band, band_slice.tobytes())].append(index)
+
+        return [bucket for bucket in band_buckets.values() if len(bucket) > 1]
+
+
+class CandidateGenerator:
+    """
+    Genera pares candidatos a duplicado sin comparar todos contra todos.
+
+    Para un umbral y unos pesos dados, calcula qué combinaciones mínimas de
+    componentes exactos (fecha, enlace, entidad) son necesarias para poder
+    alcanzar el umbral y agrupa los eventos por esas claves. Solo si el
+    nombre por sí solo puede alcanzar el umbral se recurre a MinHash/LSH
+    sobre los títulos, que es aproximado.
+
+    Los bloques exactos mayores que max_block_size no se podan: se dividen
+    en trozos y se emite un sub-bloque por cada pareja de trozos, de modo que
+    todos sus pares se siguen puntuando pero la matriz de cada sub-bloque no
+    pasa de max_block_size x max_block_size.
+    """
+
+    def __init__(self, weights: Dict[str, float], threshold: float,
+                 max_block_size: int = 2000, lsh: Optional[MinHashLSH] = None):
+        """
+        Inicializa el generador de candidatos
+
+        Args:
+            weights: Pesos de similitud ('name', 'date', 'link', 'org')
+            threshold: Umbral de similitud usado por el deduplicador
+            max_block_size: Tamaño máximo de un bloque puntuado de una vez
+                (los mayores se puntúan por trozos, con el mismo resultado)
+            lsh: Índice MinHash/LSH (opcional)
+        """
+        self.weights = weights
+        self.threshold = threshold
+        self.max_block_size = max_block_size
+        self.lsh = lsh or MinHashLSH()
+        self.blocking_schemes = self._minimal_reachable_subsets()
+        self.needs_name_lsh = () in self.blocking_schemes
+
+        if self.needs_name_lsh:
+            logger.warning(
+                f"Threshold {threshold} reachable by name similarity alone, "
+                f"falling back to approximate MinHash/LSH candidates"
+            )
+
+    def _is_reachable(self, components: Tuple[str, ...]) -> bool:
+        """Indica si el umbral es alcanzable coincidiendo solo en estos componentes exactos"""
+        best_score = self.weights['name'] + sum(self.weights[c] for c in components)
+        # Pequeña tolerancia para no descartar combinaciones por redondeo
+        return best_score + 1e-9 >= self.threshold
+
+    def _minimal_reachable_subsets(self) -> List[Tuple[str, ...]]:
+        """
+        Calcula las combinaciones mínimas de componentes exactos con las que
+        el umbral es alcanzable. Todo par por encima del umbral coincide al
+        menos en una de ellas, por lo que agrupar por estas claves no pierde
+        duplicados.
+        """
+        components = list(EXACT_COMPONENTS)
+        minimal = []
+        for size in range(len(components) + 1):
+            for subset in combinations(components, size):
+                if any(set(m).issubset(subset) for m in minimal):
+                    continue
+                if self._is_reachable(subset):
+                    minimal.append(subset)
+        return minimal
+
+    def _component_value(self, event: Dict, component: str) -> Optional[str]:
+        """Valor normalizado de un componente para usar como clave de bloque"""
+        value = event.get(EXACT_COMPONENTS[component]) or ''
+        if component == 'link':
+            # Un enlace vacío nunca cuenta como coincidencia
+            return canonical_link_key(value) or None
+        if component == 'org':
+            return normalize_text(value)
+        return value
+
+    def block_keys(self, event: Dict) -> List[Tuple]:
+        """
+        Calcula las claves de bloque exactas de un evento
+
+        Args:
+            event: Evento
+
+        Returns:
+            Lista de claves (una por esquema de bloqueo aplicable)
+        """
+        keys = []
+        for scheme in self.blocking_schemes:
+            if not scheme:
+                continue
+            values = tuple(self._component_value(event, c) for c in scheme)
+            if any(v is None for v in values):
+                continue
+            keys.append((scheme, values))
+        return keys
+
+    def generate_blocks(self, events: List[Dict]) -> List[List[int]]:
+        """
+        Agrupa los eventos en bloques cuyos pares son candidatos a duplicado
+
+        Args:
+            events: Lista de eventos
+
+        Returns:
+            Lista de bloques (índices de eventos) con al menos dos elementos
+        """
+        blocks = defaultdict(list)
+        for index, event in enumerate(events):
+            for key in self.block_keys(event):
+                blocks[key].append(index)
+
+        result = []
+        for key, block in blocks.items():
+            if len(block) < 2:
+                continue
+            if len(block) > self.max_block_size:
+                chunks = self._split_block(block)
+                logger.info(
+                    f"Block {key[0]} with {len(block)} events exceeds "
+                    f"{self.max_block_size}, scoring {len(chunks)} sub-blocks"
+                )
+                result.extend(chunks)
+            else:
+                result.append(block)
+
+        if self.needs_name_lsh:
+            names = [event.get('nombre', '') for event in events]
+            result.extend(self.lsh.buckets(names))
+
+        return result
+
+    def _split_block(self, block: List[int]) -> List[List[int]]:
+        """
+        Divide un bloque grande en sub-bloques que cubren todos sus pares
+
+        Args:
+            block: Índices del bloque
+
+        Returns:
+            Un sub-bloque (unión de dos trozos) por cada pareja de trozos
+        """
+        size = max(1, self.max_block_size // 2)
+        chunks = [block[start:start + size] for start in range(0, len(block), size)]
+        return [first + second for first, second in combinations(chunks, 2)]
+
+    def candidate_pairs(self, events: List[Dict]) -> Set[Tuple[int, int]]:
+        """
+        Obtiene los pares candidatos (i < j) a comparar
+
+        Args:
+            events: Lista de eventos
+
+        Returns:
+            Conjunto de pares de índices
+        """
+        pairs = set()
+        for block in self.generate_blocks(events):
+            for i, j in combinations(sorted(set(block)), 2):
+                pairs.add((i, j))
+        return pairs
@@ -0,0 +1,237 @@
+"""
+Índice persistente de deduplicación entre ejecuciones
+"""
+import hashlib
+import logging
+import math
+import os
+import sqlite3
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """
+    Filtro de Bloom simple sobre un bytearray
+    """
+
+    def __init__(self, capacity: int = 1_000_000, error_rate: float = 0.001):
+        """
+        Inicializa el filtro
+
+        Args:
+            capacity: Número de elementos esperado
+            error_rate: Tasa de falsos positivos deseada
+        """
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, int(round(self.num_bits / capacity * math.log(2))))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str) -> Iterable[int]:
+        """Posiciones de bits de una clave (doble hashing)"""
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, key: str):
+        """Añade una clave al filtro"""
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self._positions(key))
+
+    def is_saturated(self) -> bool:
+        """Indica si se ha superado la capacidad prevista"""
+        return self.count > self.capacity
+
+    def save(self, path: str):
+        """Guarda el filtro en disco de forma atómica"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            header = f"{self.capacity} {self.error_rate} {self.count}\n".encode('ascii')
+            f.write(header)
+            f.write(self.bits)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional['BloomFilter']:
+        """
+        Carga un filtro guardado con save()
+
+        Args:
+            path: Ruta del fichero
+
+        Returns:
+            Filtro cargado o None si no existe o está corrupto
+        """
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'rb') as f:
+                capacity, error_rate, count = f.readline().decode('ascii').split()
+                bloom = cls(int(capacity), float(error_rate))
+                bits = f.read()
+            if len(bits) != len(bloom.bits):
+                return None
+            bloom.bits = bytearray(bits)
+            bloom.count = int(count)
+            return bloom
+        except Exception as e:
+            logger.warning(f"Could not load Bloom filter from {path}: {e}")
+            return None
+
+
+class PersistentDedupIndex:
+    """
+    Índice en disco con todos los eventos vistos en ejecuciones anteriores.
+
+    Guarda el conjunto de IDs en SQLite con un filtro de Bloom delante, de
+    modo que los IDs nuevos (la mayoría) se descartan sin tocar la base de
+    datos, y un almacén de huellas (claves de bloque) con los campos
+    necesarios para la fase de similitud.
+    """
+
+    def __init__(self, path: Optional[str] = None, bloom_capacity: int = 1_000_000,
+                 bloom_error_rate: float = 0.001):
+        """
+        Inicializa el índice
+
+        Args:
+            path: Ruta de la base de datos SQLite
+            bloom_capacity: Capacidad inicial del filtro de Bloom
+            bloom_error_rate: Tasa de falsos positivos del filtro de Bloom
+        """
+        self.path = path or os.getenv('SIRIA_DEDUP_INDEX', './data/dedup_index.db')
+        self.bloom_path = f"{self.path}.bloom"
+        self.bloom_error_rate = bloom_error_rate
+
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS event_ids (
+                id TEXT PRIMARY KEY,
+                first_seen TEXT,
+                last_seen TEXT
+            );
+            CREATE TABLE IF NOT EXISTS fingerprints (
+                fingerprint TEXT,
+                event_id TEXT,
+                nombre TEXT,
+                fecha TEXT,
+                enlace TEXT,
+                entidad TEXT,
+                PRIMARY KEY (fingerprint, event_id)
+            );
+        """)
+
+        self.bloom = BloomFilter.load(self.bloom_path)
+        if self.bloom is None or self.bloom.count != self._count_ids():
+            self._rebuild_bloom(max(bloom_capacity, 2 * self._count_ids()))
+
+        logger.info(f"Dedup index loaded from {self.path} with {self.bloom.count} known events")
+
+    def _count_ids(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM event_ids").fetchone()[0]
+
+    def _rebuild_bloom(self, capacity: int):
+        """Reconstruye el filtro de Bloom a partir de la tabla de IDs"""
+        self.bloom = BloomFilter(capacity, self.bloom_error_rate)
+        for (event_id,) in self.conn.execute("SELECT id FROM event_ids"):
+            self.bloom.add(event_id)
+        self.bloom.save(self.bloom_path)
+
+    def contains_id(self, event_id: str) -> bool:
+        """
+        Verifica si un ID se ha visto en alguna ejecución anterior
+
+        Args:
+            event_id: ID del evento
+
+        Returns:
+            True si el ID es conocido
+        """
+        if event_id not in self.bloom:
+            return False
+        row = self.conn.execute("SELECT 1 FROM event_ids WHERE id = ?", (event_id,)).fetchone()
+        return row is not None
+
+    def lookup_fingerprints(self, fingerprints: List[str]) -> List[Dict]:
+        """
+        Obtiene los eventos históricos que comparten alguna huella
+
+        Args:
+            fingerprints: Huellas del evento a comprobar
+
+        Returns:
+            Lista de eventos históricos (id, nombre, fecha, enlace, entidad)
+        """
+        if not fingerprints:
+            return []
+
+        placeholders = ','.join('?' * len(fingerprints))
+        rows = self.conn.execute(
+            f"SELECT DISTINCT event_id, nombre, fecha, enlace, entidad "
+            f"FROM fingerprints WHERE fingerprint IN ({placeholders})",
+            fingerprints
+        ).fetchall()
+
+        return [
+            {'id': row[0], 'nombre': row[1], 'fecha': row[2], 'enlace': row[3], 'entidad': row[4]}
+            for row in rows
+        ]
+
+    def add_events(self, events: List[Dict], fingerprints: Dict[str, List[str]]):
+        """
+        Registra eventos en el índice
+
+        Args:
+            events: Eventos (con 'id')
+            fingerprints: Huellas de cada evento por ID
+        """
+        now = datetime.now().isoformat()
+
+        new_ids = [event['id'] for event in events if not self.contains_id(event['id'])]
+
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO event_ids (id, first_seen, last_seen) VALUES (?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET last_seen = excluded.last_seen",
+                [(event['id'], now, now) for event in events]
+            )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO fingerprints "
+                "(fingerprint, event_id, nombre, fecha, enlace, entidad) VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (fp, event['id'], event.get('nombre', ''), event.get('fecha', ''),
+                     event.get('enlace', ''), event.get('entidad', ''))
+                    for event in events
+                    for fp in fingerprints.get(event['id'], [])
+                ]
+            )
+
+        for event_id in set(new_ids):
+            self.bloom.add(event_id)
+
+        if self.bloom.is_saturated():
+            self._rebuild_bloom(2 * self.bloom.count)
+        else:
+            self.bloom.save(self.bloom_path)
+
+        logger.info(f"Dedup index updated: {len(set(new_ids))} new events, {self.bloom.count} total")
+
+    def close(self):
+        """Cierra la conexión con la base de datos"""
+        self.conn.close()
@@ -1,11 +1,16 @@
 """
 Sistema de deduplicación de eventos
 """
-import hashlib
-from typing import List, Dict, Set
+import json
+from typing import List, Dict, Set, Optional, Tuple
 import logging
 from datetime import datetime
-from difflib import SequenceMatcher
+
+from utils.blocking import CandidateGenerator
+from utils.similarity import BatchSimilarityScorer, name_similarity
+from utils.dedup_index import PersistentDedupIndex
+from utils.url_canonicalizer import LinkIndex, canonical_link_key
+from utils.event_ids import event_id, is_canonical_id
 
 logger = logging.getLogger(__name__)
 
@@ -15,34 +20,42 @@ class EventDeduplicator:
     Sistema para detectar y eliminar eventos duplicados
     """
 
-    def __init__(self, similarity_threshold: float = 0.85):
+    # Peso de cada factor en la similitud
+    SIMILARITY_WEIGHTS = {
+        'name': 0.4,
+        'date': 0.2,
+        'link': 0.3,
+        'org': 0.1
+    }
+
+    # Campos que se completan desde otros duplicados si la base los tiene vacíos
+    MERGE_FILL_FIELDS = ['hora', 'modalidad', 'lugar', 'categoria', 'pais']
+
+    def __init__(self, similarity_threshold: float = 0.85, dedup_index: Optional[PersistentDedupIndex] = None):
         """
         Inicializa el deduplicador
 
         Args:
             similarity_threshold: Umbral de similitud (0-1) para considerar eventos como duplicados
+            dedup_index: Índice persistente con los eventos de ejecuciones anteriores (opcional)
         """
         self.similarity_threshold = similarity_threshold
         self.seen_ids: Set[str] = set()
+        self.dedup_index = dedup_index
+        self.candidate_generator = CandidateGenerator(self.SIMILARITY_WEIGHTS, similarity_threshold)
+        self.scorer = BatchSimilarityScorer(self.SIMILARITY_WEIGHTS)
 
     def generate_event_id(self, event: Dict) -> str:
         """
-        Genera un ID único para un evento
+        Genera el ID canónico de un evento (ver utils.event_ids)
 
         Args:
             event: Evento
 
         Returns:
-            Hash único del evento
+            ID estable del evento
         """
-        # Usar enlace + fecha como identificador principal
-        unique_string = f"{event.get('enlace', '')}{event.get('fecha', '')}"
-
-        # Si no hay enlace, usar nombre + entidad + fecha
-        if not event.get('enlace'):
-            unique_string = f"{event.get('nombre', '')}{event.get('entidad', '')}{event.get('fecha', '')}"
-
-        return hashlib.md5(unique_string.encode('utf-8')).hexdigest()
+        return event_id(event)
 
     def is_duplicate_by_id(self, event: Dict) -> bool:
         """
@@ -62,6 +75,77 @@ class EventDeduplicator:
         self.seen_ids.add(event_id)
         return False
 
+    def fingerprints(self, event: Dict) -> List[str]:
+        """
+        Obtiene las huellas de un evento para el índice persistente
+
+        Las huellas son las claves de bloque del generador de candidatos, de
+        modo que un evento histórico solo se compara si comparte alguna.
+
+        Args:
+            event: Evento
+
+        Returns:
+            Lista de huellas serializadas
+        """
+        return [
+            json.dumps(key, ensure_ascii=False)
+            for key in self.candidate_generator.block_keys(event)
+        ]
+
+    def split_known_events(self, events: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+        """
+        Separa los eventos nuevos de los ya vistos en ejecuciones anteriores
+
+        Un evento es conocido si su ID está en el índice persistente o si es
+        similar (por encima del umbral) a algún evento histórico que comparta
+        alguna huella con él.
+
+        Args:
+            events: Lista de eventos (con 'id')
+
+        Returns:
+            Tupla (eventos nuevos, eventos conocidos)
+        """
+        if not self.dedup_index:
+            return list(events), []
+
+        new_events = []
+        known_events = []
+
+        for event in events:
+            event_id = event.get('id') or self.generate_event_id(event)
+            if self.dedup_index.contains_id(event_id):
+                known_events.append(event)
+                continue
+
+            history = self.dedup_index.lookup_fingerprints(self.fingerprints(event))
+            if any(
+                self.calculate_similarity(event, past) >= self.similarity_threshold
+                for past in history
+            ):
+                known_events.append(event)
+            else:
+                new_events.append(event)
+
+        logger.info(f"History check: {len(new_events)} new events, {len(known_events)} already known")
+        return new_events, known_events
+
+    def remember_events(self, events: List[Dict]):
+        """
+        Registra eventos en el índice persistente para próximas ejecuciones
+
+        Args:
+            events: Lista de eventos (con 'id')
+        """
+        if not self.dedup_index:
+            return
+
+        self.dedup_index.add_events(
+            events,
+            {event['id']: self.fingerprints(event) for event in events}
+        )
+
     def calculate_similarity(self, event1: Dict, event2: Dict) -> float:
         """
         Calcula la similitud entre dos eventos
@@ -74,34 +158,27 @@ class EventDeduplicator:
             Puntuación de similitud (0-1)
         """
         # Comparar nombres
-        name_similarity = SequenceMatcher(
-            None,
-            event1.get('nombre', '').lower(),
-            event2.get('nombre', '').lower()
-        ).ratio()
+        name_match = name_similarity(
+            (event1.get('nombre') or '').lower(),
+            (event2.get('nombre') or '').lower()
+        )
 
         # Comparar fechas
         date_match = 1.0 if event1.get('fecha') == event2.get('fecha') else 0.0
 
-        # Comparar enlaces (si existen)
-        link1 = event1.get('enlace', '')
-        link2 = event2.get('enlace', '')
+        # Comparar enlaces canónicos (si existen)
+        link1 = canonical_link_key(event1.get('enlace') or '')
+        link2 = canonical_link_key(event2.get('enlace') or '')
         link_match = 1.0 if link1 and link2 and link1 == link2 else 0.0
 
         # Comparar entidades
         org_match = 1.0 if event1.get('entidad') == event2.get('entidad') else 0.0
 
-        # Peso de cada factor
-        weights = {
-            'name': 0.4,
-            'date': 0.2,
-            'link': 0.3,
-            'org': 0.1
-        }
+        weights = self.SIMILARITY_WEIGHTS
 
         # Calcular similitud ponderada
         similarity = (
-            name_similarity * weights['name'] +
+            name_match * weights['name'] +
             date_match * weights['date'] +
             link_match * weights['link'] +
             org_match * weights['org']
@@ -113,92 +190,105 @@ class EventDeduplicator:
         """
         Encuentra grupos de eventos duplicados
 
+        Solo se comparan los pares propuestos por el generador de candidatos,
+        que descarta de antemano los pares que no pueden alcanzar el umbral,
+        y cada bloque de candidatos se puntúa de una vez con el motor por lotes.
+        Los grupos se forman con union-find, por lo que la relación de
+        duplicado es transitiva y no depende del orden de los eventos. Los
+        eventos con el mismo ID, o con el mismo enlace canónico y la misma
+        fecha, siempre quedan en el mismo grupo sin pasar por la comparación
+        difusa.
+
         Args:
             events: Lista de eventos
 
         Returns:
-            Lista de grupos de índices de eventos duplicados
+            Lista de grupos de índices (ordenados) de eventos duplicados
         """
-        duplicate_groups = []
-        processed_indices = set()
-
-        for i, event1 in enumerate(events):
-            if i in processed_indices:
-                continue
-
-            duplicates = [i]
-
-            for j, event2 in enumerate(events[i + 1:], start=i + 1):
-                if j in processed_indices:
-                    continue
-
-                similarity = self.calculate_similarity(event1, event2)
-
-                if similarity >= self.similarity_threshold:
-                    duplicates.append(j)
-                    processed_indices.add(j)
-
-            if len(duplicates) > 1:
-                duplicate_groups.append(duplicates)
-                processed_indices.update(duplicates)
-
-        return duplicate_groups
+        clusters = UnionFind(len(events))
+
+        first_index_by_id = {}
+        for i, event in enumerate(events):
+            event_id = event.get('id')
+            if event_id:
+                clusters.union(first_index_by_id.setdefault(event_id, i), i)
+
+        # Unión hash por enlace canónico + fecha
+        for group in LinkIndex().build(events).groups():
+            for i in group[1:]:
+                clusters.union(group[0], i)
+
+        blocks = self.candidate_generator.generate_blocks(events)
+        logger.info(f"Scoring {len(blocks)} candidate blocks for {len(events)} events")
+
+        prepared = self.scorer.prepare(events)
+        similar = self.scorer.similar_pairs(prepared, blocks, self.similarity_threshold)
+
+        for i, neighbours in similar.items():
+            for j in neighbours:
+                clusters.union(i, j)
+
+        return [group for group in clusters.groups() if len(group) > 1]
+
+    @staticmethod
+    def _canonical_order_key(event: Dict) -> Tuple:
+        """Clave de orden estable, independiente del orden de llegada de los scrapers"""
+        return (
+            event.get('id') or '',
+            event.get('fecha') or '',
+            event.get('nombre') or '',
+            event.get('entidad') or '',
+            event.get('enlace') or '',
+            event.get('descripcion') or '',
+            # Desempate por el contenido completo (hora, modalidad, lugar...)
+            json.dumps(event, sort_keys=True, ensure_ascii=False, default=str)
+        )
 
     def deduplicate(self, events: List[Dict], keep_first: bool = True) -> List[Dict]:
         """
-        Elimina eventos duplicados de una lista
+        Elimina eventos duplicados de una lista fusionando cada grupo de
+        duplicados en un único evento
 
         Args:
             events: Lista de eventos
-            keep_first: Si True, mantiene el primer evento de cada grupo duplicado
+            keep_first: Si True, el primer evento de cada grupo (en orden
+                canónico) es la base de la fusión; si False, el último
 
         Returns:
-            Lista de eventos únicos
+            Lista de eventos únicos en orden canónico
         """
         logger.info(f"Deduplicating {len(events)} events")
 
-        # Asignar IDs si no los tienen
+        # Asignar IDs canónicos (también a eventos con IDs de esquemas antiguos)
         for event in events:
-            if 'id' not in event:
+            if not is_canonical_id(event.get('id')):
                 event['id'] = self.generate_event_id(event)
 
-        # Encontrar duplicados por ID exacto
-        unique_events = []
-        seen_ids = set()
+        # Orden canónico para que el resultado sea determinista
+        ordered_events = sorted(events, key=self._canonical_order_key)
 
-        for event in events:
-            event_id = event['id']
-            if event_id not in seen_ids:
-                unique_events.append(event)
-                seen_ids.add(event_id)
-
-        logger.info(f"After ID-based deduplication: {len(unique_events)} events")
-
-        # Encontrar duplicados por similitud
-        duplicate_groups = self.find_duplicates(unique_events)
-
-        if duplicate_groups:
-            logger.info(f"Found {len(duplicate_groups)} groups of similar events")
-
-            # Crear conjunto de índices a eliminar
-            indices_to_remove = set()
-            for group in duplicate_groups:
-                # Mantener el primero, eliminar el resto
-                if keep_first:
-                    indices_to_remove.update(group[1:])
-                else:
-                    indices_to_remove.update(group[:-1])
-
-            # Filtrar eventos
-            final_events = [
-                event for i, event in enumerate(unique_events)
-                if i not in indices_to_remove
-            ]
-        else:
-            final_events = unique_events
+        # Agrupar duplicados por ID exacto y por similitud
+        duplicate_groups = self.find_duplicates(ordered_events)
+        logger.info(f"Found {len(duplicate_groups)} groups of duplicate events")
+
+        grouped_indices = {i for group in duplicate_groups for i in group}
+
+        merged_events = {}
+        for group in duplicate_groups:
+            members = [ordered_events[i] for i in group]
+            if not keep_first:
+                members.reverse()
+            merged_events[group[0]] = self.merge_duplicate_info(members)
 
-        logger.info(f"After similarity-based deduplication: {len(final_events)} events")
-        logger.info(f"Removed {len(events) - len(final_events)} duplicate events")
+        final_events = []
+        for i, event in enumerate(ordered_events):
+            if i in merged_events:
+                final_events.append(merged_events[i])
+            elif i not in grouped_indices:
+                final_events.append(event)
+
+        logger.info(f"After deduplication: {len(final_events)} events")
+        logger.info(f"Merged {len(events) - len(final_events)} duplicate events")
 
         return final_events
 
@@ -207,7 +297,7 @@ class EventDeduplicator:
         Fusiona información de eventos duplicados
 
         Args:
-            events: Lista de eventos duplicados
+            events: Lista de eventos duplicados (el primero es la base)
 
         Returns:
             Evento fusionado con información combinada
@@ -215,14 +305,23 @@ class EventDeduplicator:
         if not events:
             return {}
 
+        if len(events) == 1:
+            return events[0].copy()
+
         # Tomar el primer evento como base
         merged = events[0].copy()
 
-        # Combinar descripciones si son diferentes
-        descriptions = set()
-        for event in events:
-            if event.get('descripcion'):
-                descriptions.add(event['descripcion'])
+        # Completar campos vacíos con el primer valor disponible del grupo
+        for field in self.MERGE_FILL_FIELDS:
+            if not merged.get(field):
+                value = next((e[field] for e in events if e.get(field)), None)
+                if value:
+                    merged[field] = value
+
+        # Combinar descripciones si son diferentes (en orden de aparición)
+        descriptions = dict.fromkeys(
+            event['descripcion'] for event in events if event.get('descripcion')
+        )
 
         if descriptions:
             merged['descripcion'] = ' | '.join(descriptions)
@@ -234,6 +333,47 @@ class EventDeduplicator:
 
         # Añadir metadatos sobre fusión
         merged['merged_from'] = len(events)
+        merged['merged_ids'] = list(dict.fromkeys(e['id'] for e in events if e.get('id')))
         merged['merged_at'] = datetime.now().isoformat()
 
         return merged
+
+
+class UnionFind:
+    """
+    Estructura union-find (conjuntos disjuntos) sobre índices 0..n-1
+    """
+
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+
+    def find(self, i: int) -> int:
+        """Devuelve el representante del conjunto de i (con compresión de caminos)"""
+        root = i
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[i] != root:
+            self.parent[i], i = root, self.parent[i]
+        return root
+
+    def union(self, i: int, j: int):
+        """Une los conjuntos de i y j; el representante es siempre el menor índice"""
+        root_i, root_j = self.find(i), self.find(j)
+        if root_i == root_j:
+            return
+        if root_i < root_j:
+            self.parent[root_j] = root_i
+        else:
+            self.parent[root_i] = root_j
+
+    def groups(self) -> List[List[int]]:
+        """
+        Obtiene todos los conjuntos
+
+        Returns:
+            Lista de conjuntos (índices ordenados), ordenada por su menor índice
+        """
+        groups: Dict[int, List[int]] = {}
+        for i in range(len(self.parent)):
+            groups.setdefault(self.find(i), []).append(i)
+        return list(groups.values())
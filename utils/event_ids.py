@@ -0,0 +1,117 @@
+"""
+Identificadores canónicos de eventos
+
+Todos los componentes (scrapers, deduplicación, Google Sheets y la API)
+generan los IDs con este módulo, de modo que un mismo evento tiene el mismo
+ID en todas partes y en todas las ejecuciones.
+"""
+import hashlib
+from typing import Dict, Iterable, List
+
+from utils.text_normalization import normalize_text
+from utils.url_canonicalizer import canonical_link_key
+
+# Versión del esquema de claves; cambiarla genera IDs nuevos para todos los eventos
+EVENT_ID_VERSION = 1
+
+# Prefijo de los IDs, incluye la versión para distinguir esquemas antiguos
+EVENT_ID_PREFIX = f"e{EVENT_ID_VERSION}"
+
+# Tamaño del hash en bytes (16 caracteres hexadecimales)
+_DIGEST_SIZE = 8
+
+
+def _encode_field(value) -> str:
+    """Codifica un campo con su longitud, para que la concatenación sea inequívoca"""
+    value = '' if value is None else str(value)
+    return f"{len(value)}:{value}"
+
+
+def event_key(event: Dict) -> str:
+    """
+    Construye la clave canónica de un evento
+
+    Si el evento tiene enlace, la clave es enlace canónico + fecha; si no,
+    nombre + entidad + fecha normalizados.
+
+    Args:
+        event: Evento
+
+    Returns:
+        Clave versionada y segura frente a separadores
+    """
+    fecha = (event.get('fecha') or '').strip()
+    link_key = canonical_link_key(event.get('enlace') or '')
+
+    if link_key:
+        fields = ['link', link_key, fecha]
+    else:
+        fields = [
+            'name',
+            normalize_text(event.get('nombre') or ''),
+            normalize_text(event.get('entidad') or ''),
+            fecha
+        ]
+
+    return f"v{EVENT_ID_VERSION}|" + '|'.join(_encode_field(field) for field in fields)
+
+
+def event_id(event: Dict) -> str:
+    """
+    Genera el ID canónico de un evento
+
+    Args:
+        event: Evento
+
+    Returns:
+        ID estable del evento (p. ej. 'e1' + 16 caracteres hexadecimales)
+    """
+    digest = hashlib.blake2b(event_key(event).encode('utf-8'), digest_size=_DIGEST_SIZE)
+    return f"{EVENT_ID_PREFIX}{digest.hexdigest()}"
+
+
+def event_ids(events: Iterable[Dict]) -> List[str]:
+    """
+    Genera los IDs canónicos de una colección de eventos
+
+    Args:
+        events: Eventos
+
+    Returns:
+        Lista de IDs en el mismo orden
+    """
+    return [event_id(event) for event in events]
+
+
+def assign_event_ids(events: List[Dict], overwrite: bool = False) -> List[Dict]:
+    """
+    Asigna el ID canónico a los eventos que no lo tienen
+
+    Args:
+        events: Lista de eventos (se modifican en el sitio)
+        overwrite: Si True, recalcula también los IDs existentes
+
+    Returns:
+        La misma lista de eventos
+    """
+    for event in events:
+        if overwrite or not event.get('id'):
+            event['id'] = event_id(event)
+    return events
+
+
+def is_canonical_id(value: str) -> bool:
+    """
+    Indica si un ID tiene el formato canónico de la versión actual
+
+    Args:
+        value: ID a comprobar
+
+    Returns:
+        True si es un ID canónico de la versión actual
+    """
+    return (
+        isinstance(value, str) and
+        len(value) == len(EVENT_ID_PREFIX) + 2 * _DIGEST_SIZE and
+        value.startswith(EVENT_ID_PREFIX)
+    )
@@ -1,11 +1,18 @@
 """
 Generador de archivos Excel para exportar eventos
 """
-import pandas as pd
-from typing import List, Dict
+from collections import Counter
+from typing import List, Dict, Optional, Tuple, TYPE_CHECKING
 import logging
 from datetime import datetime
 import os
+import re
+
+import numpy as np
+import xlsxwriter
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 logger = logging.getLogger(__name__)
 
@@ -28,6 +35,40 @@ class ExcelGenerator:
         'categoria': 'Categoría temática'
     }
 
+    # Ancho de cada columna en la hoja de eventos
+    COLUMN_WIDTHS = {
+        'nombre': 35,
+        'entidad': 25,
+        'fecha': 12,
+        'hora': 10,
+        'modalidad': 20,
+        'lugar': 20,
+        'enlace': 40,
+        'pais': 15,
+        'categoria': 30
+    }
+
+    # Límites de Excel para hipervínculos: por hoja y longitud de la URL
+    MAX_URLS_PER_SHEET = 65530
+    MAX_URL_LENGTH = 2079
+
+    # Esquemas que xlsxwriter acepta como hipervínculo
+    URL_PATTERN = re.compile(r'^(?:(?:ftp|http)s?://|mailto:)', re.IGNORECASE)
+
+    # Nombre por defecto de cada informe ({date} = fecha de generación)
+    DEFAULT_FILENAMES = {
+        'events': 'agenda_eventos_tercer_sector_{date}.xlsx',
+        'by_category': 'agenda_eventos_por_categoria_{date}.xlsx',
+        'summary': 'resumen_eventos_{date}.xlsx'
+    }
+
+    # Hojas de estadísticas del resumen: (hoja, encabezado, campo del evento)
+    SUMMARY_DIMENSIONS = [
+        ('Por categoría', 'Categoría', 'categoria'),
+        ('Por país', 'País', 'pais'),
+        ('Por modalidad', 'Modalidad', 'modalidad')
+    ]
+
     def __init__(self, output_dir: str = './output'):
         """
         Inicializa el generador de Excel
@@ -42,7 +83,36 @@ class ExcelGenerator:
             os.makedirs(output_dir)
             logger.info(f"Created output directory: {output_dir}")
 
-    def events_to_dataframe(self, events: List[Dict]) -> pd.DataFrame:
+    def output_path(self, kind: str, filename: Optional[str] = None) -> str:
+        """
+        Ruta de salida de un informe
+
+        Args:
+            kind: Tipo de informe ('events', 'by_category' o 'summary')
+            filename: Nombre del archivo (opcional, por defecto con la fecha de hoy)
+
+        Returns:
+            Ruta dentro del directorio de salida
+        """
+        if not filename:
+            date_str = datetime.now().strftime('%Y-%m-%d')
+            filename = self.DEFAULT_FILENAMES[kind].format(date=date_str)
+        return os.path.join(self.output_dir, filename)
+
+    @staticmethod
+    def sort_events(events: List[Dict]) -> List[Dict]:
+        """
+        Ordena los eventos por fecha (orden estable, vacíos primero)
+
+        Args:
+            events: Lista de eventos
+
+        Returns:
+            Nueva lista ordenada
+        """
+        return sorted(events, key=lambda event: str(event.get('fecha') or ''))
+
+    def events_to_dataframe(self, events: List[Dict]) -> 'pd.DataFrame':
         """
         Convierte lista de eventos a DataFrame de pandas
 
@@ -52,6 +122,9 @@ class ExcelGenerator:
         Returns:
             DataFrame con eventos
         """
+        # pandas solo se importa en los informes que lo necesitan
+        import pandas as pd
+
         if not events:
             # Retornar DataFrame vacío con columnas
             return pd.DataFrame(columns=list(self.COLUMN_MAPPING.values()))
@@ -79,6 +152,42 @@ class ExcelGenerator:
 
         return df
 
+    @staticmethod
+    def group_by_category(events: List[Dict]) -> Dict[str, List[Dict]]:
+        """
+        Agrupa eventos por categoría conservando su orden
+
+        Args:
+            events: Lista de eventos
+
+        Returns:
+            Diccionario categoría -> eventos
+        """
+        events_by_category = {}
+        for event in events:
+            category = event.get('categoria', 'Sin categoría')
+            events_by_category.setdefault(category, []).append(event)
+        return events_by_category
+
+    @classmethod
+    def summary_stats(cls, events: List[Dict]) -> Dict[str, List[Tuple[str, int]]]:
+        """
+        Calcula los recuentos del resumen en una sola pasada
+
+        Args:
+            events: Lista de eventos
+
+        Returns:
+            Diccionario campo -> [(valor, cantidad)] ordenado de mayor a menor
+        """
+        counters = {field: Counter() for _, _, field in cls.SUMMARY_DIMENSIONS}
+        for event in events:
+            for field, counter in counters.items():
+                value = event.get(field, '')
+                if value is not None:
+                    counter[value] += 1
+        return {field: counter.most_common() for field, counter in counters.items()}
+
     def generate_excel(self, events: List[Dict], filename: str = None) -> str:
         """
         Genera archivo Excel con eventos
@@ -90,85 +199,113 @@ class ExcelGenerator:
         Returns:
             Ruta del archivo generado
         """
-        # Generar nombre de archivo si no se proporciona
-        if not filename:
-            date_str = datetime.now().strftime('%Y-%m-%d')
-            filename = f"agenda_eventos_tercer_sector_{date_str}.xlsx"
-
-        filepath = os.path.join(self.output_dir, filename)
-
-        # Convertir eventos a DataFrame
-        df = self.events_to_dataframe(events)
-
-        # Crear archivo Excel con formato
-        with pd.ExcelWriter(filepath, engine='xlsxwriter') as writer:
-            df.to_excel(writer, sheet_name='Eventos', index=False)
-
-            # Obtener workbook y worksheet para dar formato
-            workbook = writer.book
-            worksheet = writer.sheets['Eventos']
-
-            # Formatos
-            header_format = workbook.add_format({
-                'bold': True,
-                'bg_color': '#4472C4',
-                'font_color': 'white',
-                'border': 1,
-                'align': 'center',
-                'valign': 'vcenter'
-            })
-
-            link_format = workbook.add_format({
-                'font_color': 'blue',
-                'underline': True
-            })
-
-            cell_format = workbook.add_format({
-                'border': 1,
-                'align': 'left',
-                'valign': 'top',
-                'text_wrap': True
-            })
-
-            # Aplicar formato a encabezados
-            for col_num, column in enumerate(df.columns):
-                worksheet.write(0, col_num, column, header_format)
-
-            # Ajustar anchos de columna
-            column_widths = {
-                'Nombre del evento': 35,
-                'Entidad organizadora': 25,
-                'Fecha': 12,
-                'Hora': 10,
-                'Modalidad (Presencial / Online)': 20,
-                'Lugar': 20,
-                'Enlace de inscripción': 40,
-                'País (España / Colombia)': 15,
-                'Categoría temática': 30
-            }
+        filepath = self.output_path('events', filename)
+        self.write_events_workbook(filepath, self.sort_events(events))
 
-            for col_num, column in enumerate(df.columns):
-                width = column_widths.get(column, 15)
-                worksheet.set_column(col_num, col_num, width)
+        logger.info(f"Generated Excel file: {filepath} with {len(events)} events")
+        return filepath
 
-            # Aplicar formato de enlace a la columna de enlaces
-            link_col_index = list(df.columns).index('Enlace de inscripción')
-            for row_num in range(1, len(df) + 1):
-                worksheet.write_url(
-                    row_num, link_col_index,
-                    df.iloc[row_num - 1]['Enlace de inscripción'],
-                    link_format,
-                    df.iloc[row_num - 1]['Enlace de inscripción']
-                )
+    @staticmethod
+    def _new_workbook(filepath: str) -> xlsxwriter.Workbook:
+        """
+        Crea un libro nuevo. Si el archivo ya existe se elimina antes, para no
+        sobrescribir otros enlaces al mismo archivo (p. ej. la caché de informes)
 
-            # Congelar fila de encabezados
-            worksheet.freeze_panes(1, 0)
+        Args:
+            filepath: Ruta del archivo
 
-            # Añadir autofiltro
-            worksheet.autofilter(0, 0, len(df), len(df.columns) - 1)
+        Returns:
+            Libro de xlsxwriter en modo constant_memory
+        """
+        if os.path.exists(filepath):
+            os.remove(filepath)
+        return xlsxwriter.Workbook(filepath, {'constant_memory': True})
 
-        logger.info(f"Generated Excel file: {filepath} with {len(events)} events")
-        return filepath
+    def write_events_workbook(self, filepath: str, sorted_events: List[Dict]):
+        """
+        Escribe el libro de eventos
+
+        Args:
+            filepath: Ruta del archivo
+            sorted_events: Eventos ya ordenados por fecha
+        """
+        # constant_memory escribe cada fila a disco en cuanto se completa,
+        # por lo que la memoria no crece con el número de eventos
+        workbook = self._new_workbook(filepath)
+        try:
+            self._write_events_sheet(workbook, 'Eventos', sorted_events)
+        finally:
+            workbook.close()
+
+    def _write_events_sheet(self, workbook: xlsxwriter.Workbook, sheet_name: str, events: List[Dict]):
+        """
+        Escribe una hoja de eventos fila a fila, con los enlaces en la misma pasada
+
+        Args:
+            workbook: Libro de xlsxwriter
+            sheet_name: Nombre de la hoja
+            events: Eventos ya ordenados
+        """
+        worksheet = workbook.add_worksheet(sheet_name)
+        fields = list(self.COLUMN_MAPPING)
+        link_col = fields.index('enlace')
+
+        # Formatos
+        header_format = workbook.add_format({
+            'bold': True,
+            'bg_color': '#4472C4',
+            'font_color': 'white',
+            'border': 1,
+            'align': 'center',
+            'valign': 'vcenter'
+        })
+
+        link_format = workbook.add_format({
+            'font_color': 'blue',
+            'underline': True
+        })
+
+        # Ajustar anchos de columna
+        for col_num, field in enumerate(fields):
+            worksheet.set_column(col_num, col_num, self.COLUMN_WIDTHS.get(field, 15))
+
+        # Encabezados
+        for col_num, field in enumerate(fields):
+            worksheet.write_string(0, col_num, self.COLUMN_MAPPING[field], header_format)
+
+        # Los valores se escriben siempre como texto, sin interpretar
+        # fórmulas ni números
+        urls_written = 0
+        for row_num, event in enumerate(events, start=1):
+            for col_num, field in enumerate(fields):
+                value = event.get(field)
+                if value is None or value == '':
+                    continue
+                value = str(value)
+
+                if col_num == link_col:
+                    if (urls_written < self.MAX_URLS_PER_SHEET and
+                            len(value) <= self.MAX_URL_LENGTH and
+                            self.URL_PATTERN.match(value)):
+                        worksheet.write_url(row_num, col_num, value, link_format, value)
+                        urls_written += 1
+                        continue
+                    worksheet.write_string(row_num, col_num, value, link_format)
+                    continue
+
+                worksheet.write_string(row_num, col_num, value)
+
+        if urls_written == self.MAX_URLS_PER_SHEET:
+            logger.warning(
+                f"Sheet '{sheet_name}' reached Excel's limit of {self.MAX_URLS_PER_SHEET} hyperlinks, "
+                f"remaining links written as text"
+            )
+
+        # Congelar fila de encabezados
+        worksheet.freeze_panes(1, 0)
+
+        # Añadir autofiltro
+        worksheet.autofilter(0, 0, len(events), len(fields) - 1)
 
     def generate_excel_by_category(self, events: List[Dict], filename: str = None) -> str:
         """
@@ -181,46 +318,28 @@ class ExcelGenerator:
         Returns:
             Ruta del archivo generado
         """
-        if not filename:
-            date_str = datetime.now().strftime('%Y-%m-%d')
-            filename = f"agenda_eventos_por_categoria_{date_str}.xlsx"
+        filepath = self.output_path('by_category', filename)
+        self.write_category_workbook(filepath, self.group_by_category(self.sort_events(events)))
 
-        filepath = os.path.join(self.output_dir, filename)
+        logger.info(f"Generated categorized Excel file: {filepath}")
+        return filepath
 
-        # Agrupar eventos por categoría
-        events_by_category = {}
-        for event in events:
-            category = event.get('categoria', 'Sin categoría')
-            if category not in events_by_category:
-                events_by_category[category] = []
-            events_by_category[category].append(event)
+    def write_category_workbook(self, filepath: str, events_by_category: Dict[str, List[Dict]]):
+        """
+        Escribe el libro con una hoja por categoría
 
-        # Crear Excel con múltiples hojas
-        with pd.ExcelWriter(filepath, engine='xlsxwriter') as writer:
+        Args:
+            filepath: Ruta del archivo
+            events_by_category: Eventos ya ordenados, agrupados por categoría
+        """
+        workbook = self._new_workbook(filepath)
+        try:
             for category, cat_events in events_by_category.items():
                 # Sanitizar nombre de hoja (Excel tiene límite de 31 caracteres)
                 sheet_name = category[:31]
-
-                df = self.events_to_dataframe(cat_events)
-                df.to_excel(writer, sheet_name=sheet_name, index=False)
-
-                # Formato básico
-                workbook = writer.book
-                worksheet = writer.sheets[sheet_name]
-
-                header_format = workbook.add_format({
-                    'bold': True,
-                    'bg_color': '#4472C4',
-                    'font_color': 'white',
-                    'border': 1
-                })
-
-                for col_num, column in enumerate(df.columns):
-                    worksheet.write(0, col_num, column, header_format)
-                    worksheet.set_column(col_num, col_num, 15)
-
-        logger.info(f"Generated categorized Excel file: {filepath}")
-        return filepath
+                self._write_events_sheet(workbook, sheet_name, cat_events)
+        finally:
+            workbook.close()
 
     def generate_summary_report(self, events: List[Dict], filename: str = None) -> str:
         """
@@ -233,42 +352,80 @@ class ExcelGenerator:
         Returns:
             Ruta del archivo generado
         """
-        if not filename:
-            date_str = datetime.now().strftime('%Y-%m-%d')
-            filename = f"resumen_eventos_{date_str}.xlsx"
-
-        filepath = os.path.join(self.output_dir, filename)
+        from utils.summary_analytics import SummaryAnalytics
 
-        # Crear DataFrames para diferentes análisis
-        df_events = self.events_to_dataframe(events)
+        filepath = self.output_path('summary', filename)
+        self.write_summary_workbook(
+            filepath,
+            self.sort_events(events),
+            self.summary_stats(events),
+            SummaryAnalytics(events).compute()
+        )
 
-        # Estadísticas por categoría
-        category_stats = df_events['Categoría temática'].value_counts().reset_index()
-        category_stats.columns = ['Categoría', 'Cantidad de eventos']
-
-        # Estadísticas por país
-        country_stats = df_events['País (España / Colombia)'].value_counts().reset_index()
-        country_stats.columns = ['País', 'Cantidad de eventos']
+        logger.info(f"Generated summary report: {filepath}")
+        return filepath
 
-        # Estadísticas por modalidad
-        modality_stats = df_events['Modalidad (Presencial / Online)'].value_counts().reset_index()
-        modality_stats.columns = ['Modalidad', 'Cantidad de eventos']
+    def write_summary_workbook(self, filepath: str, sorted_events: List[Dict],
+                               stats: Dict[str, List[Tuple[str, int]]],
+                               analytics: Optional[Dict[str, 'pd.DataFrame']] = None):
+        """
+        Escribe el libro resumen: todos los eventos y una hoja por estadística
 
-        # Guardar en Excel con múltiples hojas
-        with pd.ExcelWriter(filepath, engine='xlsxwriter') as writer:
+        Args:
+            filepath: Ruta del archivo
+            sorted_events: Eventos ya ordenados por fecha
+            stats: Recuentos calculados con summary_stats
+            analytics: Tablas adicionales por nombre de hoja (ver SummaryAnalytics)
+        """
+        workbook = self._new_workbook(filepath)
+        try:
             # Hoja de todos los eventos
-            df_events.to_excel(writer, sheet_name='Todos los eventos', index=False)
+            self._write_events_sheet(workbook, 'Todos los eventos', sorted_events)
 
             # Hojas de estadísticas
-            category_stats.to_excel(writer, sheet_name='Por categoría', index=False)
-            country_stats.to_excel(writer, sheet_name='Por país', index=False)
-            modality_stats.to_excel(writer, sheet_name='Por modalidad', index=False)
-
-            # Formato
-            workbook = writer.book
-            for sheet_name in writer.sheets:
-                worksheet = writer.sheets[sheet_name]
-                worksheet.set_column(0, 10, 20)
+            header_format = workbook.add_format({'bold': True, 'border': 1})
+            for sheet_name, label, field in self.SUMMARY_DIMENSIONS:
+                worksheet = workbook.add_worksheet(sheet_name)
+                worksheet.set_column(0, 1, 20)
+                worksheet.write_string(0, 0, label, header_format)
+                worksheet.write_string(0, 1, 'Cantidad de eventos', header_format)
+                for row_num, (value, count) in enumerate(stats.get(field, []), start=1):
+                    worksheet.write_string(row_num, 0, str(value))
+                    worksheet.write_number(row_num, 1, count)
+
+            # Hojas de análisis
+            for sheet_name, table in (analytics or {}).items():
+                self._write_table(workbook, sheet_name, table, header_format)
+        finally:
+            workbook.close()
+
+    @staticmethod
+    def _write_table(workbook: xlsxwriter.Workbook, sheet_name: str, table: 'pd.DataFrame', header_format):
+        """
+        Escribe un DataFrame en una hoja nueva, fila a fila
 
-        logger.info(f"Generated summary report: {filepath}")
-        return filepath
+        Args:
+            workbook: Libro de xlsxwriter
+            sheet_name: Nombre de la hoja
+            table: Tabla a escribir (el índice no se escribe)
+            header_format: Formato de los encabezados
+        """
+        worksheet = workbook.add_worksheet(sheet_name)
+        worksheet.set_column(0, max(len(table.columns) - 1, 0), 18)
+
+        for col_num, column in enumerate(table.columns):
+            worksheet.write_string(0, col_num, str(column), header_format)
+
+        for row_num, row in enumerate(table.itertuples(index=False, name=None), start=1):
+            for col_num, value in enumerate(row):
+                if value is None or value != value:
+                    # Vacíos y NaN/NaT
+                    continue
+                if isinstance(value, (bool, np.bool_)):
+                    worksheet.write_boolean(row_num, col_num, bool(value))
+                elif isinstance(value, (int, float, np.integer, np.floating)):
+                    worksheet.write_number(row_num, col_num, value)
+                else:
+                    worksheet.write_string(row_num, col_num, str(value))
+
+        worksheet.freeze_panes(1, 0)
@@ -0,0 +1,355 @@
+"""
+Exportación de eventos a formatos ligeros: CSV, JSON Lines, Parquet e iCalendar
+
+Todos los exportadores reciben un iterador de eventos y los escriben según
+llegan (por lotes en el caso de Parquet), sin construir un DataFrame, de modo
+que la memoria no depende del número de eventos.
+"""
+import csv
+import json
+import logging
+import os
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from utils.event_ids import event_id
+
+logger = logging.getLogger(__name__)
+
+# pyarrow se importa condicionalmente (solo lo necesita Parquet)
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+    logger.warning("pyarrow not available, Parquet export disabled. Install with: pip install pyarrow")
+
+
+# Campos exportados, en orden
+EXPORT_FIELDS = [
+    'id',
+    'nombre',
+    'entidad',
+    'fecha',
+    'hora',
+    'modalidad',
+    'lugar',
+    'enlace',
+    'pais',
+    'categoria',
+    'descripcion',
+    'ultima_actualizacion'
+]
+
+
+def _text(value) -> str:
+    """Valor de un campo como texto ('' si falta)"""
+    return '' if value is None else str(value)
+
+
+class EventExporter:
+    """
+    Base de los exportadores: escribe en un archivo temporal y lo renombra
+    al terminar, para que nunca quede a la vista un archivo a medias
+    """
+
+    # Extensión de los archivos generados
+    extension = ''
+
+    def __init__(self, fields: Optional[List[str]] = None):
+        """
+        Inicializa el exportador
+
+        Args:
+            fields: Campos a exportar (por defecto EXPORT_FIELDS)
+        """
+        self.fields = fields or EXPORT_FIELDS
+
+    def export(self, events: Iterable[Dict], filepath: str) -> int:
+        """
+        Exporta los eventos a un archivo
+
+        Args:
+            events: Eventos (cualquier iterable; se recorre una sola vez)
+            filepath: Ruta del archivo de salida
+
+        Returns:
+            Número de eventos exportados
+        """
+        tmp_path = f"{filepath}.tmp"
+        try:
+            count = self._write(iter(events), tmp_path)
+            os.replace(tmp_path, filepath)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        logger.info(f"Exported {count} events to {filepath}")
+        return count
+
+    def _write(self, events: Iterator[Dict], filepath: str) -> int:
+        raise NotImplementedError
+
+
+class CSVExporter(EventExporter):
+    """CSV en UTF-8 con BOM (para que Excel detecte la codificación)"""
+
+    extension = 'csv'
+
+    def _write(self, events: Iterator[Dict], filepath: str) -> int:
+        count = 0
+        with open(filepath, 'w', encoding='utf-8-sig', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(self.fields)
+            for event in events:
+                writer.writerow([_text(event.get(field)) for field in self.fields])
+                count += 1
+        return count
+
+
+class JSONLinesExporter(EventExporter):
+    """Un objeto JSON por línea"""
+
+    extension = 'jsonl'
+
+    def _write(self, events: Iterator[Dict], filepath: str) -> int:
+        count = 0
+        with open(filepath, 'w', encoding='utf-8') as f:
+            for event in events:
+                record = {field: event.get(field) for field in self.fields}
+                f.write(json.dumps(record, ensure_ascii=False))
+                f.write('\n')
+                count += 1
+        return count
+
+
+class ParquetExporter(EventExporter):
+    """Parquet columnar y comprimido, escrito por grupos de filas"""
+
+    extension = 'parquet'
+
+    def __init__(self, fields: Optional[List[str]] = None, batch_size: int = 50000,
+                 compression: str = 'zstd'):
+        """
+        Inicializa el exportador
+
+        Args:
+            fields: Campos a exportar
+            batch_size: Eventos por grupo de filas
+            compression: Códec de compresión de Parquet
+        """
+        super().__init__(fields)
+        self.batch_size = batch_size
+        self.compression = compression
+
+    def _write_batch(self, writer, columns: Dict[str, List[str]]):
+        writer.write_table(pa.table(columns, schema=writer.schema))
+
+    def _write(self, events: Iterator[Dict], filepath: str) -> int:
+        if not PYARROW_AVAILABLE:
+            raise RuntimeError("pyarrow is required for Parquet export")
+
+        schema = pa.schema([(field, pa.string()) for field in self.fields])
+        count = 0
+        with pq.ParquetWriter(filepath, schema, compression=self.compression) as writer:
+            columns = {field: [] for field in self.fields}
+            for event in events:
+                for field in self.fields:
+                    value = event.get(field)
+                    columns[field].append(None if value is None else str(value))
+                count += 1
+                if count % self.batch_size == 0:
+                    self._write_batch(writer, columns)
+                    columns = {field: [] for field in self.fields}
+
+            if columns[self.fields[0]] or count == 0:
+                self._write_batch(writer, columns)
+        return count
+
+
+class ICalendarExporter(EventExporter):
+    """
+    Calendario iCalendar (RFC 5545) con un VEVENT por evento. Los eventos
+    sin hora son de día completo; los que tienen hora duran
+    default_duration y usan hora local flotante.
+    """
+
+    extension = 'ics'
+
+    _TIME_PATTERN = re.compile(r'^\s*(\d{1,2})[:.h](\d{2})')
+
+    def __init__(self, default_duration: timedelta = timedelta(hours=2),
+                 calendar_name: str = 'Agenda Tercer Sector'):
+        """
+        Inicializa el exportador
+
+        Args:
+            default_duration: Duración de los eventos con hora
+            calendar_name: Nombre del calendario
+        """
+        super().__init__()
+        self.default_duration = default_duration
+        self.calendar_name = calendar_name
+
+    @staticmethod
+    def _escape(value: str) -> str:
+        """Escapa un valor de texto según RFC 5545"""
+        return (
+            value.replace('\\', '\\\\')
+            .replace(';', '\\;')
+            .replace(',', '\\,')
+            .replace('\r\n', '\\n')
+            .replace('\n', '\\n')
+            .replace('\r', '\\n')
+        )
+
+    @staticmethod
+    def _fold(line: str) -> str:
+        """Parte las líneas de más de 75 octetos, sin cortar caracteres UTF-8"""
+        data = line.encode('utf-8')
+        if len(data) <= 75:
+            return line + '\r\n'
+
+        parts = []
+        start = 0
+        limit = 75
+        while start < len(data):
+            end = min(start + limit, len(data))
+            # Retroceder si el corte cae dentro de un carácter multibyte
+            while end < len(data) and (data[end] & 0xC0) == 0x80:
+                end -= 1
+            parts.append(data[start:end])
+            start = end
+            limit = 74  # las continuaciones empiezan con un espacio
+        return b'\r\n '.join(parts).decode('utf-8') + '\r\n'
+
+    def _event_lines(self, event: Dict, stamp: str) -> Optional[List[str]]:
+        """Líneas de un VEVENT (None si el evento no tiene fecha válida)"""
+        try:
+            day = datetime.strptime(_text(event.get('fecha')).strip(), '%Y-%m-%d')
+        except ValueError:
+            return None
+
+        uid = _text(event.get('id')) or event_id(event)
+        lines = [
+            'BEGIN:VEVENT',
+            f"UID:{uid}@siria",
+            f"DTSTAMP:{stamp}"
+        ]
+
+        match = self._TIME_PATTERN.match(_text(event.get('hora')))
+        if match and int(match.group(1)) < 24 and int(match.group(2)) < 60:
+            start = day.replace(hour=int(match.group(1)), minute=int(match.group(2)))
+            end = start + self.default_duration
+            lines.append(f"DTSTART:{start:%Y%m%dT%H%M%S}")
+            lines.append(f"DTEND:{end:%Y%m%dT%H%M%S}")
+        else:
+            lines.append(f"DTSTART;VALUE=DATE:{day:%Y%m%d}")
+            lines.append(f"DTEND;VALUE=DATE:{day + timedelta(days=1):%Y%m%d}")
+
+        lines.append(f"SUMMARY:{self._escape(_text(event.get('nombre')))}")
+
+        location = _text(event.get('lugar'))
+        if _text(event.get('modalidad')).lower() == 'online' and not location:
+            location = 'Online'
+        if location:
+            lines.append(f"LOCATION:{self._escape(location)}")
+
+        link = _text(event.get('enlace'))
+        if link:
+            lines.append(f"URL:{link}")
+
+        if event.get('categoria'):
+            lines.append(f"CATEGORIES:{self._escape(_text(event.get('categoria')))}")
+
+        description = [
+            _text(event.get('descripcion')),
+            f"Organiza: {_text(event.get('entidad'))}" if event.get('entidad') else '',
+            f"Inscripción: {link}" if link else ''
+        ]
+        description = '\n\n'.join(part for part in description if part)
+        if description:
+            lines.append(f"DESCRIPTION:{self._escape(description)}")
+
+        lines.append('END:VEVENT')
+        return lines
+
+    def _write(self, events: Iterator[Dict], filepath: str) -> int:
+        stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+        count = 0
+        skipped = 0
+        with open(filepath, 'w', encoding='utf-8', newline='') as f:
+            for line in (
+                'BEGIN:VCALENDAR',
+                'VERSION:2.0',
+                'PRODID:-//SIRIA//Agenda Tercer Sector//ES',
+                'CALSCALE:GREGORIAN',
+                f"X-WR-CALNAME:{self._escape(self.calendar_name)}"
+            ):
+                f.write(self._fold(line))
+
+            for event in events:
+                lines = self._event_lines(event, stamp)
+                if lines is None:
+                    skipped += 1
+                    continue
+                f.write(''.join(self._fold(line) for line in lines))
+                count += 1
+
+            f.write(self._fold('END:VCALENDAR'))
+
+        if skipped:
+            logger.warning(f"Skipped {skipped} events without a valid date in iCalendar export")
+        return count
+
+
+# Nombre por defecto de las exportaciones. Distinto del de los informes Excel
+# (agenda_eventos_*), cuyos archivos caducados borra ReportCache
+EXPORT_FILENAME = 'exportacion_eventos_{date}.{extension}'
+
+# Exportadores disponibles por formato
+EXPORTERS = {
+    'csv': CSVExporter,
+    'jsonl': JSONLinesExporter,
+    'parquet': ParquetExporter,
+    'ics': ICalendarExporter
+}
+
+
+def default_export_filename(export_format: str, date: Optional[str] = None) -> str:
+    """
+    Nombre por defecto de una exportación
+
+    Args:
+        export_format: Formato ('csv', 'jsonl', 'parquet' o 'ics')
+        date: Fecha YYYY-MM-DD (por defecto, hoy)
+
+    Returns:
+        Nombre del archivo
+    """
+    if export_format not in EXPORTERS:
+        raise ValueError(f"Unknown export format: {export_format}")
+    return EXPORT_FILENAME.format(
+        date=date or datetime.now().strftime('%Y-%m-%d'),
+        extension=EXPORTERS[export_format].extension
+    )
+
+
+def export_events(events: Iterable[Dict], export_format: str, filepath: str) -> int:
+    """
+    Exporta eventos en el formato indicado
+
+    Args:
+        events: Eventos (cualquier iterable)
+        export_format: Formato ('csv', 'jsonl', 'parquet' o 'ics')
+        filepath: Ruta del archivo de salida
+
+    Returns:
+        Número de eventos exportados
+    """
+    if export_format not in EXPORTERS:
+        raise ValueError(f"Unknown export format: {export_format}")
+    return EXPORTERS[export_format]().export(events, filepath)
@@ -0,0 +1,574 @@
+"""
+Cola persistente de correo saliente con conexiones SMTP reutilizadas
+"""
+import json
+import logging
+import mimetypes
+import os
+import random
+import shutil
+import smtplib
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+from email import message_from_bytes, policy
+from email.message import EmailMessage
+from email.utils import getaddresses
+from typing import BinaryIO, Dict, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# Estados de un mensaje en la cola
+QUEUED = 'queued'
+SENDING = 'sending'
+SENT = 'sent'
+FAILED = 'failed'
+
+
+class PermanentMailError(Exception):
+    """El servidor rechazó el mensaje de forma definitiva (no se reintenta)"""
+
+
+class SMTPConnection:
+    """
+    Conexión SMTP autenticada que se mantiene abierta entre envíos.
+
+    Antes de reutilizarla tras un rato sin uso se comprueba con NOOP; si el
+    servidor la cerró, se abre otra. Se cierra sola tras idle_timeout
+    segundos sin enviar nada.
+    """
+
+    def __init__(self, host: str, port: int, user: str = '', password: str = '',
+                 use_tls: bool = True, timeout: float = 30, idle_timeout: float = 60):
+        """
+        Inicializa la conexión (no conecta hasta el primer envío)
+
+        Args:
+            host: Servidor SMTP
+            port: Puerto
+            user: Usuario (opcional)
+            password: Contraseña (opcional)
+            use_tls: True para STARTTLS, False para SMTP sobre SSL
+            timeout: Timeout de red en segundos
+            idle_timeout: Segundos sin uso tras los que se cierra la conexión
+        """
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.use_tls = use_tls
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+
+        self._server: Optional[smtplib.SMTP] = None
+        self._last_used = 0.0
+        self.connections_opened = 0
+
+    def _connect(self) -> smtplib.SMTP:
+        if self.use_tls:
+            server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            server.starttls()
+        else:
+            server = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout)
+        if self.user and self.password:
+            server.login(self.user, self.password)
+        self.connections_opened += 1
+        logger.debug(f"Opened SMTP connection to {self.host}:{self.port}")
+        return server
+
+    def _alive(self) -> bool:
+        if self._server is None:
+            return False
+        if time.monotonic() - self._last_used < 5:
+            return True
+        try:
+            return self._server.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def send(self, sender: str, recipients: List[str], data: bytes):
+        """
+        Envía un mensaje ya serializado, conectando si hace falta
+
+        Args:
+            sender: Remitente del sobre
+            recipients: Destinatarios del sobre
+            data: Mensaje completo (RFC 5322)
+
+        Raises:
+            PermanentMailError: Si el servidor rechaza el mensaje con un error 5xx
+            smtplib.SMTPException, OSError: Errores transitorios
+        """
+        if not self._alive():
+            self.close()
+            self._server = self._connect()
+        try:
+            refused = self._server.sendmail(sender, recipients, data)
+        except smtplib.SMTPRecipientsRefused as e:
+            raise PermanentMailError(f"All recipients refused: {e.recipients}")
+        except smtplib.SMTPResponseException as e:
+            # El servidor respondió: dejar la conexión lista para el siguiente mensaje
+            try:
+                self._server.rset()
+            except (smtplib.SMTPException, OSError):
+                self.close()
+            if 500 <= e.smtp_code < 600:
+                raise PermanentMailError(f"{e.smtp_code} {e.smtp_error!r}")
+            raise
+        except (smtplib.SMTPException, OSError):
+            self.close()
+            raise
+        self._last_used = time.monotonic()
+        if refused:
+            logger.warning(f"SMTP server refused some recipients: {refused}")
+
+    def close_if_idle(self):
+        """Cierra la conexión si lleva más de idle_timeout segundos sin uso"""
+        if self._server is not None and time.monotonic() - self._last_used > self.idle_timeout:
+            self.close()
+
+    def close(self):
+        """Cierra la conexión"""
+        if self._server is None:
+            return
+        try:
+            self._server.quit()
+        except (smtplib.SMTPException, OSError):
+            pass
+        self._server = None
+
+
+class MailQueue:
+    """
+    Cola de correo saliente persistida en SQLite.
+
+    enqueue() guarda el mensaje y vuelve enseguida; un pequeño conjunto de
+    hilos lo envía en segundo plano. Cada hilo reserva lotes de mensajes
+    y los envía por su propia conexión SMTP, que reutiliza entre lotes en
+    lugar de conectar y autenticarse para cada correo. Los fallos
+    transitorios se reintentan con backoff exponencial; los rechazos 5xx y
+    los mensajes que agotan los intentos quedan como 'failed'.
+
+    La reserva es una única sentencia UPDATE, así que varios procesos (p. ej.
+    workers de gunicorn) pueden compartir la misma cola. Los mensajes que
+    un proceso caído dejó en 'sending' se recuperan pasado lease_seconds.
+    Cada hilo renueva la reserva antes de cada envío y solo escribe el
+    resultado si la reserva sigue siendo suya, así que un mensaje recuperado
+    por otro hilo no se envía dos veces desde el mismo lote ni recibe dos
+    resultados.
+
+    Cada proceso que crea la cola arranca sus propios hilos: con gunicorn
+    hay hasta WEB_CONCURRENCY x workers conexiones SMTP abiertas a la vez
+    (se puede limitar con MAIL_WORKERS).
+
+    Los adjuntos no se guardan dentro del mensaje sino como archivos en
+    attachments_dir (enlazados o copiados por bloques), y solo se leen al
+    componer el correo en el momento del envío.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, workers: Optional[int] = None,
+                 batch_size: Optional[int] = None, max_attempts: Optional[int] = None,
+                 base_backoff: float = 30.0, max_backoff: float = 3600.0,
+                 poll_interval: float = 5.0, lease_seconds: float = 600.0,
+                 smtp_host: Optional[str] = None, smtp_port: Optional[int] = None,
+                 smtp_user: Optional[str] = None, smtp_password: Optional[str] = None,
+                 smtp_use_tls: Optional[bool] = None, attachments_dir: Optional[str] = None):
+        """
+        Inicializa la cola (los hilos arrancan con el primer mensaje, con
+        start() o aquí mismo si la base de datos tiene mensajes sin enviar)
+
+        Args:
+            db_path: Ruta de la base de datos (por defecto MAIL_QUEUE_DB o ./data/mail_queue.db)
+            workers: Hilos de envío (por defecto MAIL_WORKERS o 2)
+            batch_size: Mensajes reservados por lote (por defecto MAIL_BATCH_SIZE o 20)
+            max_attempts: Intentos por mensaje (por defecto MAIL_MAX_ATTEMPTS o 5)
+            base_backoff: Espera inicial entre reintentos (segundos)
+            max_backoff: Espera máxima entre reintentos (segundos)
+            poll_interval: Segundos entre comprobaciones de reintentos pendientes
+            lease_seconds: Segundos tras los que un mensaje en 'sending' se da por abandonado
+            smtp_host, smtp_port, smtp_user, smtp_password, smtp_use_tls: Servidor
+                SMTP (por defecto, las variables SMTP_*)
+            attachments_dir: Directorio de los adjuntos pendientes (por defecto
+                MAIL_ATTACHMENTS_DIR o ./data/mail_attachments)
+        """
+        self.db_path = db_path or os.getenv('MAIL_QUEUE_DB', './data/mail_queue.db')
+        self.workers = int(workers if workers is not None else os.getenv('MAIL_WORKERS', '2'))
+        self.batch_size = int(batch_size if batch_size is not None else os.getenv('MAIL_BATCH_SIZE', '20'))
+        self.max_attempts = int(
+            max_attempts if max_attempts is not None else os.getenv('MAIL_MAX_ATTEMPTS', '5')
+        )
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.attachments_dir = attachments_dir or os.getenv('MAIL_ATTACHMENTS_DIR', './data/mail_attachments')
+
+        self.smtp = {
+            'host': smtp_host if smtp_host is not None else os.getenv('SMTP_HOST', ''),
+            'port': int(smtp_port if smtp_port is not None else os.getenv('SMTP_PORT', '587')),
+            'user': smtp_user if smtp_user is not None else os.getenv('SMTP_USER', ''),
+            'password': smtp_password if smtp_password is not None else os.getenv('SMTP_PASS', ''),
+            'use_tls': (
+                smtp_use_tls if smtp_use_tls is not None
+                else os.getenv('SMTP_USE_TLS', 'true').lower() == 'true'
+            )
+        }
+
+        for directory in (os.path.dirname(self.db_path), self.attachments_dir):
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+                logger.info(f"Created data directory: {directory}")
+
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self._lock, self.conn:
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS outbox (
+                    id TEXT PRIMARY KEY,
+                    sender TEXT,
+                    recipients TEXT,
+                    subject TEXT,
+                    message BLOB,
+                    attachments TEXT,
+                    status TEXT,
+                    attempts INTEGER DEFAULT 0,
+                    next_attempt_at REAL,
+                    claim TEXT,
+                    claimed_at REAL,
+                    last_error TEXT,
+                    created_at TEXT,
+                    sent_at TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_outbox_pending ON outbox (status, next_attempt_at);
+            """)
+            columns = {row['name'] for row in self.conn.execute("PRAGMA table_info(outbox)")}
+            if 'attachments' not in columns:
+                self.conn.execute("ALTER TABLE outbox ADD COLUMN attachments TEXT")
+
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._connections: List[SMTPConnection] = []
+
+        # Mensajes que quedaron en cola o reservados por un proceso que se
+        # reinició: se envían sin esperar al próximo enqueue()
+        pending = self._pending_count()
+        if pending:
+            logger.info(f"Resuming {pending} unsent emails from {self.db_path}")
+            self.start()
+
+    def _pending_count(self) -> int:
+        """Mensajes en cola o en envío (incluidos los reintentos programados)"""
+        with self._lock:
+            return self.conn.execute(
+                "SELECT COUNT(*) FROM outbox WHERE status IN (?, ?)", (QUEUED, SENDING)
+            ).fetchone()[0]
+
+    @staticmethod
+    def _store_file(source: Union[str, BinaryIO], target: str):
+        """Guarda un adjunto: enlaza o copia una ruta, o vuelca un archivo abierto por bloques"""
+        if isinstance(source, str):
+            try:
+                os.link(source, target)
+            except OSError:
+                shutil.copyfile(source, target)
+            return
+        with open(target, 'wb') as f:
+            shutil.copyfileobj(source, f, 1024 * 1024)
+
+    def _discard_attachments(self, message_id: str):
+        shutil.rmtree(os.path.join(self.attachments_dir, message_id), ignore_errors=True)
+
+    def enqueue(self, message: EmailMessage,
+                attachments: Optional[List[Tuple[str, Union[str, BinaryIO]]]] = None) -> str:
+        """
+        Encola un mensaje para su envío
+
+        Args:
+            message: Mensaje con From, To (y opcionalmente Cc/Bcc) ya rellenos
+            attachments: Adjuntos como (nombre de archivo, ruta o archivo abierto en binario)
+
+        Returns:
+            ID del mensaje en la cola
+
+        Raises:
+            ValueError: Si el mensaje no tiene remitente o destinatarios
+        """
+        sender = message.get('From', '')
+        recipients = [
+            address for _, address in
+            getaddresses(message.get_all('To', []) + message.get_all('Cc', []) + message.get_all('Bcc', []))
+            if address
+        ]
+        if not sender or not recipients:
+            raise ValueError("Message needs a sender and at least one recipient")
+
+        # Bcc no debe viajar en las cabeceras
+        del message['Bcc']
+
+        message_id = uuid.uuid4().hex
+        stored = []
+        if attachments:
+            directory = os.path.join(self.attachments_dir, message_id)
+            os.makedirs(directory)
+            try:
+                for position, (filename, source) in enumerate(attachments):
+                    path = os.path.join(directory, str(position))
+                    self._store_file(source, path)
+                    stored.append([os.path.basename(filename), path])
+            except Exception:
+                self._discard_attachments(message_id)
+                raise
+
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO outbox (id, sender, recipients, subject, message, attachments, status, "
+                "next_attempt_at, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    message_id, sender, ','.join(recipients), message.get('Subject', ''),
+                    message.as_bytes(), json.dumps(stored) if stored else None,
+                    QUEUED, time.time(), datetime.now().isoformat()
+                )
+            )
+
+        self.start()
+        self._wakeup.set()
+        return message_id
+
+    def status(self, message_id: str) -> Optional[Dict]:
+        """
+        Estado de entrega de un mensaje
+
+        Args:
+            message_id: ID devuelto por enqueue
+
+        Returns:
+            Diccionario con estado, intentos, último error y fechas, o None si no existe
+        """
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT id, recipients, subject, status, attempts, next_attempt_at, last_error, "
+                "created_at, sent_at FROM outbox WHERE id = ?",
+                (message_id,)
+            ).fetchone()
+        if row is None:
+            return None
+
+        result = {
+            'message_id': row['id'],
+            'status': row['status'],
+            'to': row['recipients'].split(','),
+            'subject': row['subject'],
+            'attempts': row['attempts'],
+            'last_error': row['last_error'],
+            'created_at': row['created_at'],
+            'sent_at': row['sent_at']
+        }
+        if row['status'] == QUEUED and row['attempts']:
+            result['next_attempt_at'] = datetime.fromtimestamp(row['next_attempt_at']).isoformat()
+        return result
+
+    def metrics(self) -> Dict:
+        """
+        Métricas de la cola
+
+        Returns:
+            Diccionario con mensajes por estado, hilos activos y conexiones SMTP abiertas
+        """
+        with self._lock:
+            counts = dict(self.conn.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall())
+        return {
+            **{state: counts.get(state, 0) for state in (QUEUED, SENDING, SENT, FAILED)},
+            'workers': sum(1 for thread in self._threads if thread.is_alive()),
+            'smtp_connections_opened': sum(conn.connections_opened for conn in self._connections)
+        }
+
+    def start(self):
+        """Arranca los hilos de envío si no están en marcha"""
+        with self._lock:
+            if any(thread.is_alive() for thread in self._threads):
+                return
+            self._stop.clear()
+            self._threads = []
+            self._connections = []
+            for number in range(max(1, self.workers)):
+                connection = SMTPConnection(**self.smtp)
+                thread = threading.Thread(
+                    target=self._run, args=(connection,), name=f"mail-sender-{number}", daemon=True
+                )
+                self._connections.append(connection)
+                self._threads.append(thread)
+                thread.start()
+
+    def _claim(self) -> List[sqlite3.Row]:
+        """Reserva un lote de mensajes listos para enviar"""
+        claim = uuid.uuid4().hex
+        now = time.time()
+        with self._lock, self.conn:
+            self.conn.execute(
+                "UPDATE outbox SET status = ?, claim = ?, claimed_at = ? WHERE id IN ("
+                "  SELECT id FROM outbox"
+                "  WHERE (status = ? AND next_attempt_at <= ?) OR (status = ? AND claimed_at < ?)"
+                "  ORDER BY next_attempt_at LIMIT ?"
+                ")",
+                (SENDING, claim, now, QUEUED, now, SENDING, now - self.lease_seconds, self.batch_size)
+            )
+            return self.conn.execute(
+                "SELECT id, sender, recipients, message, attachments, attempts, claim FROM outbox WHERE claim = ? "
+                "ORDER BY next_attempt_at",
+                (claim,)
+            ).fetchall()
+
+    @staticmethod
+    def _message_bytes(row: sqlite3.Row) -> bytes:
+        """Mensaje listo para enviar, con los adjuntos leídos de disco"""
+        if not row['attachments']:
+            return row['message']
+
+        message = message_from_bytes(row['message'], policy=policy.default)
+        for filename, path in json.loads(row['attachments']):
+            content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+            maintype, subtype = content_type.split('/', 1)
+            with open(path, 'rb') as f:
+                message.add_attachment(f.read(), maintype=maintype, subtype=subtype, filename=filename)
+        return message.as_bytes()
+
+    def _update_claimed(self, row: sqlite3.Row, assignments: str, values: Tuple) -> bool:
+        """
+        Actualiza un mensaje solo si este hilo conserva su reserva
+
+        Args:
+            row: Mensaje reservado (con su 'claim')
+            assignments: Asignaciones SET de la sentencia UPDATE
+            values: Valores de las asignaciones
+
+        Returns:
+            False si la reserva caducó y otro hilo se quedó con el mensaje
+        """
+        with self._lock, self.conn:
+            cursor = self.conn.execute(
+                f"UPDATE outbox SET {assignments} WHERE id = ? AND claim = ?",
+                (*values, row['id'], row['claim'])
+            )
+        if cursor.rowcount:
+            return True
+        logger.warning(f"Lost claim on email {row['id']} (lease expired), leaving it to its new owner")
+        return False
+
+    def _renew_claim(self, row: sqlite3.Row) -> bool:
+        """Renueva la reserva antes de un envío (False si ya no es de este hilo)"""
+        return self._update_claimed(row, "claimed_at = ?", (time.time(),))
+
+    def _mark_sent(self, row: sqlite3.Row):
+        if self._update_claimed(
+            row,
+            "status = ?, attempts = attempts + 1, last_error = NULL, sent_at = ?, "
+            "message = NULL, attachments = NULL, claim = NULL",
+            (SENT, datetime.now().isoformat())
+        ):
+            self._discard_attachments(row['id'])
+
+    def _mark_failed(self, row: sqlite3.Row, error: str, permanent: bool):
+        attempts = row['attempts'] + 1
+        if permanent or attempts >= self.max_attempts:
+            if self._update_claimed(
+                row, "status = ?, attempts = ?, last_error = ?, claim = NULL", (FAILED, attempts, error)
+            ):
+                self._discard_attachments(row['id'])
+                logger.error(f"Giving up on email {row['id']} after {attempts} attempts: {error}")
+            return
+
+        # Backoff exponencial con jitter
+        delay = min(self.max_backoff, self.base_backoff * (2 ** (attempts - 1)))
+        delay = random.uniform(delay / 2, delay)
+        if not self._update_claimed(
+            row, "status = ?, attempts = ?, last_error = ?, next_attempt_at = ?, claim = NULL",
+            (QUEUED, attempts, error, time.time() + delay)
+        ):
+            return
+        logger.warning(
+            f"Email {row['id']} attempt {attempts}/{self.max_attempts} failed: {error}. "
+            f"Retrying in {delay:.0f}s"
+        )
+
+    def _send_batch(self, connection: SMTPConnection, rows: List[sqlite3.Row]):
+        for position, row in enumerate(rows):
+            if not self._renew_claim(row):
+                continue
+            try:
+                data = self._message_bytes(row)
+            except OSError as e:
+                self._mark_failed(row, f"Attachment unavailable: {e}", permanent=True)
+                continue
+
+            try:
+                connection.send(row['sender'], row['recipients'].split(','), data)
+            except PermanentMailError as e:
+                self._mark_failed(row, str(e), permanent=True)
+                continue
+            except (smtplib.SMTPException, OSError) as e:
+                # Probablemente el servidor no responde: devolver el resto del lote a la cola
+                self._mark_failed(row, str(e) or type(e).__name__, permanent=False)
+                with self._lock, self.conn:
+                    self.conn.executemany(
+                        "UPDATE outbox SET status = ?, claim = NULL WHERE id = ? AND claim = ?",
+                        [(QUEUED, pending['id'], pending['claim']) for pending in rows[position + 1:]]
+                    )
+                return
+            self._mark_sent(row)
+            logger.info(f"Email {row['id']} sent to {row['recipients']}")
+
+    def _run(self, connection: SMTPConnection):
+        """Bucle de un hilo de envío"""
+        while not self._stop.is_set():
+            try:
+                rows = self._claim()
+            except sqlite3.Error as e:
+                logger.error(f"Error claiming emails from {self.db_path}: {e}")
+                rows = []
+
+            if rows:
+                self._send_batch(connection, rows)
+                continue
+
+            connection.close_if_idle()
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+        connection.close()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Espera a que no queden mensajes listos para enviar
+
+        Args:
+            timeout: Tiempo máximo de espera en segundos (None = sin límite)
+
+        Returns:
+            True si no queda nada pendiente (los reintentos programados cuentan como pendientes)
+        """
+        self.start()
+        self._wakeup.set()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if not self._pending_count():
+                return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+
+    def stop(self, timeout: Optional[float] = 10):
+        """
+        Detiene los hilos de envío (lo pendiente queda en la cola)
+
+        Args:
+            timeout: Tiempo máximo de espera en segundos
+        """
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
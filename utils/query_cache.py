@@ -0,0 +1,103 @@
+"""
+Caché LRU de respuestas de la API, invalidada por versión del conjunto de eventos
+"""
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional
+
+
+class QueryCache:
+    """
+    Guarda las respuestas ya serializadas de las consultas más recientes.
+
+    Cada entrada pertenece a una versión de los datos (la semilla del ETag
+    del índice de eventos); cuando la versión cambia, la caché se vacía
+    entera en la siguiente consulta. Al superar max_entries se descarta la
+    entrada usada hace más tiempo.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        """
+        Inicializa la caché
+
+        Args:
+            max_entries: Número máximo de respuestas guardadas
+        """
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, bytes]" = OrderedDict()
+        self._version: Optional[str] = None
+        self._lock = threading.Lock()
+        self._metrics = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'invalidations': 0
+        }
+
+    def _check_version(self, version: str):
+        """Vacía la caché si cambió la versión de los datos (con el lock tomado)"""
+        if version != self._version:
+            if self._entries:
+                self._metrics['invalidations'] += 1
+            self._entries.clear()
+            self._version = version
+
+    def get(self, version: str, key: Hashable) -> Optional[bytes]:
+        """
+        Busca una respuesta
+
+        Args:
+            version: Versión actual de los datos
+            key: Consulta normalizada
+
+        Returns:
+            Cuerpo serializado o None si no está en caché
+        """
+        with self._lock:
+            self._check_version(version)
+            body = self._entries.get(key)
+            if body is None:
+                self._metrics['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._metrics['hits'] += 1
+            return body
+
+    def put(self, version: str, key: Hashable, body: bytes):
+        """
+        Guarda una respuesta
+
+        Args:
+            version: Versión de los datos con la que se calculó
+            key: Consulta normalizada
+            body: Cuerpo serializado
+        """
+        with self._lock:
+            self._check_version(version)
+            self._entries[key] = body
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._metrics['evictions'] += 1
+
+    def clear(self):
+        """Vacía la caché"""
+        with self._lock:
+            self._entries.clear()
+
+    def metrics(self) -> Dict:
+        """
+        Métricas de la caché
+
+        Returns:
+            Diccionario con aciertos, fallos, expulsiones, invalidaciones,
+            tasa de aciertos, entradas y bytes guardados
+        """
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics['entries'] = len(self._entries)
+            metrics['bytes'] = sum(len(body) for body in self._entries.values())
+            metrics['version'] = self._version
+        lookups = metrics['hits'] + metrics['misses']
+        metrics['hit_rate'] = round(metrics['hits'] / lookups, 4) if lookups else 0.0
+        return metrics
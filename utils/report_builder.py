@@ -0,0 +1,202 @@
+"""
+Generación de todos los informes a partir de una única preparación de los eventos
+"""
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from utils.excel_generator import ExcelGenerator
+from utils.report_cache import ReportCache
+from utils.summary_analytics import SummaryAnalytics
+
+logger = logging.getLogger(__name__)
+
+
+class ReportData:
+    """
+    Vista compartida por todos los informes: eventos ordenados por fecha,
+    agrupación por categoría y recuentos del resumen. Cada elemento se
+    calcula una sola vez y solo si algún informe lo necesita.
+    """
+
+    def __init__(self, events: List[Dict]):
+        """
+        Prepara los eventos
+
+        Args:
+            events: Lista de eventos
+        """
+        # Solo se conservan los campos que aparecen en los informes, lo que
+        # también reduce lo que hay que enviar a los procesos de escritura
+        fields = list(ExcelGenerator.COLUMN_MAPPING)
+        rows = [{field: event[field] for field in fields if field in event} for event in events]
+
+        self.events = ExcelGenerator.sort_events(rows)
+        self._by_category: Optional[Dict[str, List[Dict]]] = None
+        self._stats: Optional[Dict[str, List[Tuple[str, int]]]] = None
+        self._analytics: Optional[Dict] = None
+        self._content_key: Optional[str] = None
+
+    @property
+    def by_category(self) -> Dict[str, List[Dict]]:
+        """Eventos ordenados agrupados por categoría"""
+        if self._by_category is None:
+            self._by_category = ExcelGenerator.group_by_category(self.events)
+        return self._by_category
+
+    @property
+    def stats(self) -> Dict[str, List[Tuple[str, int]]]:
+        """Recuentos por categoría, país y modalidad"""
+        if self._stats is None:
+            self._stats = ExcelGenerator.summary_stats(self.events)
+        return self._stats
+
+    def cache_key(self, kind: str) -> str:
+        """
+        Clave de caché de un informe: hash de los eventos ordenados (calculado
+        una vez) combinado con el tipo de informe
+
+        Args:
+            kind: Tipo de informe
+
+        Returns:
+            Clave del informe
+        """
+        if self._content_key is None:
+            self._content_key = ReportCache.key(self.events)
+        options = {'kind': kind, 'events': self._content_key}
+        if kind == 'summary':
+            # La antelación hasta los eventos depende del día de generación
+            options['reference_date'] = date.today().isoformat()
+        return ReportCache.key([], options)
+
+    @property
+    def analytics(self) -> Dict:
+        """Tablas de análisis del resumen (hoja -> DataFrame)"""
+        if self._analytics is None:
+            self._analytics = SummaryAnalytics(self.events).compute()
+        return self._analytics
+
+
+def _write_artifact(generator: ExcelGenerator, kind: str, filepath: str, payload: tuple) -> str:
+    """
+    Escribe un informe (se ejecuta en el proceso actual o en un proceso hijo)
+
+    Args:
+        generator: Generador de Excel
+        kind: Tipo de informe
+        filepath: Ruta del archivo
+        payload: Datos preparados que necesita el informe
+
+    Returns:
+        Ruta del archivo generado
+    """
+    if kind == 'events':
+        generator.write_events_workbook(filepath, *payload)
+    elif kind == 'by_category':
+        generator.write_category_workbook(filepath, *payload)
+    elif kind == 'summary':
+        generator.write_summary_workbook(filepath, *payload)
+    else:
+        raise ValueError(f"Unknown report type: {kind}")
+    return filepath
+
+
+class ReportBuilder:
+    """
+    Genera varios informes Excel en una sola pasada.
+
+    Los eventos se preparan una vez (ReportData) y cada informe solo escribe
+    su archivo a partir de esa vista. Con max_workers > 1 los archivos se
+    escriben en paralelo en procesos separados, de modo que el tiempo total
+    se acerca al del informe más grande.
+    """
+
+    # Informes disponibles
+    ARTIFACTS = ('events', 'by_category', 'summary')
+
+    def __init__(self, excel_generator: Optional[ExcelGenerator] = None, max_workers: Optional[int] = None,
+                 cache: Optional[ReportCache] = None):
+        """
+        Inicializa el generador de informes
+
+        Args:
+            excel_generator: Generador de Excel (por defecto uno sobre ./output)
+            max_workers: Procesos de escritura en paralelo (por defecto
+                SIRIA_REPORT_WORKERS o 1, es decir, sin procesos hijos)
+            cache: Caché de informes (opcional); los informes sin cambios se
+                reutilizan en lugar de generarse de nuevo
+        """
+        self.excel_generator = excel_generator or ExcelGenerator()
+        self.max_workers = max_workers or int(os.getenv('SIRIA_REPORT_WORKERS', '1'))
+        self.cache = cache
+
+    def _payload(self, kind: str, data: ReportData) -> tuple:
+        """Datos preparados que necesita cada informe"""
+        if kind == 'events':
+            return (data.events,)
+        if kind == 'by_category':
+            return (data.by_category,)
+        return (data.events, data.stats, data.analytics)
+
+    def build(self, events: List[Dict], artifacts: Iterable[str] = ('events', 'summary'),
+              filenames: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        """
+        Genera los informes indicados
+
+        Args:
+            events: Lista de eventos
+            artifacts: Informes a generar ('events', 'by_category', 'summary')
+            filenames: Nombre de archivo por informe (opcional)
+
+        Returns:
+            Diccionario informe -> ruta del archivo generado
+        """
+        start = time.time()
+        filenames = filenames or {}
+
+        artifacts = list(dict.fromkeys(artifacts))
+        unknown = [kind for kind in artifacts if kind not in self.ARTIFACTS]
+        if unknown:
+            raise ValueError(f"Unknown report types: {unknown}")
+
+        data = ReportData(events)
+
+        paths = {}
+        keys = {}
+        jobs = []
+        for kind in artifacts:
+            filepath = self.excel_generator.output_path(kind, filenames.get(kind))
+            if self.cache:
+                keys[kind] = data.cache_key(kind)
+                if self.cache.fetch(keys[kind], filepath):
+                    paths[kind] = filepath
+                    continue
+            jobs.append((kind, filepath, self._payload(kind, data)))
+
+        workers = min(self.max_workers, len(jobs))
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = {
+                    kind: executor.submit(_write_artifact, self.excel_generator, kind, filepath, payload)
+                    for kind, filepath, payload in jobs
+                }
+                for kind, future in futures.items():
+                    paths[kind] = future.result()
+        else:
+            for kind, filepath, payload in jobs:
+                paths[kind] = _write_artifact(self.excel_generator, kind, filepath, payload)
+
+        if self.cache:
+            for kind, filepath, _ in jobs:
+                self.cache.store(keys[kind], filepath)
+            self.cache.evict([self.excel_generator.output_dir])
+
+        logger.info(
+            f"Generated {len(paths)} reports ({len(jobs)} written, {len(paths) - len(jobs)} from cache) "
+            f"for {len(events)} events in {time.time() - start:.2f}s: {paths}"
+        )
+        return {kind: paths[kind] for kind in artifacts}
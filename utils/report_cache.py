@@ -0,0 +1,179 @@
+"""
+Caché de informes direccionada por contenido
+"""
+import glob
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Versión del formato de los informes; cambiarla invalida toda la caché
+REPORT_FORMAT_VERSION = 1
+
+# Informes generados en el directorio de salida que pueden eliminarse por antigüedad
+OUTPUT_PATTERNS = ['agenda_eventos_*', 'resumen_eventos_*']
+
+
+class ReportCache:
+    """
+    Guarda una copia de cada informe generado bajo el hash de su contenido
+    (eventos ya ordenados + opciones del informe). Si se pide un informe
+    idéntico, se enlaza la copia guardada en la ruta de destino en lugar de
+    volver a generarlo.
+
+    Las entradas que superan la antigüedad máxima, o las más antiguas cuando
+    la caché supera el tamaño máximo, se eliminan; también los informes del
+    directorio de salida con más antigüedad que la permitida.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_age_days: Optional[float] = None,
+                 max_size_mb: Optional[float] = None):
+        """
+        Inicializa la caché
+
+        Args:
+            cache_dir: Directorio de la caché (por defecto SIRIA_REPORT_CACHE o ./output/.cache)
+            max_age_days: Antigüedad máxima de entradas e informes (por defecto
+                SIRIA_REPORT_MAX_AGE_DAYS o 30)
+            max_size_mb: Tamaño máximo de la caché en MB (por defecto
+                SIRIA_REPORT_CACHE_MAX_MB o 500)
+        """
+        self.cache_dir = cache_dir or os.getenv('SIRIA_REPORT_CACHE', './output/.cache')
+        self.max_age = float(
+            max_age_days if max_age_days is not None else os.getenv('SIRIA_REPORT_MAX_AGE_DAYS', '30')
+        ) * 86400
+        self.max_bytes = float(
+            max_size_mb if max_size_mb is not None else os.getenv('SIRIA_REPORT_CACHE_MAX_MB', '500')
+        ) * 1024 * 1024
+
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir)
+            logger.info(f"Created report cache directory: {self.cache_dir}")
+
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(events: Iterable[Dict], options: Optional[Dict] = None) -> str:
+        """
+        Calcula la clave de un informe
+
+        Args:
+            events: Eventos en el orden en que aparecen en el informe
+            options: Opciones que afectan al contenido (tipo, fecha de referencia...)
+
+        Returns:
+            Hash hexadecimal del contenido
+        """
+        digest = hashlib.blake2b(digest_size=20)
+        header = {'version': REPORT_FORMAT_VERSION, 'options': options or {}}
+        digest.update(json.dumps(header, sort_keys=True, default=str).encode('utf-8'))
+        for event in events:
+            digest.update(b'\n')
+            digest.update(json.dumps(event, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8'))
+        return digest.hexdigest()
+
+    def _entry_path(self, key: str, extension: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}{extension}")
+
+    @staticmethod
+    def _link(source: str, target: str):
+        """Enlaza (o copia, si no es posible) source en target, sustituyéndolo"""
+        if os.path.exists(target):
+            if os.path.samefile(source, target):
+                return
+            os.remove(target)
+        try:
+            os.link(source, target)
+        except OSError:
+            shutil.copy2(source, target)
+
+    def fetch(self, key: str, target: str) -> bool:
+        """
+        Coloca el informe en caché en la ruta de destino
+
+        Args:
+            key: Clave del informe
+            target: Ruta de destino
+
+        Returns:
+            True si estaba en caché
+        """
+        entry = self._entry_path(key, os.path.splitext(target)[1])
+        if not os.path.exists(entry):
+            self.misses += 1
+            return False
+
+        self._link(entry, target)
+        # Marcar como usada recientemente para la expulsión por tamaño
+        os.utime(entry)
+        self.hits += 1
+        logger.info(f"Report cache hit: {target}")
+        return True
+
+    def store(self, key: str, filepath: str):
+        """
+        Guarda un informe recién generado
+
+        Args:
+            key: Clave del informe
+            filepath: Ruta del informe generado
+        """
+        entry = self._entry_path(key, os.path.splitext(filepath)[1])
+        try:
+            self._link(filepath, entry)
+        except OSError as e:
+            logger.warning(f"Could not cache report {filepath}: {e}")
+
+    def _expired(self, path: str, now: float) -> bool:
+        return now - os.path.getmtime(path) > self.max_age
+
+    def evict(self, output_dirs: Optional[List[str]] = None) -> int:
+        """
+        Elimina entradas antiguas o que exceden el tamaño máximo, y los
+        informes antiguos de los directorios de salida
+
+        Args:
+            output_dirs: Directorios de salida a limpiar
+
+        Returns:
+            Número de archivos eliminados
+        """
+        now = time.time()
+        removed = 0
+
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if not os.path.isfile(path):
+                continue
+            if self._expired(path, now):
+                os.remove(path)
+                removed += 1
+            else:
+                entries.append((os.path.getmtime(path), os.path.getsize(path), path))
+
+        # Expulsar las menos usadas recientemente hasta cumplir el tamaño
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+            removed += 1
+
+        for directory in output_dirs or []:
+            for pattern in OUTPUT_PATTERNS:
+                for path in glob.glob(os.path.join(directory, pattern)):
+                    if os.path.isfile(path) and self._expired(path, now):
+                        os.remove(path)
+                        removed += 1
+
+        if removed:
+            logger.info(f"Evicted {removed} old report files")
+        return removed
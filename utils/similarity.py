@@ -0,0 +1,218 @@
+"""
+Cálculo de similitud por lotes entre eventos
+"""
+import logging
+from difflib import SequenceMatcher
+from itertools import combinations
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from utils.url_canonicalizer import canonical_link_key
+
+logger = logging.getLogger(__name__)
+
+# rapidfuzz se importa condicionalmente
+try:
+    from rapidfuzz import fuzz
+    from rapidfuzz.process import cdist
+    RAPIDFUZZ_AVAILABLE = True
+except ImportError:
+    RAPIDFUZZ_AVAILABLE = False
+    logger.warning("rapidfuzz not available, scoring every candidate pair with difflib. Install with: pip install rapidfuzz")
+
+# Margen para comparaciones en coma flotante con la cota superior
+_EPSILON = 1e-9
+
+
+def name_similarity(name1: str, name2: str) -> float:
+    """
+    Calcula la similitud (0-1) entre dos nombres ya normalizados
+
+    Es siempre SequenceMatcher.ratio, la métrica con la que se fijaron los
+    umbrales de deduplicación; rapidfuzz solo se usa como filtro previo
+    (ver BatchSimilarityScorer).
+
+    Args:
+        name1: Primer nombre
+        name2: Segundo nombre
+
+    Returns:
+        Ratio de similitud
+    """
+    return SequenceMatcher(None, name1, name2).ratio()
+
+
+class PreparedEvents:
+    """
+    Campos de los eventos normalizados una sola vez para puntuar por lotes
+    """
+
+    def __init__(self, names: List[str], date_codes: np.ndarray, link_codes: np.ndarray, org_codes: np.ndarray):
+        self.names = names
+        self.date_codes = date_codes
+        self.link_codes = link_codes
+        self.org_codes = org_codes
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+
+class BatchSimilarityScorer:
+    """
+    Puntúa bloques completos de eventos con la misma similitud ponderada que
+    EventDeduplicator.calculate_similarity.
+
+    Los componentes exactos (fecha, enlace, entidad) se codifican como
+    enteros y se comparan con NumPy. Para los nombres, rapidfuzz (cdist,
+    con varios núcleos en bloques grandes) calcula el ratio Indel, que es
+    2·LCS/longitud total y por tanto una cota superior de
+    SequenceMatcher.ratio (cuyos bloques coincidentes son una subsecuencia
+    común). Los pares que ni con esa cota alcanzan el umbral se descartan;
+    los demás se puntúan con SequenceMatcher, así que las decisiones son
+    las mismas con o sin rapidfuzz.
+    """
+
+    def __init__(self, weights: Dict[str, float], parallel_min_block: int = 256, workers: int = -1):
+        """
+        Inicializa el motor de puntuación
+
+        Args:
+            weights: Pesos de similitud ('name', 'date', 'link', 'org')
+            parallel_min_block: Tamaño de bloque a partir del cual se usan varios núcleos
+            workers: Número de hilos de rapidfuzz para bloques grandes (-1 = todos los núcleos)
+        """
+        self.weights = weights
+        self.parallel_min_block = parallel_min_block
+        self.workers = workers
+
+    @staticmethod
+    def _encode(values: List, empty_is_null: bool = False) -> np.ndarray:
+        """Codifica valores como enteros; -1 marca valores que nunca coinciden"""
+        codes = {}
+        encoded = np.empty(len(values), dtype=np.int64)
+        for index, value in enumerate(values):
+            if empty_is_null and not value:
+                encoded[index] = -1
+            else:
+                encoded[index] = codes.setdefault(value, len(codes))
+        return encoded
+
+    def prepare(self, events: List[Dict]) -> PreparedEvents:
+        """
+        Normaliza los campos de los eventos una sola vez
+
+        Args:
+            events: Lista de eventos
+
+        Returns:
+            Campos preparados para puntuar
+        """
+        return PreparedEvents(
+            names=[(event.get('nombre') or '').lower() for event in events],
+            date_codes=self._encode([event.get('fecha') for event in events]),
+            link_codes=self._encode(
+                [canonical_link_key(event.get('enlace') or '') for event in events],
+                empty_is_null=True
+            ),
+            org_codes=self._encode([event.get('entidad') for event in events])
+        )
+
+    def _name_matrix(self, names: List[str]) -> np.ndarray:
+        """
+        Matriz de similitud de nombres de un bloque: cota superior (ratio
+        Indel) con rapidfuzz, o el valor exacto sin él
+        """
+        if RAPIDFUZZ_AVAILABLE:
+            workers = self.workers if len(names) >= self.parallel_min_block else 1
+            return cdist(
+                names, names,
+                scorer=fuzz.ratio,
+                processor=None,
+                dtype=np.float64,
+                workers=workers
+            ) / 100.0
+
+        matrix = np.eye(len(names))
+        for i, j in combinations(range(len(names)), 2):
+            matrix[i, j] = matrix[j, i] = SequenceMatcher(None, names[i], names[j]).ratio()
+        return matrix
+
+    def _exact_score(self, prepared: PreparedEvents, i: int, j: int) -> float:
+        """Similitud ponderada exacta de un par (mismo cálculo que calculate_similarity)"""
+        link = prepared.link_codes[i]
+        return (
+            name_similarity(prepared.names[i], prepared.names[j]) * self.weights['name'] +
+            float(prepared.date_codes[i] == prepared.date_codes[j]) * self.weights['date'] +
+            float(link >= 0 and link == prepared.link_codes[j]) * self.weights['link'] +
+            float(prepared.org_codes[i] == prepared.org_codes[j]) * self.weights['org']
+        )
+
+    def score_block(self, prepared: PreparedEvents, block: List[int]) -> np.ndarray:
+        """
+        Calcula la matriz de similitud ponderada de un bloque de eventos
+
+        Con rapidfuzz, el componente de nombre es una cota superior y la
+        matriz es una cota superior de la similitud; similar_pairs puntúa
+        de forma exacta los pares que la superan.
+
+        Args:
+            prepared: Campos preparados
+            block: Índices de los eventos del bloque
+
+        Returns:
+            Matriz simétrica len(block) x len(block) con la similitud (0-1)
+        """
+        index = np.asarray(block, dtype=np.int64)
+
+        name_matrix = self._name_matrix([prepared.names[i] for i in block])
+
+        dates = prepared.date_codes[index]
+        date_matrix = dates[:, None] == dates[None, :]
+
+        links = prepared.link_codes[index]
+        link_matrix = (links[:, None] == links[None, :]) & (links[:, None] >= 0)
+
+        orgs = prepared.org_codes[index]
+        org_matrix = orgs[:, None] == orgs[None, :]
+
+        return (
+            name_matrix * self.weights['name'] +
+            date_matrix * self.weights['date'] +
+            link_matrix * self.weights['link'] +
+            org_matrix * self.weights['org']
+        )
+
+    def similar_pairs(self, prepared: PreparedEvents, blocks: List[List[int]],
+                      threshold: float) -> Dict[int, Dict[int, float]]:
+        """
+        Obtiene los pares (i < j) de cada bloque que alcanzan el umbral
+
+        Args:
+            prepared: Campos preparados
+            blocks: Bloques de candidatos
+            threshold: Umbral de similitud
+
+        Returns:
+            Diccionario i -> {j: similitud} con los pares similares
+        """
+        similar: Dict[int, Dict[int, float]] = {}
+
+        for block in blocks:
+            block = sorted(set(block))
+            if len(block) < 2:
+                continue
+            scores = self.score_block(prepared, block)
+            rows, cols = np.nonzero(np.triu(scores >= threshold - _EPSILON, k=1))
+            for r, c in zip(rows.tolist(), cols.tolist()):
+                i, j = block[r], block[c]
+                if RAPIDFUZZ_AVAILABLE:
+                    # La matriz es una cota: puntuar el par de forma exacta
+                    score = self._exact_score(prepared, i, j)
+                    if score < threshold:
+                        continue
+                else:
+                    score = float(scores[r, c])
+                similar.setdefault(i, {})[j] = score
+
+        return similar
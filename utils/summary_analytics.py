@@ -0,0 +1,151 @@
+"""
+Analítica del reporte resumen sobre una tabla columnar de eventos
+"""
+import logging
+from datetime import date
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+class SummaryAnalytics:
+    """
+    Calcula las tablas de análisis del reporte resumen.
+
+    Los eventos se convierten una sola vez en un DataFrame con columnas
+    categóricas y fechas ya interpretadas; todas las tablas se obtienen con
+    groupby/pivot vectorizados sobre esa tabla, por lo que el coste crece
+    con el número de grupos y no con bucles de Python por evento.
+    """
+
+    # Campos del evento que se cargan en la tabla
+    FIELDS = ['entidad', 'fecha', 'modalidad', 'pais', 'categoria']
+
+    # Nombre de hoja de cada tabla (máximo 31 caracteres)
+    SHEETS = {
+        'category_country_month': 'Categoría x país x mes',
+        'organizations': 'Por entidad',
+        'online_share': 'Online por categoría',
+        'lead_time': 'Antelación por categoría',
+        'weekly': 'Evolución semanal'
+    }
+
+    def __init__(self, events: List[Dict], reference_date: Optional[date] = None):
+        """
+        Construye la tabla columnar
+
+        Args:
+            events: Lista de eventos
+            reference_date: Fecha desde la que se mide la antelación (por defecto, hoy)
+        """
+        self.reference_date = pd.Timestamp(reference_date or date.today())
+        self.table = self.build_table(events)
+
+    @classmethod
+    def build_table(cls, events: List[Dict]) -> pd.DataFrame:
+        """
+        Convierte los eventos en un DataFrame columnar
+
+        Args:
+            events: Lista de eventos
+
+        Returns:
+            DataFrame con una columna por campo, 'fecha' como datetime y
+            'online' como booleano
+        """
+        table = pd.DataFrame({
+            field: [event.get(field) for event in events]
+            for field in cls.FIELDS
+        })
+
+        for field in ('entidad', 'modalidad', 'pais', 'categoria'):
+            table[field] = table[field].fillna('').astype(str).astype('category')
+
+        table['fecha'] = pd.to_datetime(table['fecha'], format='%Y-%m-%d', errors='coerce')
+
+        # Comparar sobre las categorías (pocas) en lugar de fila a fila
+        modalities = table['modalidad'].cat.categories
+        online_codes = np.flatnonzero(modalities.str.lower() == 'online')
+        table['online'] = np.isin(table['modalidad'].cat.codes.to_numpy(), online_codes)
+
+        return table
+
+    def category_country_month(self) -> pd.DataFrame:
+        """Eventos por categoría y país (filas) y mes (columnas)"""
+        table = self.table.dropna(subset=['fecha'])
+        pivot = pd.crosstab(
+            [table['categoria'], table['pais']],
+            table['fecha'].dt.to_period('M').astype(str)
+        )
+        pivot.index.names = ['Categoría', 'País']
+        pivot.columns.name = None
+        pivot['Total'] = pivot.sum(axis=1)
+        return pivot.sort_values('Total', ascending=False, kind='stable').reset_index()
+
+    def organizations(self) -> pd.DataFrame:
+        """Eventos por entidad organizadora con su primera y última fecha"""
+        grouped = self.table.groupby('entidad', observed=True).agg(
+            eventos=('fecha', 'size'),
+            categorias=('categoria', 'nunique'),
+            primera_fecha=('fecha', 'min'),
+            ultima_fecha=('fecha', 'max')
+        )
+        grouped = grouped.sort_values('eventos', ascending=False, kind='stable').reset_index()
+        for column in ('primera_fecha', 'ultima_fecha'):
+            grouped[column] = grouped[column].dt.strftime('%Y-%m-%d')
+        grouped.columns = ['Entidad', 'Eventos', 'Categorías', 'Primera fecha', 'Última fecha']
+        return grouped
+
+    def online_share(self) -> pd.DataFrame:
+        """Proporción de eventos online por categoría"""
+        grouped = self.table.groupby('categoria', observed=True)['online'].agg(['size', 'sum', 'mean'])
+        grouped = grouped.sort_values('size', ascending=False, kind='stable').reset_index()
+        grouped['mean'] = grouped['mean'].round(4)
+        grouped.columns = ['Categoría', 'Eventos', 'Online', 'Proporción online']
+        return grouped
+
+    def lead_time(self) -> pd.DataFrame:
+        """Días que faltan hasta los eventos (desde la fecha de referencia), por categoría"""
+        table = self.table.dropna(subset=['fecha'])
+        days = (table['fecha'] - self.reference_date).dt.days
+        grouped = days.groupby(table['categoria'], observed=True).agg(
+            ['size', 'mean', 'median', 'min', 'max']
+        )
+        grouped = grouped.sort_values('size', ascending=False, kind='stable').reset_index()
+        grouped[['mean', 'median']] = grouped[['mean', 'median']].round(1)
+        grouped.columns = [
+            'Categoría', 'Eventos', 'Días (media)', 'Días (mediana)', 'Días (mínimo)', 'Días (máximo)'
+        ]
+        return grouped
+
+    def weekly(self) -> pd.DataFrame:
+        """Eventos por semana (lunes) con la variación respecto a la semana anterior"""
+        table = self.table.dropna(subset=['fecha'])
+        if table.empty:
+            return pd.DataFrame(columns=['Semana', 'Eventos', 'Variación', 'Variación (%)'])
+
+        weeks = table['fecha'].dt.to_period('W-SUN').dt.start_time
+        counts = weeks.value_counts().sort_index()
+        # Incluir las semanas sin eventos para que las variaciones sean semanales
+        counts = counts.reindex(pd.date_range(counts.index[0], counts.index[-1], freq='W-MON'), fill_value=0)
+
+        delta = counts.diff()
+        pct = (delta / counts.shift(1).replace(0, np.nan) * 100).round(1)
+        return pd.DataFrame({
+            'Semana': counts.index.strftime('%Y-%m-%d'),
+            'Eventos': counts.to_numpy(),
+            'Variación': delta.to_numpy(),
+            'Variación (%)': pct.to_numpy()
+        })
+
+    def compute(self) -> Dict[str, pd.DataFrame]:
+        """
+        Calcula todas las tablas
+
+        Returns:
+            Diccionario nombre de hoja -> DataFrame
+        """
+        return {sheet: getattr(self, name)() for name, sheet in self.SHEETS.items()}
@@ -0,0 +1,35 @@
+"""
+Normalización de textos para comparar y buscar eventos
+"""
+import re
+import unicodedata
+
+
+def fold_accents(text: str) -> str:
+    """
+    Elimina los acentos y diacríticos de un texto (á -> a, ñ -> n)
+
+    Args:
+        text: Texto original
+
+    Returns:
+        Texto sin diacríticos
+    """
+    text = unicodedata.normalize('NFKD', text)
+    return ''.join(c for c in text if not unicodedata.combining(c))
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normaliza un texto para comparaciones: minúsculas, sin acentos y con
+    espacios colapsados
+
+    Args:
+        text: Texto original
+
+    Returns:
+        Texto normalizado
+    """
+    if not text:
+        return ''
+    return re.sub(r'\s+', ' ', fold_accents(text.lower())).strip()
@@ -0,0 +1,273 @@
+"""
+Búsqueda de texto completo sobre eventos: índice invertido con BM25
+"""
+import hashlib
+import heapq
+import math
+import re
+import threading
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from utils.text_normalization import normalize_text
+
+# Campos indexados y su peso en la frecuencia de términos
+SEARCH_FIELDS = {
+    'nombre': 2.0,
+    'descripcion': 1.0,
+    'entidad': 1.5,
+    'lugar': 1.5
+}
+
+# Palabras vacías en español (ya sin acentos)
+STOPWORDS = {
+    'a', 'al', 'ante', 'con', 'contra', 'de', 'del', 'desde', 'e', 'el', 'en',
+    'entre', 'es', 'esta', 'este', 'hacia', 'hasta', 'la', 'las', 'lo', 'los',
+    'mas', 'o', 'para', 'pero', 'por', 'que', 'se', 'sin', 'sobre', 'su',
+    'sus', 'u', 'un', 'una', 'unas', 'unos', 'y'
+}
+
+_TOKEN_PATTERN = re.compile(r'\w+')
+_VOWELS = set('aeiou')
+
+
+def stem(word: str) -> str:
+    """
+    Lematización ligera para español: quita el plural y la vocal final
+    (talleres -> taller, migrantes -> migrant, formaciones -> formacion)
+
+    Args:
+        word: Palabra normalizada (minúsculas y sin acentos)
+
+    Returns:
+        Raíz de la palabra
+    """
+    if len(word) > 4 and word.endswith('es') and word[-3] not in _VOWELS:
+        word = word[:-2]
+    elif len(word) > 3 and word.endswith('s'):
+        word = word[:-1]
+    if len(word) > 4 and word[-1] in 'aoe':
+        word = word[:-1]
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Convierte un texto en términos de búsqueda
+
+    Args:
+        text: Texto original
+
+    Returns:
+        Términos normalizados, sin palabras vacías y lematizados
+    """
+    return [
+        stem(token)
+        for token in _TOKEN_PATTERN.findall(normalize_text(text))
+        if token not in STOPWORDS
+    ]
+
+
+def trigrams(term: str) -> Set[str]:
+    """Trigramas de un término, con relleno para dar peso a los extremos"""
+    padded = f"  {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TextSearchIndex:
+    """
+    Índice invertido en memoria sobre nombre, descripción, entidad y lugar.
+
+    Los documentos se añaden, sustituyen o eliminan uno a uno, por lo que el
+    índice se actualiza de forma incremental (sync() solo toca los eventos
+    nuevos, cambiados o eliminados). La puntuación es BM25 con la frecuencia
+    de cada término ponderada por campo. Los términos de la consulta que no
+    están en el vocabulario se amplían a los términos con trigramas más
+    parecidos, lo que tolera erratas ("medelin" -> "medellin").
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75, typo_threshold: float = 0.45,
+                 max_expansions: int = 3):
+        """
+        Inicializa el índice
+
+        Args:
+            k1: Saturación de la frecuencia de términos (BM25)
+            b: Normalización por longitud del documento (BM25)
+            typo_threshold: Similitud mínima de trigramas (Jaccard) para corregir erratas
+            max_expansions: Términos parecidos usados como máximo por cada término desconocido
+        """
+        self.k1 = k1
+        self.b = b
+        self.typo_threshold = typo_threshold
+        self.max_expansions = max_expansions
+
+        self._postings: Dict[str, Dict[str, float]] = {}
+        self._trigrams: Dict[str, Set[str]] = {}
+        self._doc_terms: Dict[str, Dict[str, float]] = {}
+        self._doc_length: Dict[str, float] = {}
+        self._doc_signature: Dict[str, str] = {}
+        self._docs: Dict[str, Dict] = {}
+        self._total_length = 0.0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    @staticmethod
+    def _signature(event: Dict) -> str:
+        text = '\x1f'.join(str(event.get(field) or '') for field in SEARCH_FIELDS)
+        return hashlib.blake2b(text.encode('utf-8'), digest_size=8).hexdigest()
+
+    @staticmethod
+    def _weighted_terms(event: Dict) -> Dict[str, float]:
+        terms: Dict[str, float] = {}
+        for field, weight in SEARCH_FIELDS.items():
+            for term, count in Counter(tokenize(str(event.get(field) or ''))).items():
+                terms[term] = terms.get(term, 0.0) + weight * count
+        return terms
+
+    def add(self, event: Dict, signature: Optional[str] = None):
+        """
+        Añade o sustituye un evento (identificado por su 'id')
+
+        Args:
+            event: Evento
+            signature: Firma del texto indexado, si ya se calculó
+        """
+        doc_id = event['id']
+        signature = signature or self._signature(event)
+        with self._lock:
+            if self._doc_signature.get(doc_id) == signature:
+                # Mismo texto: solo actualizar los datos devueltos
+                self._docs[doc_id] = event
+                return
+            self._remove(doc_id)
+
+            terms = self._weighted_terms(event)
+            for term, frequency in terms.items():
+                postings = self._postings.get(term)
+                if postings is None:
+                    postings = self._postings[term] = {}
+                    for gram in trigrams(term):
+                        self._trigrams.setdefault(gram, set()).add(term)
+                postings[doc_id] = frequency
+
+            length = sum(terms.values())
+            self._doc_terms[doc_id] = terms
+            self._doc_length[doc_id] = length
+            self._doc_signature[doc_id] = signature
+            self._docs[doc_id] = event
+            self._total_length += length
+
+    def _remove(self, doc_id: str):
+        terms = self._doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            postings = self._postings[term]
+            del postings[doc_id]
+            if not postings:
+                del self._postings[term]
+                for gram in trigrams(term):
+                    grams = self._trigrams[gram]
+                    grams.discard(term)
+                    if not grams:
+                        del self._trigrams[gram]
+        self._total_length -= self._doc_length.pop(doc_id)
+        del self._doc_signature[doc_id]
+        del self._docs[doc_id]
+
+    def remove(self, doc_id: str):
+        """
+        Elimina un evento del índice
+
+        Args:
+            doc_id: ID del evento
+        """
+        with self._lock:
+            self._remove(doc_id)
+
+    def sync(self, events: Iterable[Dict]) -> Dict[str, int]:
+        """
+        Deja el índice con exactamente los eventos indicados, tocando solo
+        los que cambian
+
+        Args:
+            events: Conjunto completo de eventos (con 'id')
+
+        Returns:
+            Diccionario con eventos añadidos/actualizados y eliminados
+        """
+        seen = set()
+        changed = 0
+        for event in events:
+            if not event.get('id'):
+                continue
+            seen.add(event['id'])
+            signature = self._signature(event)
+            if self._doc_signature.get(event['id']) != signature:
+                changed += 1
+            self.add(event, signature)
+
+        removed = [doc_id for doc_id in list(self._docs) if doc_id not in seen]
+        for doc_id in removed:
+            self.remove(doc_id)
+        return {'changed': changed, 'removed': len(removed)}
+
+    def _expand(self, term: str) -> List[Tuple[str, float]]:
+        """Términos del vocabulario para un término de la consulta, con su peso"""
+        if term in self._postings:
+            return [(term, 1.0)]
+
+        grams = trigrams(term)
+        overlap: Counter = Counter()
+        for gram in grams:
+            for candidate in self._trigrams.get(gram, ()):
+                overlap[candidate] += 1
+
+        similar = []
+        for candidate, shared in overlap.items():
+            similarity = shared / (len(grams) + len(trigrams(candidate)) - shared)
+            if similarity >= self.typo_threshold:
+                similar.append((candidate, similarity))
+        similar.sort(key=lambda item: (-item[1], item[0]))
+        return similar[:self.max_expansions]
+
+    def search(self, query: str, limit: int = 20,
+               predicate: Optional[Callable[[Dict], bool]] = None) -> List[Tuple[float, Dict]]:
+        """
+        Busca eventos
+
+        Args:
+            query: Texto de la consulta
+            limit: Número máximo de resultados
+            predicate: Filtro adicional sobre los eventos candidatos (opcional)
+
+        Returns:
+            Lista de (puntuación, evento) de mayor a menor puntuación
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+
+        with self._lock:
+            total_docs = len(self._docs)
+            if not total_docs:
+                return []
+            average_length = self._total_length / total_docs
+
+            scores: Dict[str, float] = {}
+            for term in terms:
+                for vocabulary_term, weight in self._expand(term):
+                    postings = self._postings[vocabulary_term]
+                    idf = math.log(1 + (total_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                    for doc_id, frequency in postings.items():
+                        norm = self.k1 * (1 - self.b + self.b * self._doc_length[doc_id] / average_length)
+                        score = weight * idf * frequency * (self.k1 + 1) / (frequency + norm)
+                        scores[doc_id] = scores.get(doc_id, 0.0) + score
+
+            if predicate:
+                scores = {doc_id: score for doc_id, score in scores.items() if predicate(self._docs[doc_id])}
+            ranked = heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], item[0]))
+            return [(round(score, 4), self._docs[doc_id]) for doc_id, score in ranked]
@@ -0,0 +1,149 @@
+"""
+Canonicalización de URLs de eventos
+"""
+import logging
+from collections import defaultdict
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+
+logger = logging.getLogger(__name__)
+
+# Parámetros de seguimiento que no cambian el recurso enlazado
+TRACKING_PARAMS = {
+    'fbclid', 'gclid', 'dclid', 'msclkid', 'yclid',
+    'mc_cid', 'mc_eid', '_ga', '_gl', 'igshid', 'ref_src'
+}
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def _is_tracking_param(name: str) -> bool:
+    name = name.lower()
+    return name.startswith('utm_') or name in TRACKING_PARAMS
+
+
+def clean_url(url: str, base_url: Optional[str] = None) -> str:
+    """
+    Limpia una URL sin cambiar el recurso al que apunta: resuelve enlaces
+    relativos, pone en minúsculas esquema y host, elimina el puerto por
+    defecto, el fragmento y los parámetros de seguimiento (utm_*, fbclid...)
+
+    Args:
+        url: URL original
+        base_url: URL base para resolver enlaces relativos (opcional)
+
+    Returns:
+        URL limpia, o cadena vacía si no hay URL
+    """
+    url = (url or '').strip()
+    if not url:
+        return ''
+
+    if base_url:
+        url = urljoin(base_url if base_url.endswith('/') else f"{base_url}/", url)
+
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        logger.debug(f"Invalid URL kept as is: {url}")
+        return url
+
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    netloc = f"[{host}]" if ':' in host else host
+    if port and DEFAULT_PORTS.get(scheme) != port:
+        netloc = f"{netloc}:{port}"
+
+    params = parse_qsl(parts.query, keep_blank_values=True)
+    kept = [(name, value) for name, value in params if not _is_tracking_param(name)]
+    # Solo se recodifica la query si se ha quitado algún parámetro
+    query = parts.query if len(kept) == len(params) else urlencode(kept)
+
+    return urlunsplit((scheme, netloc, parts.path, query, ''))
+
+
+@lru_cache(maxsize=65536)
+def canonical_link_key(url: str) -> str:
+    """
+    Calcula la clave canónica de un enlace para comparar eventos. Además de
+    la limpieza de clean_url ignora el esquema (http/https), el prefijo
+    'www.', la barra final y el orden de los parámetros.
+
+    Args:
+        url: URL original
+
+    Returns:
+        Clave canónica, o cadena vacía si no hay URL
+    """
+    cleaned = clean_url(url)
+    if not cleaned:
+        return ''
+
+    parts = urlsplit(cleaned)
+    netloc = parts.netloc
+    if netloc.startswith('www.'):
+        netloc = netloc[4:]
+
+    path = parts.path.rstrip('/')
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+
+    key = f"{netloc}{path}"
+    if query:
+        key = f"{key}?{query}"
+    return key
+
+
+class LinkIndex:
+    """
+    Índice hash de eventos por enlace canónico (y fecha), para unir en O(n)
+    los eventos que apuntan al mismo recurso
+    """
+
+    def __init__(self, include_date: bool = True):
+        """
+        Inicializa el índice
+
+        Args:
+            include_date: Si True, la clave incluye la fecha del evento
+        """
+        self.include_date = include_date
+        self.index: Dict[Tuple[str, str], List[int]] = defaultdict(list)
+
+    def key(self, event: Dict) -> Optional[Tuple[str, str]]:
+        """Clave del evento en el índice (None si no tiene enlace)"""
+        link_key = canonical_link_key(event.get('enlace') or '')
+        if not link_key:
+            return None
+        date = (event.get('fecha') or '') if self.include_date else ''
+        return link_key, date
+
+    def build(self, events: List[Dict]) -> 'LinkIndex':
+        """
+        Indexa una lista de eventos
+
+        Args:
+            events: Lista de eventos
+
+        Returns:
+            El propio índice
+        """
+        for i, event in enumerate(events):
+            key = self.key(event)
+            if key is not None:
+                self.index[key].append(i)
+        return self
+
+    def groups(self) -> List[List[int]]:
+        """
+        Obtiene los grupos de eventos con el mismo enlace canónico
+
+        Returns:
+            Lista de grupos (índices) con al menos dos elementos
+        """
+        return [group for group in self.index.values() if len(group) > 1]